@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 
 import tkinter as tk
-import sys, time, cardReaderExceptions, cardReader
+import sys, time, cardReaderExceptions, cardReader, cardReaderProfiling, cardStore, cardConsensus
 from tkinter import *
 from tkinter import ttk
 from tkinter.messagebox import *
 from tkinter import filedialog
-import sqlite3
+import sqlite3, logging, serial
+
+
+logger = logging.getLogger(__name__)
+
+#how long (in seconds) a button waits for the MSR605 to be plugged back in, the window is
+#frozen while it waits
+RECONNECT_TIMEOUT = 3.0
 
 
 class GUI(Frame):    
@@ -16,12 +23,19 @@ class GUI(Frame):
         self.__coercivityRadioBtnValue = StringVar()
         self.__coercivityRadioBtnValue.set('hi')
         
+        #the BPI and BPC of each track, ISO standard to start with
+        self.__bpiValues = [IntVar(value = 210), IntVar(value = 75), IntVar(value = 210)]
+        self.__bpcValues = [IntVar(value = 7), IntVar(value = 5), IntVar(value = 5)]
+        
         self.__autoSaveDatabase = BooleanVar()
         self.__autoSaveDatabase.set(False)
         
         self.__enableDuplicates = BooleanVar()
         self.__enableDuplicates.set(False)
         
+        #the card database, it isn't opened until a card is saved or the database is viewed
+        self.__store = None
+        
         self.__connected = False        
         self.__connectedLabelIndicator = None
         
@@ -109,11 +123,24 @@ class GUI(Frame):
         Radiobutton(coercivityRadioButtons, text="HI-CO", variable=self.__coercivityRadioBtnValue, value="hi", command = self.coercivity_change).pack(side=TOP)
         Radiobutton(coercivityRadioButtons, text="LOW-CO", variable=self.__coercivityRadioBtnValue, value="low", command = self.coercivity_change).pack(side=TOP)
         
+        #Track Density (BPI/BPC) Options
+        densityOptions = Frame(buttons, padx = 10, pady = 10)
+        densityOptions.pack(side = TOP, padx = 20)
+        Label(densityOptions, text="TRACK DENSITY\n(BPI / BPC)", padx = 10, pady = 10, font=('Helvetica', 10, 'underline')).grid(row = 0, column = 0, columnspan = 3)
+        
+        for trackNum in range(1, 4):
+            Label(densityOptions, text="TRACK " + str(trackNum)).grid(row = trackNum, column = 0)
+            OptionMenu(densityOptions, self.__bpiValues[trackNum - 1], 75, 210).grid(row = trackNum, column = 1)
+            OptionMenu(densityOptions, self.__bpcValues[trackNum - 1], 5, 6, 7, 8).grid(row = trackNum, column = 2)
+        
+        Button(densityOptions, text="SET DENSITY", command = self.density_change).grid(row = 4, column = 0, columnspan = 3)
+        
         #Read-Write-Erase Buttons
         readWriteEraseButtons = Frame(buttons, padx = 10, pady = 10)
         readWriteEraseButtons.pack(side = TOP, padx = 20)
         Label(readWriteEraseButtons, text="READ/WRITE\n/ERASE CARDS", padx = 10, pady = 10, font=('Helvetica', 10, 'underline')).pack(side = TOP)    
         Button(readWriteEraseButtons, text="READ CARD", command = self.read_card).pack(side=TOP)
+        Button(readWriteEraseButtons, text="READ WORN CARD\n(3 SWIPES)", command = self.read_card_consensus).pack(side=TOP)
         Button(readWriteEraseButtons, text="WRITE CARD", command = self.write_card).pack(side=TOP)
         Button(readWriteEraseButtons, text="ERASE CARD", command = self.erase_card).pack(side=TOP)
 
@@ -147,15 +174,18 @@ class GUI(Frame):
             self.__connected = False
             self.__connectedLabelIndicator.config(text = "MSR605 IS NOT CONNECTED", fg = 'red')
             showerror("Connect Error", e)
-            print (e)
+            logger.error("%s", e)
         
         except cardReaderExceptions.CommunicationTestError as e:
             self.__connected = False
             self.__connectedLabelIndicator.config(text = "MSR605 IS NOT CONNECTED", fg = 'red')
             showerror("Communication Error", e)            
-            print (e)
+            logger.error("%s", e)
         
         else:
+            #if the cable gets bumped the MSR605 is reconnected without going through this again
+            self.__msr.enable_auto_reconnect(timeout = RECONNECT_TIMEOUT)
+            
             self.__connected = True
             self.__connectedLabelIndicator.config(text = "MSR605 IS CONNECTED", fg = 'green')
             showinfo('MSR605 Initialize', 'MSR605 Successfully Connected')
@@ -171,6 +201,26 @@ class GUI(Frame):
         else:
             showinfo('Close Connection', 'MSR605 is not connected')
     
+    def report_callback_exception(self, excType, excValue, traceback):
+        #tkinter calls this for anything a button doesn't catch, the MSR605 being unplugged
+        #(and not coming back in RECONNECT_TIMEOUT) can happen in any of them
+        if (issubclass(excType, (cardReaderExceptions.MSR605ConnectError, serial.SerialException, OSError)) and self.__msr != None):
+            logger.error("%s", excValue)
+            
+            try:
+                self.__msr.close_serial_connection()
+            except (serial.SerialException, OSError):
+                pass #it is already gone
+            
+            self.__msr = None
+            self.__connected = False
+            self.__connectedLabelIndicator.config(text = "MSR605 IS NOT CONNECTED", fg = 'red')
+            
+            showerror("Connect Error", "The MSR605 was unplugged, plug it back in and connect to it again\n\n" + str(excValue))
+            return None
+        
+        logger.error("UNHANDLED ERROR", exc_info = (excType, excValue, traceback))
+    
     def exception_error_reset(self, title, text):
         showerror(title, text)
         
@@ -193,7 +243,7 @@ class GUI(Frame):
                 
         except cardReaderExceptions.SetCoercivityError as e :
             self.exception_error_reset("Setting Coercivity Error", e)
-            print (e)            
+            logger.error("%s", e)
         
         else:
             showinfo("Setting Coercivity", "Coercivity has been set, now checking Coercivity ")
@@ -202,12 +252,40 @@ class GUI(Frame):
                 coercivity = self.__msr.get_hi_or_low_co()
             except cardReaderExceptions.GetCoercivityError as e :
                 self.exception_error_reset("Getting Coercivity Error", e)
-                print (e)
+                logger.error("%s", e)
             else:
                 showinfo("Getting Coercivity", "Coercivity has been set to " + coercivity)
             
             
             
+    def density_change(self):
+        if (self.__connected == False or self.__msr == None):
+            showerror("Connect Error", "The MSR605 is not connected")
+            return None
+        
+        try:
+            for trackNum in range(1, 4):
+                self.__msr.set_bpi(trackNum, self.__bpiValues[trackNum - 1].get())
+            
+            self.__msr.set_bpc(*[bpc.get() for bpc in self.__bpcValues])
+        
+        except cardReaderExceptions.SetBPIError as e :
+            self.exception_error_reset("Setting BPI Error", e)
+            logger.error("%s", e)
+        
+        except cardReaderExceptions.SetBPCError as e :
+            self.exception_error_reset("Setting BPC Error", e)
+            logger.error("%s", e)
+        
+        else:
+            capacity = ""
+            
+            for trackNum in range(1, 4):
+                capacity += "TRACK " + str(trackNum) + ": " + str(self.__msr.track_capacity(trackNum)) + " characters\n"
+            
+            showinfo("Setting Density", "The BPI and BPC have been set, each track now fits\n\n" + capacity)
+            
+            
     def read_card(self):
         if (self.__connected == False or self.__msr == None):
             showerror("Connect Error", "The MSR605 is not connected")
@@ -217,45 +295,29 @@ class GUI(Frame):
             self.__tracks = self.__msr.read_card()
         except cardReaderExceptions.CardReadError as e :
             self.exception_error_reset("Connect Error", e)
-            print (e)
+            logger.error("%s", e)
             
             self.__trackOneEntry.delete(1.0, END)
             self.__trackTwoEntry.delete(1.0, END)
             self.__trackThreeEntry.delete(1.0, END)
             
+            #the MSR605 stopped responding before any track came in, there's nothing to show
+            if (e.tracks == None):
+                return None
+            
             self.__trackOneEntry.insert(END, e.tracks[0])
             self.__trackTwoEntry.insert(END, e.tracks[1])
             self.__trackThreeEntry.insert(END, e.tracks[2])
             
-            if (self.__autoSaveDatabase.get() == True):
-                
-                if (self.__enableDuplicates == False):
-                    
-                    cursor.execute("""SELECT * FROM Cards WHERE trackOne=? AND trackTwo=? AND trackThree=?""", (self.__tracks))
-                
-                    conn.commit()
-                    result = cursor.fetchone()
-
-                    if (result != None):
-                        showinfo("Duplicate", "This card already exists in the Database, please enable Duplicates in the Database dropdown to add it")
-                    
-                    else:
-                        cursor.execute("""INSERT INTO Cards(trackOne, trackTwo, trackThree) VALUES(?, ?, ?)""", (self.__tracks))                    
-                        conn.commit()                
-                else:                
-                    cursor.execute("""INSERT INTO Cards(trackOne, trackTwo, trackThree) VALUES(?, ?, ?)""", (self.__tracks))                    
-                    conn.commit()
-            
-            
-            else:
-                showinfo("Autosave to Database","Autosave is turned off in the Database menu dropdown, please \nselect it if you wish to store the cards that are read in")
+            #saves what could be read
+            self.__autosave(e.tracks)
             
             
             return None
     
         except cardReaderExceptions.StatusError as e :
             self.exception_error_reset("Connect Error", e)
-            print (e)
+            logger.error("%s", e)
             return None
         
         else:
@@ -267,28 +329,45 @@ class GUI(Frame):
             self.__trackTwoEntry.insert(END, self.__tracks[1])
             self.__trackThreeEntry.insert(END, self.__tracks[2])
         
-            if (self.__autoSaveDatabase.get() == True):
-                
-                if (self.__enableDuplicates.get() == False):
-                    
-                    cursor.execute("""SELECT * FROM Cards WHERE trackOne=? AND trackTwo=? AND trackThree=?""", (self.__tracks))
-                
-                    conn.commit()
-                    result = cursor.fetchone()
-                    
-                    if (result != None):
-                        showinfo("Duplicate", "This card already exists in the Database, please enable Duplicates in the Database dropdown to add it")
-                    
-                    else:
-                        cursor.execute("""INSERT INTO Cards(trackOne, trackTwo, trackThree) VALUES(?, ?, ?)""", (self.__tracks))                    
-                        conn.commit()                
-                else:                
-                    cursor.execute("""INSERT INTO Cards(trackOne, trackTwo, trackThree) VALUES(?, ?, ?)""", (self.__tracks))                    
-                    conn.commit()
-            else:
-                showinfo("Autosave to Database","Autosave is turned off in the Database menu dropdown, please \nselect it if you wish to store the cards that are read in")
+            self.__autosave(self.__tracks)
             
                 
+    def read_card_consensus(self):
+        if (self.__connected == False or self.__msr == None):
+            showerror("Connect Error", "The MSR605 is not connected")
+            return None
+        
+        showinfo("Read Worn Card", "Swipe the card 3 times, the tracks are put together from all 3 swipes")
+        
+        try:
+            consensus = self.__msr.read_card_consensus(3)
+        except (cardReaderExceptions.CardReadError, cardReaderExceptions.StatusError) as e :
+            self.exception_error_reset("Read Error", e)
+            logger.error("%s", e)
+            return None
+        
+        #the same as read_card gives back, so the card is a duplicate of the same card read normally
+        self.__tracks = cardConsensus.read_card_tracks(consensus)
+        
+        self.__trackOneEntry.delete(1.0, END)
+        self.__trackTwoEntry.delete(1.0, END)
+        self.__trackThreeEntry.delete(1.0, END)
+        
+        self.__trackOneEntry.insert(END, self.__tracks[0])
+        self.__trackTwoEntry.insert(END, self.__tracks[1])
+        self.__trackThreeEntry.insert(END, self.__tracks[2])
+        
+        confidence = ""
+        
+        for trackNum in range(1, 4):
+            track = consensus[trackNum - 1]
+            confidence += "TRACK " + str(trackNum) + ": " + (str(round(track.confidence * 100)) + "%" if track != None else "no data") + "\n"
+        
+        showinfo("Read Worn Card", "Confidence of the weakest character on each track\n\n" + confidence)
+        
+        self.__autosave(self.__tracks, remindIfOff = False)
+        
+        
     def write_card(self):
         if (self.__connected == False or self.__msr == None):
             showerror("Connect Error", "The MSR605 is not connected")
@@ -303,12 +382,12 @@ class GUI(Frame):
         
         except cardReaderExceptions.CardWriteError as  e :
             self.exception_error_reset("Write Error", e)
-            print(e)
+            logger.error("%s", e)
             return None
         
         except cardReaderExceptions.StatusError as e :
             self.exception_error_reset("Write Error", e)
-            print(e)
+            logger.error("%s", e)
             return None
         
         else:
@@ -331,7 +410,7 @@ class GUI(Frame):
         
         except cardReaderExceptions.EraseCardError as e :
             self.exception_error_reset("Erase Error", e)
-            print (e)
+            logger.error("%s", e)
             return None
         
         else:
@@ -386,7 +465,7 @@ class GUI(Frame):
         
         except cardReaderExceptions.CommunicationTestError as e :
             self.exception_error_reset("Communication Test Error", e)
-            print (e)
+            logger.error("%s", e)
             return None
         
         else:
@@ -402,7 +481,7 @@ class GUI(Frame):
         
         except cardReaderExceptions.RamTestError as e :
             self.exception_error_reset("Ram Test Error", e)
-            print (e)
+            logger.error("%s", e)
             return None
         
         else:
@@ -420,73 +499,332 @@ class GUI(Frame):
         
         except cardReaderExceptions.SensorTestError as e :
             self.exception_error_reset("Sensor Test Error", e)
-            print (e)
+            logger.error("%s", e)
             return None
         
         else:
             showinfo("Sensor Test", "MSR605 Sensor's are good")
     
 
+    def __get_store(self):
+        if (self.__store == None):
+            self.__store = cardStore.CardStore()
+        
+        return self.__store
+    
+    
+    def __autosave(self, tracks, remindIfOff = True):
+        #saves the card if Autosave is on, a duplicate isn't saved unless Save Duplicate Cards is on
+        if (self.__autoSaveDatabase.get() == False):
+            if (remindIfOff):
+                showinfo("Autosave to Database","Autosave is turned off in the Database menu dropdown, please \nselect it if you wish to store the cards that are read in")
+            
+            return None
+        
+        try:
+            saved = self.__get_store().insert(tracks, allowDuplicates = self.__enableDuplicates.get())
+        except sqlite3.Error as e:
+            showerror("Database Error", "The card couldn't be saved: " + str(e))
+            logger.error("%s", e)
+            return None
+        
+        if (saved == False):
+            showinfo("Duplicate", "This card already exists in the Database, please enable Duplicates in the Database dropdown to add it")
+        
+        
     def view_database(self):
+        try:
+            store = self.__get_store()
+        except sqlite3.Error as e:
+            showerror("Database Error", "The database couldn't be opened: " + str(e))
+            logger.error("%s", e)
+            return None
+        
         dbView = tk.Toplevel(self)
         dbView.title("Database")
         dbView.minsize(700,600)
         
-        dbTree = ttk.Treeview(dbView)
-        dbTree.pack(side = TOP)
+        DatabaseView(dbView, store).pack(side = TOP, fill = BOTH, expand = True)
+        
+        
+    def on_exit(self):        
+        if (self.__store != None):
+            self.__store.close()
+        
+        if (self.__connected == True or self.__msr != None):
+            self.close_connection()
+        
+        showinfo("Bye", "See ya later ;)")
+        root.destroy()
+        
+        
+class DatabaseView(Frame):
+    """The View Database window
+    
+        Only the cards that can be seen (and a few pages around them) are loaded, a page at a
+        time from where the last page ended (see CardStore.page), so it opens right away and
+        doesn't get bigger however many cards are in the database. The Treeview only ever has
+        the rows that can be seen in it, they're filled in again as you scroll.
+        
+        Clicking a column heading sorts by it (each track has an index), clicking it again
+        sorts the other way
+        
+        Searching (see CardStore.search) shows the cards that have the text anywhere in a
+        track instead, clearing the search box goes back to all of them
+    """
+    
+    #how many rows can be seen, how many are loaded from the database at a time and the most
+    #that are kept loaded
+    VISIBLE_ROWS = 25
+    PAGE_SIZE = 100
+    MAX_LOADED = 500
+    
+    COLUMNS = (('trackOne', 'Track 1'), ('trackTwo', 'Track 2'), ('trackThree', 'Track 3'))
+    
+    def __init__(self, parent, store):
+        Frame.__init__(self, parent)
+        
+        self.__store = store
+        self.__sortColumn = 'rowid'
+        self.__descending = False
+        
+        #the loaded rows, __offset is where the first one is in the sorted order
+        self.__rows = []
+        self.__offset = 0
+        
+        #where the first row that can be seen is in the sorted order
+        self.__top = 0
+        self.__count = 0
+        
+        #the cards that matched the search, None when there isn't one
+        self.__results = None
+        
+        self.__countLabel = Label(self, padx = 10, pady = 10)
+        self.__countLabel.pack(side = TOP)
+        
+        searchFrame = Frame(self)
+        searchFrame.pack(side = TOP)
+        
+        Label(searchFrame, text = "Search", padx = 10).pack(side = LEFT)
+        
+        self.__searchEntry = Entry(searchFrame, width = 40)
+        self.__searchEntry.pack(side = LEFT)
+        self.__searchEntry.bind("<Return>", lambda event: self.search())
+        
+        Button(searchFrame, text = "Search", command = self.search).pack(side = LEFT)
+        Button(searchFrame, text = "Refresh", command = self.refresh).pack(side = LEFT)
+        
+        table = Frame(self)
+        table.pack(side = TOP, fill = BOTH, expand = True)
+        
+        self.__tree = ttk.Treeview(table, columns = [column for column, heading in self.COLUMNS], height = self.VISIBLE_ROWS, selectmode = 'browse')
+        self.__tree.pack(side = LEFT, fill = BOTH, expand = True)
+        
+        self.__tree.heading('#0', text = 'Card', command = lambda: self.sort_by('rowid'))
+        self.__tree.column('#0', width = 80, stretch = False)
+        
+        for column, heading in self.COLUMNS:
+            self.__tree.heading(column, text = heading, command = lambda column = column: self.sort_by(column))
+            self.__tree.column(column, width = 200)
+        
+        #not hooked up to the Treeview, it shows where the rows are in the whole database
+        self.__scrollbar = ttk.Scrollbar(table, orient = VERTICAL, command = self.__scroll)
+        self.__scrollbar.pack(side = RIGHT, fill = Y)
+        
+        #windows and mac scroll wheels, linux scroll wheel
+        self.__tree.bind("<MouseWheel>", lambda event: self.__move(-1 if event.delta > 0 else 1))
+        self.__tree.bind("<Button-4>", lambda event: self.__move(-1))
+        self.__tree.bind("<Button-5>", lambda event: self.__move(1))
+        
+        self.__tree.bind("<Up>", lambda event: self.__move(-1))
+        self.__tree.bind("<Down>", lambda event: self.__move(1))
+        self.__tree.bind("<Prior>", lambda event: self.__move(-self.VISIBLE_ROWS))
+        self.__tree.bind("<Next>", lambda event: self.__move(self.VISIBLE_ROWS))
+        self.__tree.bind("<Home>", lambda event: self.__show(0) or "break")
+        self.__tree.bind("<End>", lambda event: self.__show(self.__count) or "break")
+        
+        self.refresh()
+        
+        
+    def refresh(self):
+        #counts the cards again (from an index) and reloads the rows, the GUI might have saved
+        #cards since the window was opened
+        if (self.__results is not None):
+            return self.search()
+        
+        try:
+            self.__count = self.__store.count()
+        except sqlite3.Error as e:
+            showerror("Database Error", str(e))
+            logger.error("%s", e)
+            return None
+        
+        self.__countLabel.config(text = str(self.__count) + " CARDS")
+        
+        self.__rows = []
+        self.__show(self.__top)
+        
+        
+    def search(self):
+        text = self.__searchEntry.get().strip()
+        
+        if (not text):
+            self.__results = None
+            self.__top = 0
+            return self.refresh()
+        
+        try:
+            results = self.__store.search(text, limit = cardStore.SEARCH_LIMIT)
+        except sqlite3.Error as e:
+            showerror("Database Error", str(e))
+            logger.error("%s", e)
+            return None
+        
+        self.__results = results
+        self.__sort_results()
+        
+        self.__count = len(results)
+        
+        if (self.__count >= cardStore.SEARCH_LIMIT):
+            self.__countLabel.config(text = "FIRST " + str(self.__count) + " MATCHES")
+        else:
+            self.__countLabel.config(text = str(self.__count) + " MATCHES")
+        
+        self.__show(0)
         
-        dbTree['columns'] = ('Track 1', 'Track 2', 'Track 3')
         
-        dbTree.column('Track 1', width=100)
-        dbTree.heading('Track 1', text='Track 1')
+    def __sort_results(self):
+        #the matches are all loaded, so they're sorted here rather than by the database
+        self.__results.sort(key = lambda row: cardStore.sort_key(row, self.__sortColumn), reverse = self.__descending)
         
-        dbTree.column('Track 2', width=100)
-        dbTree.heading('Track 2', text='Track 2')
+        self.__rows = self.__results
+        self.__offset = 0
         
-        dbTree.column('Track 3', width=100)
-        dbTree.heading('Track 3', text='Track 2')
         
-        cursor.execute("""SELECT * FROM Cards""")
-        conn.commit()
-        tracks = cursor.fetchall()
+    def sort_by(self, column):
+        if (column == self.__sortColumn):
+            self.__descending = not self.__descending
+        else:
+            self.__sortColumn = column
+            self.__descending = False
         
-        i=1
-        for track in tracks:            
-            dbTree.insert("" , END,    text="Card" + str(i), values=(track[0], track[1], track[2]))
-            i += 1
+        for name, heading in (('#0', 'Card'),) + self.COLUMNS:
+            sortName = 'rowid' if name == '#0' else name
+            
+            if (sortName == self.__sortColumn):
+                heading += " \u25BC" if self.__descending else " \u25B2"
             
+            self.__tree.heading(name, text = heading)
         
+        if (self.__results is not None):
+            self.__sort_results()
+        else:
+            self.__rows = []
         
+        self.__show(0)
         
         
+    def __move(self, rows):
+        self.__show(self.__top + rows)
         
-    def on_exit(self):        
-        conn.close()
+        #stops the Treeview from moving its own selection too
+        return "break"
         
-        if (self.__connected == True or self.__msr != None):
-            self.close_connection()
         
-        showinfo("Bye", "See ya later ;)")
-        root.destroy()
+    def __scroll(self, *args):
+        #what the scrollbar sends: moveto fraction, or scroll n units/pages
+        if (args[0] == 'moveto'):
+            self.__show(int(float(args[1]) * self.__count))
+        
+        elif (args[0] == 'scroll'):
+            amount = int(args[1])
+            
+            if (args[2] == 'pages'):
+                amount *= self.VISIBLE_ROWS
+            
+            self.__move(amount)
+            
+            
+    def __show(self, top):
+        top = max(0, min(top, self.__count - self.VISIBLE_ROWS))
+        
+        try:
+            self.__load(top)
+        except sqlite3.Error as e:
+            showerror("Database Error", str(e))
+            logger.error("%s", e)
+            return None
+        
+        self.__top = top
+        
+        self.__tree.delete(*self.__tree.get_children())
         
+        first = top - self.__offset
         
+        for i, (rowid, trackOne, trackTwo, trackThree) in enumerate(self.__rows[first:first + self.VISIBLE_ROWS]):
+            self.__tree.insert("", END, text = "Card" + str(top + i + 1), values = (trackOne, trackTwo, trackThree))
+        
+        if (self.__count > 0):
+            self.__scrollbar.set(top / self.__count, min(1.0, (top + self.VISIBLE_ROWS) / self.__count))
+        else:
+            self.__scrollbar.set(0.0, 1.0)
+            
+            
+    def __load(self, top):
+        #makes sure the rows from top to top + VISIBLE_ROWS are loaded
+        if (self.__results is not None):
+            return None
+        
+        end = top + self.VISIBLE_ROWS
+        loadedEnd = self.__offset + len(self.__rows)
+        
+        if (self.__rows and top >= self.__offset and end <= loadedEnd):
+            return None
+        
+        if (self.__rows and self.__offset <= top <= loadedEnd and end <= loadedEnd + self.PAGE_SIZE):
+            #just past the end, the next page starts after the last row
+            page = self.__store.page(self.__sortColumn, cardStore.sort_key(self.__rows[-1], self.__sortColumn), self.PAGE_SIZE, True, self.__descending)
+            self.__rows.extend(page)
+            
+            extra = len(self.__rows) - self.MAX_LOADED
+            
+            if (extra > 0):
+                del self.__rows[:extra]
+                self.__offset += extra
+                
+        elif (self.__rows and self.__offset - self.PAGE_SIZE <= top < self.__offset and end <= loadedEnd):
+            #just before the start, the page ends before the first row
+            page = self.__store.page(self.__sortColumn, cardStore.sort_key(self.__rows[0], self.__sortColumn), self.PAGE_SIZE, False, self.__descending)
+            self.__rows[:0] = page
+            self.__offset -= len(page)
+            
+            extra = len(self.__rows) - self.MAX_LOADED
+            
+            if (extra > 0):
+                del self.__rows[-extra:]
+                
+        else:
+            #somewhere else (the scrollbar was dragged), this is the only time an OFFSET is used
+            self.__offset = max(0, top - self.PAGE_SIZE // 2)
+            self.__rows = self.__store.page_at(self.__sortColumn, self.__offset, self.VISIBLE_ROWS + self.PAGE_SIZE, self.__descending)
+            
+            
+#only warnings and errors go to the console, cardReader.LOG_TRACK_DATA has to be turned on for
+#track data to be logged
+logging.basicConfig(level = logging.WARNING, format = "%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+#the buttons that are profiled when MSR605_PROFILE_DIR is set (see cardReaderProfiling.py), they
+#have to be wrapped before GUI() hands them to the buttons
+cardReaderProfiling.register(GUI, ('read_card', 'read_card_consensus', 'write_card', 'erase_card',
+                                   'view_database'))
+
 root = tk.Tk()
 root.title("MSR605 Reader/Writer")
 root.minsize(700,600)
 gui = GUI(root)
+root.report_callback_exception = gui.report_callback_exception
 
 
-conn = sqlite3.connect("cardDatabase.db") 
- 
-cursor = conn.cursor()
- 
- 
-# create a table
-cursor.execute("""CREATE TABLE if not exists Cards
-                  (trackOne text, trackTwo text, trackThree text) 
-               """)
-conn.commit()
-
 root.pack_propagate(0) # don't shrink
 
 root.protocol("WM_DELETE_WINDOW", lambda: gui.on_exit())
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+
+""" MSR605Benchmark.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows, Linux
+    Python: 3.7 or newer
+
+    Description: This times the parts of reading and saving a card that don't depend on the
+                 MSR605 (or a person swiping cards), so a change that makes one of them slower
+                 shows up
+
+                Everything runs against a fake MSR605 (BenchmarkTransport) that answers
+                instantly:
+                    read_until: pulling one track out of the receive buffer
+                    read_response_parser: ReadResponseParser going through a read response
+                    read_card: a whole read_card, command to tracks
+                    iso_check: iso_standard_track_check on every character of a track
+                    iso_filter_track: filter_track on a whole track (per character)
+                    write_card: building and sending the write command
+                    sqlite_insert_<rows>: filling the card database (CardStore) to <rows> rows
+                    sqlite_duplicate_<rows>: the Save Duplicate Cards lookup at <rows> rows
+                    sqlite_search_<rows>: searching for part of a PAN at <rows> rows
+                    sqlite_autosave: saving one read card the way the GUI does
+
+                The results are saved as JSON, give the last run's file to --compare to see
+                what got faster or slower:
+                    python3 MSR605Benchmark.py --output before.json
+                    ...
+                    python3 MSR605Benchmark.py --output after.json --compare before.json
+
+                The Cards table is filled to 10,000 rows unless --rows says otherwise (ex:
+                --rows 10000 100000). --full runs the sizes the card database is meant to
+                handle, 10 thousand, 1 million and 10 million rows (the 10 million row database
+                is over 1GB and takes a while to fill). Only runs with the same sizes can be
+                compared at every size, the sizes are saved with the results
+"""
+
+
+import argparse, json, os, platform, subprocess, sys, tempfile, time, timeit
+
+import cardReader, cardReaderMetrics
+
+from cardReaderTransport import Transport
+from cardStore import CardStore
+from isoStandardDictionary import iso_standard_track_check, filter_track
+from readResponseParser import ReadResponseParser
+
+
+#the card every benchmark reads, the same format as the cards in msr605Emulator.py
+TRACKS = ['B4111111111111111^DOE/JOHN^2512101000000000000000000000000',
+          '4111111111111111=25121010000000000000', '']
+
+ESCAPE = cardReader.ESCAPE
+
+#the read command's response, the way the MSR605 (and the emulator) sends it
+READ_RESPONSE = (ESCAPE + b's' + ESCAPE + b'\x01%' + TRACKS[0].encode() + b'?' + ESCAPE +
+                 b'\x02;' + TRACKS[1].encode() + b'?' + ESCAPE + b'\x03' +
+                 cardReader.FILE_SEPERATOR + ESCAPE + b'0')
+
+#the rows are put in the database this many at a time
+INSERT_BATCH = 10000
+
+DEFAULT_ROWS = (10000,)
+
+#--full
+FULL_ROWS = (10000, 1000000, 10000000)
+
+#how long (in seconds) each timeit run should take, the number of loops is picked to fit
+TARGET_SECONDS = 0.2
+
+
+class BenchmarkTransport(Transport):
+    """A fake MSR605 that answers every command straight away (see cardReaderTransport.py)
+
+        Only the commands the benchmarks use are answered: the communication test, read and
+        write, everything else gets no response
+    """
+
+    def __init__(self):
+        self.port = "benchmark"
+        self.__timeout = None
+        self.__pending = bytearray()
+
+    @property
+    def in_waiting(self):
+        return len(self.__pending)
+
+    @property
+    def timeout(self):
+        return self.__timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self.__timeout = timeout
+
+    def read(self, size=1):
+        data = bytes(self.__pending[:size])
+        del self.__pending[:size]
+        return data
+
+    def write(self, data):
+        code = data[1:2]
+
+        if (code == cardReader.COMMUNICATIONS_TEST):
+            self.__pending += ESCAPE + b'y'
+        elif (code == cardReader.READ):
+            self.__pending += READ_RESPONSE
+        elif (code == cardReader.WRITE):
+            self.__pending += ESCAPE + b'0'
+
+        return len(data)
+
+    def queue(self, data):
+        """Puts data in the fake receive buffer, as if the MSR605 sent it"""
+
+        self.__pending += data
+
+    def flush(self):
+        pass
+
+    def flushInput(self):
+        self.__pending.clear()
+
+    def flushOutput(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def time_it(function, number=None, repeat=5):
+    """Times a function with timeit
+
+        Args:
+            function: what to time, it's called with no arguments
+
+            number: how many times to call it per run, picked so a run takes about
+                    TARGET_SECONDS if it is None
+
+            repeat: how many runs, the fastest one is kept (the others were slowed down by
+                    something else on the computer)
+
+        Returns:
+            A dictionary with the result, see run_benchmarks
+    """
+
+    timer = timeit.Timer(function)
+
+    if (number is None):
+        number = 1
+
+        while True:
+            if (timer.timeit(number) >= TARGET_SECONDS / 10 or number >= 10 ** 7):
+                break
+
+            number *= 10
+
+        number = max(1, int(number * TARGET_SECONDS / max(timer.timeit(number), 1e-9)))
+
+    best = min(timer.repeat(repeat, number))
+
+    return result(best, number, repeat)
+
+
+def result(seconds, number, repeat=1):
+    """The dictionary saved for each benchmark, seconds is how long number operations took"""
+
+    return {
+        'number': number,
+        'repeat': repeat,
+        'seconds': seconds,
+        'us_per_op': seconds / number * 1e6,
+        'ops_per_sec': number / seconds if seconds > 0 else None,
+    }
+
+
+def reader_benchmarks():
+    """Times the CardReader side (parsing, ISO checks and building commands)"""
+
+    transport = BenchmarkTransport()
+
+    #its own metrics so the benchmark doesn't fill up DEFAULT_METRICS
+    msr = cardReader.CardReader(transport, cardReaderMetrics.CardReaderMetrics())
+
+    results = {}
+
+    track = b'%' + TRACKS[0].encode() + b'?' + ESCAPE
+
+    def read_until():
+        transport.queue(track)
+        msr.read_until(ESCAPE, 1, True)
+
+    results['read_until'] = time_it(read_until)
+
+    def read_response_parser():
+        parser = ReadResponseParser()
+        parser.feed(memoryview(READ_RESPONSE))
+
+    results['read_response_parser'] = time_it(read_response_parser)
+
+    results['read_card'] = time_it(msr.read_card)
+
+    #every character of the track, the number of operations is characters not tracks
+    characters = TRACKS[0]
+
+    def iso_check():
+        for char in characters:
+            iso_standard_track_check(char, 1)
+
+    perTrack = time_it(iso_check)
+    results['iso_check'] = result(perTrack['seconds'], perTrack['number'] * len(characters),
+                                  perTrack['repeat'])
+
+    trackBytes = characters.encode()
+
+    perTrack = time_it(lambda: filter_track(trackBytes, 1))
+    results['iso_filter_track'] = result(perTrack['seconds'],
+                                         perTrack['number'] * len(characters), perTrack['repeat'])
+
+    results['write_card'] = time_it(lambda: msr.write_card(TRACKS, True))
+
+    msr.close_serial_connection()
+
+    return results
+
+
+def card_rows(start, count):
+    """Makes count different cards for the database, the same length as a real card"""
+
+    for i in range(start, start + count):
+        pan = "4%015d" % i
+        yield ("B" + pan + "^DOE/JOHN^2512101000000000000000000000000",
+               pan + "=25121010000000000000", "")
+
+
+def sqlite_benchmarks(directory, rowCounts):
+    """Times the card database (CardStore, what GUI.py uses) for each number of rows"""
+
+    results = {}
+
+    for rows in sorted(rowCounts):
+        path = os.path.join(directory, "cards_" + str(rows) + ".db")
+        store = CardStore(path)
+
+        start = time.perf_counter()
+
+        for batch in range(0, rows, INSERT_BATCH):
+            store.insert_many(card_rows(batch, min(INSERT_BATCH, rows - batch)))
+
+        results['sqlite_insert_' + str(rows)] = result(time.perf_counter() - start, rows)
+
+        #cards spread out through the table
+        lookups = [next(card_rows(rows * i // 4 + rows // 8, 1)) for i in range(4)]
+        position = [0]
+
+        def duplicate():
+            store.contains(lookups[position[0] % len(lookups)])
+            position[0] += 1
+
+        results['sqlite_duplicate_' + str(rows)] = time_it(duplicate, repeat=3)
+
+        #the end of each PAN, only a few cards have it
+        fragments = [card[1][8:16] for card in lookups]
+
+        def search():
+            store.search(fragments[position[0] % len(fragments)])
+            position[0] += 1
+
+        results['sqlite_search_' + str(rows)] = time_it(search, repeat=3)
+
+        #GUI.read_card with autosave on and duplicates off, on the smallest table (the commits
+        #are what is slow, not the table)
+        if (rows == min(rowCounts)):
+            newCards = card_rows(rows, 10 ** 9)
+
+            def autosave():
+                store.insert(next(newCards), allowDuplicates=False)
+
+            results['sqlite_autosave'] = time_it(autosave, number=100, repeat=3)
+
+        store.close()
+
+        for suffix in ("", "-wal", "-shm"):
+            if (os.path.exists(path + suffix)):
+                os.remove(path + suffix)
+
+    return results
+
+
+def git_version():
+    """The git commit the benchmark was run on, None if it isn't a git checkout"""
+
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(rowCounts=DEFAULT_ROWS, only=None, directory=None):
+    """Runs the benchmarks
+
+        Args:
+            rowCounts: the sizes of the Cards table to time SQLite at
+
+            only: list of benchmark groups to run ('reader', 'sqlite'), all of them if None
+
+            directory: where to put the SQLite databases, a temporary directory if None
+
+        Returns:
+            A dictionary that can be saved as JSON:
+                {
+                    'version': the git commit,
+                    'python': the python version,
+                    'platform': the OS,
+                    'time': when it was run (time.time()),
+                    'rows': the sizes of the Cards table that were timed,
+                    'results': {
+                        benchmark name: {
+                            'number': operations per run,
+                            'repeat': runs,
+                            'seconds': how long the fastest run took,
+                            'us_per_op': microseconds per operation,
+                            'ops_per_sec': operations per second
+                        }
+                    }
+                }
+    """
+
+    results = {}
+
+    if (only is None or 'reader' in only):
+        results.update(reader_benchmarks())
+
+    if (only is None or 'sqlite' in only):
+        if (directory is None):
+            with tempfile.TemporaryDirectory(prefix="msr605bench") as tempDirectory:
+                results.update(sqlite_benchmarks(tempDirectory, rowCounts))
+        else:
+            results.update(sqlite_benchmarks(directory, rowCounts))
+
+    return {
+        'version': git_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.time(),
+        'rows': sorted(rowCounts) if only is None or 'sqlite' in only else [],
+        'results': results,
+    }
+
+
+def print_results(run, baseline=None):
+    """Prints a table of the results, with the change from baseline if one is given"""
+
+    print("%-28s %12s %14s %10s" % ("BENCHMARK", "US/OP", "OPS/SEC", "CHANGE"))
+
+    for name, benchmark in sorted(run['results'].items()):
+        change = ""
+
+        if (baseline is not None and name in baseline['results']):
+            before = baseline['results'][name]['us_per_op']
+
+            #more than 1 is slower than the baseline
+            change = "%.2fx" % (benchmark['us_per_op'] / before) if before else ""
+
+        opsPerSec = benchmark['ops_per_sec']
+
+        print("%-28s %12.3f %14s %10s" % (name, benchmark['us_per_op'],
+                                          "%.0f" % opsPerSec if opsPerSec else "-", change))
+
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description="Times card parsing, the ISO checks, "
+                                                    "building commands and the card database")
+    sizes = arguments.add_mutually_exclusive_group()
+    sizes.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS),
+                       help="sizes of the Cards table to time, ex: 10000 100000")
+    sizes.add_argument("--full", action="store_const", dest="rows", const=list(FULL_ROWS),
+                       help="time the Cards table at 10k, 1M and 10M rows")
+    arguments.add_argument("--only", nargs="+", choices=("reader", "sqlite"),
+                           help="only run these benchmarks")
+    arguments.add_argument("--output", default="benchmark.json",
+                           help="where to save the results (JSON)")
+    arguments.add_argument("--compare", help="results from an earlier run to compare with")
+    arguments.add_argument("--directory", help="where to put the databases (temporary "
+                                               "directory by default)")
+    args = arguments.parse_args()
+
+    baseline = None
+
+    if (args.compare):
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    run = run_benchmarks(args.rows, args.only, args.directory)
+
+    with open(args.output, 'w') as f:
+        json.dump(run, f, indent=4, sort_keys=True)
+
+    print_results(run, baseline)
+
+    if (baseline is not None and baseline.get('rows') != run['rows']):
+        print("\nTHE BASELINE WAS RUN WITH " + str(baseline.get('rows')) + " ROWS, THIS RUN WITH " +
+              str(run['rows']) + ", ONLY THE SIZES IN BOTH ARE COMPARED")
+    print("\nSAVED TO " + args.output)
+
+    sys.exit(0)
@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 
-import sys, time, cardReaderExceptions, cardReader
+import sys, time, logging, cardReaderExceptions, cardReader
+
+
+#this is a test of every function so show everything cardReader logs, the track data is still
+#redacted unless MSR605_LOG_TRACK_DATA=1 is set
+logging.basicConfig(level = logging.DEBUG, format = "%(message)s")
 
 
 #INITIALIZE MSR605
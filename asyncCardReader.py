@@ -0,0 +1,829 @@
+#!/usr/bin/env python3
+
+""" asyncCardReader.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Linux (the event loop has to support add_reader, the Windows proactor loop
+              doesn't)
+    Python: 3.7 or newer
+
+    Description: This is an asyncio version of CardReader, every command is a coroutine
+
+                Instead of a thread blocking on the serial port, the serial port's file
+                descriptor is registered with the event loop (loop.add_reader) and the
+                coroutines wait for bytes to come in. One process can drive lots of MSR605's
+                (and a network frontend) without a thread for each one.
+
+                Every command takes an optional timeout (seconds). If the timeout runs out,
+                or the task running the command is cancelled, a RESET is sent so the MSR605
+                stops waiting for a swipe and is ready for the next command, then
+                asyncio.TimeoutError (or CancelledError) is raised.
+
+                Example:
+                    msr = await AsyncCardReader.connect('/dev/ttyUSB0')
+
+                    try:
+                        tracks = await msr.read_card(timeout=30)
+                    except asyncio.TimeoutError:
+                        print("nobody swiped a card")
+
+                    msr.close()
+
+                The responses are checked the same way CardReader checks them and the same
+                exceptions (from cardReaderExceptions.py) are raised. The raw read/write and
+                BPI/BPC commands are here too, read_card parses the tracks with the BPI and BPC
+                this AsyncCardReader last set (the ISO standard ones until then), the same as
+                CardReader
+"""
+
+
+import asyncio
+
+import serial
+
+import cardReaderExceptions
+from cardReader import ESCAPE, RESET, READ, WRITE, READ_RAW, WRITE_RAW, COMMUNICATIONS_TEST, \
+        ALL_LED_OFF, ALL_LED_ON, GREEN_LED_ON, YELLOW_LED_ON, RED_LED_ON, SENSOR_TEST, \
+        RAM_TEST, ERASE_CARD, DEVICE_MODEL, FIRMWARE, HI_CO, LOW_CO, HI_OR_LOW_CO, SET_BPC, \
+        BPI_FRAMES, START_OF_HEADING, START_OF_TEXT, END_OF_TEXT, FILE_SEPERATOR, \
+        PROBE_TIMEOUT, status_check
+from cardReaderTransport import SerialTransport
+from readResponseParser import ReadResponseParser, RawReadResponseParser, ISO_BITS_PER_INCH, \
+        ISO_BITS_PER_CHARACTER, track_length_limit
+
+
+#the most bytes skipped looking for the ESCAPE of a coercivity response (the rest of the
+#firmware version, EVU3.10, is sometimes sent before it), anything longer isn't that
+ESCAPE_SKIP_LIMIT = 32
+
+
+class AsyncCardReader():
+    """Allows interfacing with the MSR605 from asyncio
+
+        Only one command runs at a time, a command that is called while another one is
+        running waits for it to finish
+
+        Attributes:
+            None
+    """
+
+    def __init__(self, transport, loop=None):
+        """Registers the transport with the event loop
+
+            Use AsyncCardReader.connect() to open a port and initialize the MSR605, this is
+            for a transport that is already open
+
+            Args:
+                transport: an open transport with a fileno() (ex: SerialTransport), it should
+                            have been opened with timeout=0 so reads never block
+
+                loop: the event loop to use, the running one if None (so without a loop
+                        this has to be called from a coroutine, like connect does)
+
+            Returns:
+                Nothing
+
+            Raises:
+                RuntimeError: loop is None and no event loop is running
+        """
+
+        self.__transport = transport
+        self.__loop = loop if loop is not None else asyncio.get_running_loop()
+
+        self.__rxBuffer = bytearray()
+        self.__rxPos = 0
+        self.__waiter = None
+        self.__error = None
+        self.__lock = asyncio.Lock()
+
+        #the density and bits per character of each track, see set_bpi and set_bpc
+        self.__bpi = list(ISO_BITS_PER_INCH)
+        self.__bpc = list(ISO_BITS_PER_CHARACTER)
+
+        self.__fd = transport.fileno()
+        self.__loop.add_reader(self.__fd, self.__on_readable)
+
+
+    @classmethod
+    async def connect(cls, port, timeout=PROBE_TIMEOUT):
+        """Opens a serial port and initializes the MSR605 on it (reset, communication test,
+            reset), the same way CardReader does
+
+            Args:
+                port: the name of the serial port, ex: /dev/ttyUSB0
+
+                timeout: how long (in seconds) the MSR605 gets to pass the communication test
+
+            Returns:
+                An AsyncCardReader
+
+            Raises:
+                MSR605ConnectError: the port couldn't be opened
+
+                CommunicationTestError: the MSR605 didn't pass the communication test
+        """
+
+        try:
+            transport = SerialTransport(port, timeout=0)
+        except(serial.SerialException, OSError) as e:
+            raise cardReaderExceptions.MSR605ConnectError("COULDN'T OPEN " + port + ": " + str(e))
+
+        reader = cls(transport)
+
+        try:
+            await reader.reset()
+
+            try:
+                await reader.communication_test(timeout=timeout)
+            except asyncio.TimeoutError:
+                raise cardReaderExceptions.CommunicationTestError("COMMUNICATION ERROR, no "
+                                                                  "response from " + port)
+
+            await reader.reset()
+
+        except BaseException:
+            reader.close()
+            raise
+
+        return reader
+
+
+    def close(self):
+        """Unregisters the serial port from the event loop and closes it"""
+
+        if (self.__fd is not None):
+            self.__loop.remove_reader(self.__fd)
+            self.__fd = None
+
+        self.__transport.close()
+
+
+    # **************************************************
+    #
+    #        MSR605 Read/Write/Erase Card Functions
+    #
+    # **************************************************
+
+    async def read_card(self, timeout=None):
+        """Reads a card, see CardReader.read_card
+
+            Args:
+                timeout: optional, seconds to wait for the swipe
+
+            Returns:
+                A list of the 3 tracks
+
+            Raises:
+                CardReadError, StatusError: same as CardReader.read_card
+
+                asyncio.TimeoutError: the timeout ran out, the MSR605 has been reset
+        """
+
+        return await self.__run(self.__read_card(), timeout)
+
+
+    async def write_card(self, tracks, statusByteCheck=True, timeout=None):
+        """Writes a card, see CardReader.write_card
+
+            Args:
+                tracks: list of the 3 tracks, each one has to fit on the track at the
+                        current BPI and BPC (see track_capacity)
+
+                statusByteCheck: if True the Status Byte is checked
+
+                timeout: optional, seconds to wait for the swipe
+
+            Returns:
+                Nothing
+
+            Raises:
+                CardWriteError, StatusError: same as CardReader.write_card
+
+                asyncio.TimeoutError: the timeout ran out, the MSR605 has been reset
+        """
+
+        return await self.__run(self.__write_card(tracks, statusByteCheck), timeout)
+
+
+    async def erase_card(self, trackSelect, timeout=None):
+        """Erases a card, see CardReader.erase_card for trackSelect
+
+            Raises:
+                EraseCardError: same as CardReader.erase_card
+
+                asyncio.TimeoutError: the timeout ran out, the MSR605 has been reset
+        """
+
+        if not(trackSelect >= 0 and trackSelect <=7 and trackSelect != 1):
+            raise cardReaderExceptions.EraseCardError("Track selection provided is invalid, has to "
+                                                        "between 0-7")
+
+        return await self.__run(self.__erase_card(trackSelect), timeout)
+
+
+    async def read_raw(self, timeout=None):
+        """Reads the raw data of a card, see CardReader.read_raw
+
+            Returns:
+                A list of the 3 raw tracks (bytes)
+
+            Raises:
+                CardReadError, StatusError: same as CardReader.read_raw
+
+                asyncio.TimeoutError: the timeout ran out, the MSR605 has been reset
+        """
+
+        return await self.__run(self.__read_raw(), timeout)
+
+
+    async def write_raw(self, tracks, statusByteCheck=True, timeout=None):
+        """Writes raw data to a card, see CardReader.write_raw
+
+            Raises:
+                CardWriteError, StatusError: same as CardReader.write_raw
+
+                asyncio.TimeoutError: the timeout ran out, the MSR605 has been reset
+        """
+
+        return await self.__run(self.__write_raw(tracks, statusByteCheck), timeout)
+
+
+    async def reset(self):
+        """Resets the MSR605 to its initial state, there is no response"""
+
+        async with self.__lock:
+            self.__send_reset()
+
+
+    # **********************************
+    #
+    #        LED Functions
+    #
+    # **********************************
+
+    async def led_off(self):
+        await self.__run(self.__command(ESCAPE + ALL_LED_OFF), None)
+
+    async def led_on(self):
+        await self.__run(self.__command(ESCAPE + ALL_LED_ON), None)
+
+    async def green_led_on(self):
+        await self.__run(self.__command(ESCAPE + GREEN_LED_ON), None)
+
+    async def yellow_led_on(self):
+        await self.__run(self.__command(ESCAPE + YELLOW_LED_ON), None)
+
+    async def red_led_on(self):
+        await self.__run(self.__command(ESCAPE + RED_LED_ON), None)
+
+
+    # ****************************************
+    #
+    #        MSR605 Hardware Test Functions
+    #
+    # ****************************************
+
+    async def communication_test(self, timeout=None):
+        """See CardReader.communication_test, raises CommunicationTestError"""
+
+        return await self.__run(self.__communication_test(), timeout)
+
+
+    async def sensor_test(self, timeout=None):
+        """See CardReader.sensor_test (needs a swipe), raises SensorTestError"""
+
+        return await self.__run(self.__sensor_test(), timeout)
+
+
+    async def ram_test(self, timeout=None):
+        """See CardReader.ram_test, raises RamTestError"""
+
+        return await self.__run(self.__ram_test(), timeout)
+
+
+    # **********************************
+    #
+    #     MSR605 Coercivity functions
+    #
+    # **********************************
+
+    async def set_hi_co(self, timeout=None):
+        """See CardReader.set_hi_co, raises SetCoercivityError"""
+
+        return await self.__run(self.__set_coercivity(HI_CO, "high", "HI-CO"), timeout)
+
+
+    async def set_low_co(self, timeout=None):
+        """See CardReader.set_low_co, raises SetCoercivityError"""
+
+        return await self.__run(self.__set_coercivity(LOW_CO, "low", "LOW-CO"), timeout)
+
+
+    async def get_hi_or_low_co(self, timeout=None):
+        """See CardReader.get_hi_or_low_co, returns "HI-CO" or "LOW-CO" """
+
+        return await self.__run(self.__get_hi_or_low_co(), timeout)
+
+
+    # **********************************
+    #
+    #     MSR605 BPI/BPC functions
+    #
+    # **********************************
+
+    async def set_bpi(self, track, density, timeout=None):
+        """See CardReader.set_bpi, raises SetBPIError"""
+
+        frame = BPI_FRAMES.get((track, density))
+
+        if (frame is None):
+            raise cardReaderExceptions.SetBPIError("SETTING THE BPI ERROR, the track has to be 1, 2 "
+                                                   "or 3 and the density 75 or 210", track)
+
+        return await self.__run(self.__set_bpi(frame, track, density), timeout)
+
+
+    async def set_bpc(self, track1, track2, track3, timeout=None):
+        """See CardReader.set_bpc, raises SetBPCError"""
+
+        bpc = [track1, track2, track3]
+
+        for bits in bpc:
+            if not (isinstance(bits, int) and bits >= 5 and bits <= 8):
+                raise cardReaderExceptions.SetBPCError("SETTING THE BPC ERROR, the bits per "
+                                                       "character have to be between 5 and 8")
+
+        return await self.__run(self.__set_bpc(bpc), timeout)
+
+
+    def get_bpi(self):
+        """Returns a list with the density of each track, see CardReader.get_bpi"""
+
+        return list(self.__bpi)
+
+
+    def get_bpc(self):
+        """Returns a list with the bits per character of each track, see CardReader.get_bpc"""
+
+        return list(self.__bpc)
+
+
+    def track_capacity(self, trackNum):
+        """Returns how many characters fit on a track at its current BPI and BPC"""
+
+        return track_length_limit(trackNum, self.__bpi[trackNum - 1], self.__bpc[trackNum - 1])
+
+
+    # ***********************
+    #
+    #     Setter/Getters
+    #
+    # ***********************
+
+    async def get_device_model(self, timeout=None):
+        """See CardReader.get_device_model, raises GetDeviceModelError"""
+
+        return await self.__run(self.__get_device_model(), timeout)
+
+
+    async def get_firmware_version(self, timeout=None):
+        """See CardReader.get_firmware_version, raises GetFirmwareVersionError"""
+
+        return await self.__run(self.__get_firmware_version(), timeout)
+
+
+    # ***************************************************
+    #
+    #     The commands, these run while holding the lock
+    #
+    # ***************************************************
+
+    async def __read_card(self):
+        await self.__command(ESCAPE + READ)
+
+        response = await self.__parse_response(ReadResponseParser(True, self.__bpi, self.__bpc))
+
+        if (response.errorField == "Datablock"):
+            #CardReader.read_card returns this one rather than raising it
+            return cardReaderExceptions.CardReadError(response.error, None)
+
+        if (response.errorField == "Ending"):
+            raise cardReaderExceptions.CardReadError(response.error, response.tracks)
+
+        status_check(response.status)
+
+        return response.tracks
+
+
+    async def __write_card(self, tracks, statusByteCheck):
+        for trackNum in range(1, 4):
+            if (len(tracks[trackNum - 1]) > self.track_capacity(trackNum)):
+                raise cardReaderExceptions.CardWriteError("WRITE ERROR, TRACK " + str(trackNum) +
+                                                          " is longer than the " +
+                                                          str(self.track_capacity(trackNum)) +
+                                                          " characters that fit at the current "
+                                                          "BPI and BPC")
+
+        dataToWrite = (ESCAPE + b's' + ESCAPE + START_OF_HEADING + (tracks[0]).encode() + ESCAPE +
+        START_OF_TEXT + (tracks[1]).encode() + ESCAPE + END_OF_TEXT + (tracks[2]).encode()  + FILE_SEPERATOR)
+
+        await self.__command(ESCAPE + WRITE + dataToWrite)
+
+        if (await self.__read_byte() != ESCAPE):
+            raise cardReaderExceptions.CardWriteError("[Datablock] WRITE ERROR, R/W Data Field, "
+                                                      "looking for ESCAPE(\x1B)")
+
+        status = (await self.__read_byte()).decode('latin-1')
+
+        if (statusByteCheck):
+            status_check(status)
+
+        return None
+
+
+    async def __read_raw(self):
+        await self.__command(ESCAPE + READ_RAW)
+
+        response = await self.__parse_response(RawReadResponseParser())
+
+        if (response.errorField is not None):
+            raise cardReaderExceptions.CardReadError(response.error, response.tracks)
+
+        status_check(response.status)
+
+        return response.tracks
+
+
+    async def __write_raw(self, tracks, statusByteCheck):
+        dataToWrite = bytearray(ESCAPE + b's')
+
+        for trackNum in range(1, 4):
+            track = tracks[trackNum - 1]
+
+            #the length has to fit in one byte
+            if (len(track) > 255):
+                raise cardReaderExceptions.CardWriteError("RAW WRITE ERROR, TRACK " + str(trackNum) +
+                                                          " is longer than 255 bytes")
+
+            dataToWrite += ESCAPE + bytes((trackNum, len(track)))
+            dataToWrite += track
+
+        dataToWrite += b'?' + FILE_SEPERATOR
+
+        await self.__command(ESCAPE + WRITE_RAW + dataToWrite)
+
+        if (await self.__read_byte() != ESCAPE):
+            raise cardReaderExceptions.CardWriteError("[Datablock] RAW WRITE ERROR, R/W Data "
+                                                      "Field, looking for ESCAPE(\x1B)")
+
+        status = (await self.__read_byte()).decode('latin-1')
+
+        if (statusByteCheck):
+            status_check(status)
+
+        return None
+
+
+    async def __erase_card(self, trackSelect):
+        await self.__command(ESCAPE + ERASE_CARD + (str(trackSelect)).encode())
+
+        if (await self.__read_byte() != ESCAPE):
+            raise cardReaderExceptions.EraseCardError("ERASE CARD ERROR, looking for ESCAPE(\x1B)")
+
+        eraseCardResponse = await self.__read_byte()
+
+        if eraseCardResponse != b'0':
+            if eraseCardResponse != b'A':
+                raise cardReaderExceptions.EraseCardError("ERASE CARD ERROR, looking for A(\x41), "
+                                                "the card was not erased but the erasing "
+                                                "didn't fail, so this is a weird case")
+            else:
+                raise cardReaderExceptions.EraseCardError("ERASE CARD ERROR, the card might have not "
+                                                "been erased")
+
+        return None
+
+
+    async def __communication_test(self):
+        await self.__command(ESCAPE + COMMUNICATIONS_TEST)
+
+        if (await self.__read_byte() != ESCAPE):
+            raise cardReaderExceptions.CommunicationTestError("COMMUNICATION ERROR, looking for "
+                                                              "ESCAPE(\x1B)")
+
+        if (await self.__read_byte() != b'y'):
+            raise cardReaderExceptions.CommunicationTestError("COMMUNICATION ERROR, looking for "
+                                                              "y(\x79)")
+
+        return None
+
+
+    async def __sensor_test(self):
+        await self.__command(ESCAPE + SENSOR_TEST)
+
+        if (await self.__read_byte() != ESCAPE):
+            raise cardReaderExceptions.SensorTestError("SENSOR TEST ERROR, looking for ESCAPE(\x1B)")
+
+        if (await self.__read_byte() != b'0'):
+            raise cardReaderExceptions.SensorTestError("SENSOR TEST ERROR, looking for 0(\x30)")
+
+        return None
+
+
+    async def __ram_test(self):
+        await self.__command(ESCAPE + RAM_TEST)
+
+        if (await self.__read_byte() != ESCAPE):
+            raise cardReaderExceptions.RamTestError("RAM TEST ERROR, looking for ESCAPE(\x1B)")
+
+        ramTestResponse = await self.__read_byte()
+
+        if ramTestResponse != b'0':
+            if ramTestResponse != b'A':
+                raise cardReaderExceptions.RamTestError("RAM TEST ERROR, looking for A(\x41), the "
+                                              "RAM is not ok but the RAM hasn't failed a "
+                                              "test either, so this is a weird case")
+            else:
+                raise cardReaderExceptions.RamTestError("RAM TEST ERROR, the RAM test has failed")
+
+        return None
+
+
+    async def __set_coercivity(self, command, coercivity, name):
+        await self.__command(ESCAPE + command)
+
+        await self.__read_escape(lambda message: cardReaderExceptions.SetCoercivityError(
+            "SETTING THE DEVICE TO " + name + " ERROR, " + message, coercivity))
+
+        if (await self.__read_byte() != b'0'):
+            raise cardReaderExceptions.SetCoercivityError("SETTING THE DEVICE TO " + name +
+                                                        " ERROR, looking for 0(\x30), Device "
+                                                        "might have not been set to " + name,
+                                                        coercivity)
+
+        return None
+
+
+    async def __set_bpi(self, frame, track, density):
+        await self.__command(frame)
+
+        if (await self.__read_byte() != ESCAPE):
+            raise cardReaderExceptions.SetBPIError("SETTING THE BPI ERROR, looking for "
+                                                   "ESCAPE(\x1B)", track)
+
+        if (await self.__read_byte() != b'0'):
+            raise cardReaderExceptions.SetBPIError("SETTING THE BPI ERROR, looking for 0(\x30), "
+                                                   "the BPI might have not been set", track)
+
+        self.__bpi[track - 1] = density
+
+        return None
+
+
+    async def __set_bpc(self, bpc):
+        await self.__command(ESCAPE + SET_BPC + bytes(bpc))
+
+        if (await self.__read_byte() != ESCAPE):
+            raise cardReaderExceptions.SetBPCError("SETTING THE BPC ERROR, looking for "
+                                                   "ESCAPE(\x1B)")
+
+        if (await self.__read_byte() != b'0'):
+            raise cardReaderExceptions.SetBPCError("SETTING THE BPC ERROR, looking for 0(\x30), "
+                                                   "the BPC might have not been set")
+
+        #the MSR605 sends back the BPC it was set to
+        for bits in bpc:
+            if (await self.__read_byte() != bytes((bits,))):
+                raise cardReaderExceptions.SetBPCError("SETTING THE BPC ERROR, the MSR605 sent "
+                                                       "back a different BPC")
+
+        self.__bpc = bpc
+
+        return None
+
+
+    async def __get_hi_or_low_co(self):
+        await self.__command(ESCAPE + HI_OR_LOW_CO)
+
+        await self.__read_escape(lambda message: cardReaderExceptions.GetCoercivityError(
+            "HI-CO OR LOW-CO ERROR, " + message))
+
+        coMode = await self.__read_byte()
+
+        if coMode == b'h':
+            return "HI-CO"
+
+        elif coMode == b'l':
+            return "LOW-CO"
+
+        raise cardReaderExceptions.GetCoercivityError("HI-CO OR LOW-CO ERROR, looking for H(\x48) "
+                                            "or L(\x4C)")
+
+
+    async def __get_device_model(self):
+        await self.__command(ESCAPE + DEVICE_MODEL)
+
+        if (await self.__read_byte() != ESCAPE):
+            raise cardReaderExceptions.GetDeviceModelError("GETTING DEVICE MODEL ERROR, looking "
+                                                 "for ESCAPE(\x1B)")
+
+        model = (await self.__read_byte()).decode('latin-1')
+
+        if (await self.__read_byte() != b'S'):
+            raise cardReaderExceptions.GetDeviceModelError("GETTING DEVICE MODEL ERROR, looking for "
+                                                            "S(\x53), check the response, the model "
+                                                            "might be right")
+
+        return model
+
+
+    async def __get_firmware_version(self):
+        await self.__command(ESCAPE + FIRMWARE)
+
+        if (await self.__read_byte() != ESCAPE):
+            raise cardReaderExceptions.GetFirmwareVersionError("GETTING FIRMWARE VERSION ERROR, "
+                                                    "looking for ESCAPE(\x1B)")
+
+        return (await self.__read_byte()).decode('latin-1')
+
+
+    # ***************************************************
+    #
+    #     Data Processing
+    #
+    # ***************************************************
+
+    async def __run(self, operation, timeout):
+        """Runs one of the command coroutines while holding the lock
+
+            If the timeout runs out or the task is cancelled the MSR605 is reset, so it
+            isn't left waiting for a swipe
+
+            Args:
+                operation: the command coroutine
+
+                timeout: seconds, or None to wait forever
+
+            Returns:
+                What the command returns
+
+            Raises:
+                What the command raises, asyncio.TimeoutError, asyncio.CancelledError
+        """
+
+        async with self.__lock:
+            try:
+                if (timeout is None):
+                    return await operation
+
+                return await asyncio.wait_for(operation, timeout)
+
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                self.__send_reset()
+                raise
+
+
+    async def __command(self, command):
+        """Writes a command to the MSR605"""
+
+        self.__transport.write(command)
+        self.__transport.flush()
+
+
+    def __send_reset(self):
+        """Throws away anything received and sends RESET, see CardReader.reset"""
+
+        self.__transport.flushInput()
+        self.__transport.flushOutput()
+        self.__clear_buffer()
+
+        self.__transport.write(ESCAPE + RESET)
+        self.__transport.flush()
+
+
+    async def __read_escape(self, error):
+        """Reads the ESCAPE at the start of a coercivity response
+
+            Sometimes there is an EVU3.10 (the rest of the firmware version) before the
+            ESCAPE, it is skipped the same way CardReader skips it, but only up to
+            ESCAPE_SKIP_LIMIT bytes so an MSR605 sending garbage doesn't keep it going
+            until the timeout
+
+            Args:
+                error: function that makes the exception to raise from a message
+
+            Returns:
+                Nothing
+
+            Raises:
+                What error makes, the ESCAPE wasn't found
+        """
+
+        if (await self.__read_byte() == ESCAPE):
+            return None
+
+        #just read until the 0 of the EVU3.10 response
+        skipped = 1
+
+        while (await self.__read_byte() != b'0'):
+            skipped += 1
+
+            if (skipped >= ESCAPE_SKIP_LIMIT):
+                raise error("skipped " + str(skipped) + " bytes looking for ESCAPE(\x1B), the "
+                            "MSR605 is sending something else")
+
+        if (await self.__read_byte() != ESCAPE):
+            raise error("looking for ESCAPE(\x1B)")
+
+        return None
+
+
+    async def __parse_response(self, parser):
+        """Feeds the receive buffer to a parser until it has the whole response"""
+
+        while True:
+            if (self.__rxPos >= len(self.__rxBuffer)):
+                self.__clear_buffer()
+                await self.__wait_for_data()
+                continue
+
+            with memoryview(self.__rxBuffer) as view:
+                with view[self.__rxPos:] as chunk:
+                    result = parser.feed(chunk)
+
+            self.__rxPos += parser.bytesUsed
+
+            if (result is not None):
+                return result
+
+
+    async def __read_byte(self):
+        """Returns the next byte of the response, waits for it if it isn't here yet"""
+
+        while (self.__rxPos >= len(self.__rxBuffer)):
+            self.__clear_buffer()
+            await self.__wait_for_data()
+
+        byte = self.__rxBuffer[self.__rxPos:self.__rxPos + 1]
+        self.__rxPos += 1
+
+        return bytes(byte)
+
+
+    async def __wait_for_data(self):
+        """Waits until __on_readable has put more bytes in the receive buffer"""
+
+        if (self.__error is not None):
+            raise self.__error
+
+        self.__waiter = self.__loop.create_future()
+
+        try:
+            await self.__waiter
+        finally:
+            self.__waiter = None
+
+        if (self.__error is not None):
+            raise self.__error
+
+
+    def __on_readable(self):
+        """Called by the event loop when the serial port has bytes to read"""
+
+        try:
+            data = self.__transport.read(self.__transport.in_waiting or 1)
+        except(serial.SerialException, OSError) as e:
+            #the MSR605 is gone, stop watching it and let the waiting command know
+            self.__error = e
+            self.__loop.remove_reader(self.__fd)
+            self.__fd = None
+            data = b''
+
+        self.__rxBuffer += data
+
+        if (self.__waiter is not None and not self.__waiter.done()):
+            self.__waiter.set_result(None)
+
+
+    def __clear_buffer(self):
+        """Throws away anything left in the receive buffer, the bytearray itself is reused"""
+
+        del self.__rxBuffer[:]
+        self.__rxPos = 0
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+
+""" cardConsensus.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows, Linux
+    Python: 3.7 or newer
+
+    Description: This puts several swipes of the same card together into one good read
+
+                A worn card usually gives a different bad character on each swipe, so each
+                track is lined up across the swipes (with difflib, so a dropped or extra
+                character doesn't throw off the rest of the track) and every position is
+                voted on. A character counts less if it had a parity error (raw reads) and
+                doesn't count at all if it isn't in the ISO standard character set the track
+                was read with (see isoStandardDictionary.py), the alphanumeric set for a track
+                with more than 5 bits per character and the numeric one otherwise, the same as
+                ReadResponseParser.
+
+                Example:
+                    swipes = [msr.read_card() for i in range(3)]
+                    tracks = consensus_read(swipes)
+
+                    print(tracks[0].text, tracks[0].confidence)
+
+                    #the same 3 strings read_card gives back
+                    print(read_card_tracks(tracks))
+"""
+
+
+import difflib
+
+from isoStandardDictionary import iso_standard_track_check
+from readResponseParser import ISO_BITS_PER_CHARACTER
+
+
+#how much a character with a parity error counts compared to a good one
+PARITY_ERROR_WEIGHT = 0.25
+
+#how much a character that isn't in the ISO standard character set counts
+NON_ISO_WEIGHT = 0.0
+
+#what read_card gives back for a track 3 that had nothing on it
+EMPTY_TRACK = '?'
+
+
+class ConsensusTrack():
+    """One track put together from several swipes
+
+        Attributes:
+            text: the track, each character is the one most of the swipes agreed on
+
+            confidence: between 0 and 1, the confidence of the weakest character (1 means
+                        every swipe agreed on every character)
+
+            charConfidence: list with the confidence of each character in text, the share
+                            of the (weighted) votes the character got
+
+            swipes: how many swipes had data for this track
+    """
+
+    __slots__ = ('text', 'confidence', 'charConfidence', 'swipes')
+
+    def __init__(self, text, confidence, charConfidence, swipes):
+        self.text = text
+        self.confidence = confidence
+        self.charConfidence = charConfidence
+        self.swipes = swipes
+
+    def __repr__(self):
+        return ("ConsensusTrack(text=%r, confidence=%.3f, swipes=%d)" %
+                (self.text, self.confidence, self.swipes))
+
+
+def consensus_read(swipes, bitsPerChar=ISO_BITS_PER_CHARACTER):
+    """Puts the 3 tracks together from several swipes of the same card
+
+        Args:
+            swipes: list of reads, each one is a list of the 3 tracks, either the strings from
+                    CardReader.read_card or the DecodedTrack's from isoTrackDecoder (their
+                    parity errors are used), a track that is None, empty or just the ? that
+                    read_card gives back for an empty track is left out
+
+            bitsPerChar: the bits per character each track was read with (see
+                            CardReader.set_bpc), picks the character set it is checked against
+
+        Returns:
+            A list of 3 ConsensusTrack's, None for a track that none of the swipes had
+
+        Raises:
+            Nothing
+    """
+
+    return [consensus_track([swipe[i] for swipe in swipes], i + 1, bitsPerChar[i])
+            for i in range(3)]
+
+
+def read_card_tracks(tracks):
+    """Turns the ConsensusTrack's from consensus_read back into the 3 strings read_card
+        gives back, so a card saved from a consensus read is the same as one saved from
+        read_card (ex: for the duplicate check in cardStore.py)
+
+        Args:
+            tracks: the list of 3 ConsensusTrack's (or None's) from consensus_read
+
+        Returns:
+            A list of the 3 track strings, a track none of the swipes had is empty, except
+            track 3 which is just the ? (the same as ReadResponseParser)
+
+        Raises:
+            Nothing
+    """
+
+    return [tracks[i].text if tracks[i] is not None else (EMPTY_TRACK if i == 2 else '')
+            for i in range(3)]
+
+
+def consensus_track(reads, trackNum, bitsPerChar=None):
+    """Puts one track together from several swipes
+
+        Every read is lined up against a reference read (of the reads with the most common
+        length, the one that is the most like all the others), then each position of the
+        reference is voted on. A read the same length as the reference is lined up character
+        for character (a bad character is much more common than a dropped one and difflib
+        lines up runs like 1111 the wrong way), any other read is lined up with difflib. A
+        read that is missing a character votes for nothing being there, and characters a
+        read has that the reference doesn't are added if more than half the votes are for
+        them.
+
+        Args:
+            reads: list of the track from each swipe (strings or DecodedTrack's)
+
+            trackNum: the track # (1, 2 or 3)
+
+            bitsPerChar: the bits per character the track was read with, the ISO standard
+                            one for the track if None
+
+        Returns:
+            A ConsensusTrack, or None if none of the reads have data
+
+        Raises:
+            Nothing
+    """
+
+    if (bitsPerChar is None):
+        bitsPerChar = ISO_BITS_PER_CHARACTER[trackNum - 1]
+
+    #the character set the MSR605 decoded the track with
+    isoTrack = 1 if bitsPerChar > 5 else 2
+
+    texts = []
+    weights = []
+
+    for read in reads:
+        if (read is None):
+            continue
+
+        text = getattr(read, 'text', read)
+
+        if (not text or text == EMPTY_TRACK):
+            continue
+
+        parityErrors = set(getattr(read, 'parityErrors', ()))
+
+        texts.append(text)
+        weights.append([_char_weight(char, isoTrack, position in parityErrors)
+                        for position, char in enumerate(text)])
+
+    if (len(texts) == 0):
+        return None
+
+    reference = _reference_index(texts)
+    referenceText = texts[reference]
+
+    #votes[i] is {character: weight} for position i of the reference, None is a vote for no
+    #character, insertions[i] is {string: weight} for characters before position i
+    votes = [{} for char in referenceText]
+    insertions = [{} for i in range(len(referenceText) + 1)]
+
+    for text, textWeights in zip(texts, weights):
+        if (len(text) == len(referenceText)):
+            opcodes = [('replace', 0, len(text), 0, len(text))]
+        else:
+            opcodes = difflib.SequenceMatcher(None, referenceText, text,
+                                              autojunk=False).get_opcodes()
+
+        for tag, refStart, refEnd, start, end in opcodes:
+            if (tag == 'equal' or (tag == 'replace' and refEnd - refStart == end - start)):
+                for offset in range(refEnd - refStart):
+                    char = text[start + offset]
+                    vote = votes[refStart + offset]
+                    vote[char] = vote.get(char, 0.0) + textWeights[start + offset]
+                continue
+
+            if (tag in ('delete', 'replace')):
+                for position in range(refStart, refEnd):
+                    votes[position][None] = votes[position].get(None, 0.0) + 1.0
+
+            if (tag in ('insert', 'replace')):
+                inserted = text[start:end]
+                slot = insertions[refStart]
+                slot[inserted] = slot.get(inserted, 0.0) + min(textWeights[start:end])
+
+    chars = []
+    charConfidence = []
+    half = len(texts) / 2.0
+
+    for position in range(len(referenceText) + 1):
+        slot = insertions[position]
+
+        if (slot):
+            inserted, weight = max(slot.items(), key=lambda item: item[1])
+
+            if (weight > half):
+                chars.extend(inserted)
+                charConfidence.extend([weight / len(texts)] * len(inserted))
+
+        if (position == len(referenceText)):
+            break
+
+        vote = votes[position]
+        total = sum(vote.values())
+        char, weight = max(vote.items(), key=lambda item: item[1])
+
+        if (char is not None):
+            chars.append(char)
+            charConfidence.append(weight / total if total > 0 else 0.0)
+
+    return ConsensusTrack(''.join(chars), min(charConfidence) if charConfidence else 0.0,
+                          charConfidence, len(texts))
+
+
+def _char_weight(char, isoTrack, parityError):
+    """How much a character's vote counts, isoTrack is the character set (1 or 2)"""
+
+    if (not iso_standard_track_check(char, isoTrack)):
+        return NON_ISO_WEIGHT
+
+    return PARITY_ERROR_WEIGHT if parityError else 1.0
+
+
+def _reference_index(texts):
+    """Returns the index of the read with the most common length that is the most like all
+        the other reads
+    """
+
+    lengths = [len(text) for text in texts]
+    commonLength = max(lengths, key=lengths.count)
+
+    if (len(texts) <= 2):
+        return lengths.index(commonLength)
+
+    bestIndex = 0
+    bestScore = -1.0
+
+    for i, text in enumerate(texts):
+        if (len(text) != commonLength):
+            continue
+
+        #the text is seq2, which SequenceMatcher caches
+        matcher = difflib.SequenceMatcher(None, '', text, autojunk=False)
+        score = 0.0
+
+        for j, other in enumerate(texts):
+            if (i != j):
+                matcher.set_seq1(other)
+                score += matcher.ratio()
+
+        if (score > bestScore):
+            bestIndex = i
+            bestScore = score
+
+    return bestIndex
@@ -24,7 +24,7 @@
     Author: Manwinder Sidhu
     Contact: manwindersapps@gmail.com
     Platform: Windows
-    Python: 3.5.2
+    Python: 3.7 or newer
 
     Description: This is an interface that allows manipulation of the MSR605 magnetic
                  stripe card reader/writer.
@@ -60,10 +60,16 @@
 """
 
 
-import serial, time, sys, cardReaderExceptions
+import serial, os, time, sys, contextlib, functools, threading, concurrent.futures, logging, \
+        cardReaderExceptions, cardReaderDiscovery, cardReaderMetrics, cardReaderProfiling, \
+        cardConsensus
 
 from isoStandardDictionary import isoDictionaryTrackOne, isoDictionaryTrackTwoThree,\
-        iso_standard_track_check
+        iso_standard_track_check, iso_delete_table
+
+from cardReaderTransport import SerialTransport
+from readResponseParser import ReadResponseParser, RawReadResponseParser, ISO_BITS_PER_INCH, \
+        ISO_BITS_PER_CHARACTER, track_length_limit
 
 #These constants are from the MSR605 Programming Manual under 'Section 6 Command and Response'
 #I thought it would be easier if I used constants rather than putting hex in the code
@@ -80,10 +86,16 @@ START_OF_HEADING = b'\x01'
 START_OF_TEXT = b'\x02'
 END_OF_TEXT = b'\x03'
 
+#these are let through the ISO standard check when reading track data
+CONTROL_CHARACTERS = frozenset((ESCAPE + FILE_SEPERATOR + ACKNOWLEDGE + START_OF_HEADING +
+                                START_OF_TEXT + END_OF_TEXT).decode())
+
 #used to manipulate the MSR605
 RESET = b'\x61'
 READ = b'\x72'
 WRITE = b'\x77'
+READ_RAW = b'\x6D'
+WRITE_RAW = b'\x6E'
 COMMUNICATIONS_TEST = b'\x65'
 ALL_LED_OFF = b'\x81'
 ALL_LED_ON = b'\x82'
@@ -98,6 +110,221 @@ FIRMWARE = b'\x76'
 HI_CO = b'\x78'
 LOW_CO = b'\x79'
 HI_OR_LOW_CO = b'\x64'
+SELECT_BPI = b'\x62'
+SET_BPC = b'\x6F'
+
+#every command frame that doesn't change, built once rather than every time it is sent
+COMMAND_FRAMES = {
+    'reset': ESCAPE + RESET,
+    'read': ESCAPE + READ,
+    'read_raw': ESCAPE + READ_RAW,
+    'communication_test': ESCAPE + COMMUNICATIONS_TEST,
+    'led_off': ESCAPE + ALL_LED_OFF,
+    'led_on': ESCAPE + ALL_LED_ON,
+    'green_led_on': ESCAPE + GREEN_LED_ON,
+    'yellow_led_on': ESCAPE + YELLOW_LED_ON,
+    'red_led_on': ESCAPE + RED_LED_ON,
+    'sensor_test': ESCAPE + SENSOR_TEST,
+    'ram_test': ESCAPE + RAM_TEST,
+    'set_hi_co': ESCAPE + HI_CO,
+    'set_low_co': ESCAPE + LOW_CO,
+    'get_hi_or_low_co': ESCAPE + HI_OR_LOW_CO,
+    'get_device_model': ESCAPE + DEVICE_MODEL,
+    'get_firmware_version': ESCAPE + FIRMWARE,
+}
+
+#the erase command for each track selection (0-7, see erase_card)
+ERASE_FRAMES = dict((trackSelect, ESCAPE + ERASE_CARD + str(trackSelect).encode())
+                    for trackSelect in range(8))
+
+#the [Select Byte] of the select BPI command for each (track, density), see set_bpi
+BPI_FRAMES = {
+    (1, 210): ESCAPE + SELECT_BPI + b'\xA1',
+    (1, 75): ESCAPE + SELECT_BPI + b'\xA0',
+    (2, 210): ESCAPE + SELECT_BPI + b'\xD2',
+    (2, 75): ESCAPE + SELECT_BPI + b'\x4B',
+    (3, 210): ESCAPE + SELECT_BPI + b'\xC1',
+    (3, 75): ESCAPE + SELECT_BPI + b'\xC0',
+}
+
+#the MSR605 doesn't respond to these, so they can be batched (see CardReader.batch_commands)
+NO_RESPONSE_FRAMES = frozenset((COMMAND_FRAMES['reset'], COMMAND_FRAMES['led_off'],
+                                COMMAND_FRAMES['led_on'], COMMAND_FRAMES['green_led_on'],
+                                COMMAND_FRAMES['yellow_led_on'], COMMAND_FRAMES['red_led_on']))
+
+#how long (in seconds) a port gets to answer the communication test when looking for the MSR605
+PROBE_TIMEOUT = 0.5
+
+#how long (in seconds) to wait for any port to be found, and how many ports are probed at once
+PROBE_DEADLINE = 2.0
+MAX_PROBE_THREADS = 16
+
+#how often (in seconds) a command with a deadline or cancel token checks them while it waits
+INTERRUPT_POLL_INTERVAL = 0.05
+
+#reconnecting after the MSR605 is unplugged (seconds), see CardReader.enable_auto_reconnect,
+#the poll lists the serial ports each time so it isn't too often
+RECONNECT_POLL_INTERVAL = 0.25
+RECONNECT_BACKOFF_START = 0.01
+RECONNECT_BACKOFF_MAX = 0.5
+RECONNECT_TIMEOUT = 60.0
+
+#the commands that are wrapped with cProfile when profiling is on, see cardReaderProfiling.py
+PROFILED_COMMANDS = ('reset', 'read_card', 'write_card', 'erase_card', 'read_raw', 'write_raw',
+                     'read_card_consensus', 'led_off', 'led_on', 'green_led_on', 'yellow_led_on',
+                     'red_led_on', 'communication_test', 'sensor_test', 'ram_test', 'set_hi_co',
+                     'set_low_co', 'get_hi_or_low_co', 'set_bpi', 'set_bpc', 'get_device_model',
+                     'get_firmware_version')
+
+#everything CardReader used to print goes to this logger, without any logging set up only
+#warnings and errors are shown, logging.basicConfig(level=logging.DEBUG) shows everything
+logger = logging.getLogger(__name__)
+
+#track data (and the bytes written to the card) is only logged if this is True, or the
+#MSR605_LOG_TRACK_DATA environment variable is 1, otherwise just its length is logged
+LOG_TRACK_DATA = os.environ.get('MSR605_LOG_TRACK_DATA') == '1'
+
+
+class TrackData():
+    """Wraps card data that is passed to the logger, so it is only turned into a string if the
+        message is actually logged, and then redacted unless LOG_TRACK_DATA is True
+    """
+    
+    __slots__ = ('data',)
+    
+    def __init__(self, data):
+        self.data = data
+    
+    def __str__(self):
+        binary = isinstance(self.data, (bytes, bytearray, memoryview))
+        
+        if (LOG_TRACK_DATA):
+            return repr(bytes(self.data)) if binary else str(self.data)
+        
+        return "<%d %s REDACTED>" % (len(self.data), "BYTES" if binary else "CHARACTERS")
+
+
+class CancelToken():
+    """Lets another thread cancel a CardReader command that is waiting (ex: for a swipe)
+    
+        Example:
+            token = CancelToken()
+            #on the worker thread
+            result = msr.read_card(cancelToken=token)
+            #on some other thread
+            token.cancel()
+    """
+    
+    def __init__(self):
+        self.__event = threading.Event()
+    
+    def cancel(self):
+        self.__event.set()
+    
+    @property
+    def cancelled(self):
+        return self.__event.is_set()
+
+
+class OperationTimeout():
+    """What a command returns instead of its normal result when its deadline runs out or it
+        is cancelled, the MSR605 has already been reset when this is returned
+    
+        It is False in an if statement, so "if not result:" catches it
+    
+        Attributes:
+            operation: the name of the command, ex: 'read_card'
+            
+            cancelled: True if it was cancelled, False if the deadline ran out
+    """
+    
+    __slots__ = ('operation', 'cancelled')
+    
+    def __init__(self, operation, cancelled):
+        self.operation = operation
+        self.cancelled = cancelled
+    
+    def __bool__(self):
+        return False
+    
+    def __repr__(self):
+        return "OperationTimeout(operation=%r, cancelled=%r)" % (self.operation, self.cancelled)
+
+
+class _Interrupted(Exception):
+    """Raised inside CardReader when a deadline runs out or a command is cancelled, it never
+        gets out of CardReader"""
+    
+    def __init__(self, cancelled):
+        super(_Interrupted, self).__init__("cancelled" if cancelled else "deadline")
+        self.cancelled = cancelled
+
+
+def interruptible(method):
+    """Adds the deadline and cancelToken keyword arguments to a CardReader command
+    
+        deadline is a time.monotonic() value, cancelToken is a CancelToken. If neither is
+        given the command runs exactly like it always has (blocking until the MSR605 answers)
+    """
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, deadline=None, cancelToken=None, **kwargs):
+        if (deadline is None and cancelToken is None):
+            return method(self, *args, **kwargs)
+        
+        return self._run_interruptible(method, args, kwargs, deadline, cancelToken)
+    
+    return wrapper
+
+
+def reconnecting(method):
+    """Makes a CardReader command reconnect and try again if the MSR605 was unplugged
+    
+        This only does something after enable_auto_reconnect() has been called, if the
+        command fails because the serial port is gone the MSR605 is reconnected (see
+        CardReader.reconnect) and the command is run one more time. Only the command that
+        failed is run again, once, and it is sent whole (ex: write_card sends all the tracks
+        again and waits for another swipe), whatever part of it went out before the MSR605
+        was unplugged was lost when it lost power
+        
+        It goes outside @interruptible, so the command's deadline and cancelToken also
+        cover the reconnect, an OperationTimeout is returned if either one runs out first
+    """
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except(serial.SerialException, OSError):
+            if (not self.auto_reconnect_enabled()):
+                raise
+        
+        deadline = kwargs.get('deadline')
+        cancelToken = kwargs.get('cancelToken')
+        
+        if (not self.reconnect(deadline=deadline, cancelToken=cancelToken)):
+            logger.info("%s %s", method.__name__.upper(),
+                        "WAS CANCELLED" if cancelToken is not None and cancelToken.cancelled
+                        else "RAN OUT OF TIME")
+            
+            return OperationTimeout(method.__name__,
+                                    cancelToken is not None and cancelToken.cancelled)
+        
+        return method(self, *args, **kwargs)
+    
+    return wrapper
+
+
+def instrumented(method):
+    """Records how long a CardReader command takes and how it turned out in the CardReader's
+        metrics (see cardReaderMetrics.py and CardReader._run_instrumented)
+    """
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self._run_instrumented(method, args, kwargs)
+    
+    return wrapper
 
 
 class CardReader():
@@ -106,26 +333,40 @@ class CardReader():
         I have not implemented all the functionality described in the MSR605 programming
         manual, here is what I have not implemented:
             
-            - Set leading zero, Check leading zero, Select BPI, Read raw data, Write raw
-              data, Set BPC
+            - Set leading zero, Check leading zero
               
             This functionality wasn't added because I didn't require it but can easily be
             implemented if you follow the programming manual
         
+        Every command that waits for a response from the MSR605 also takes the keyword
+        arguments deadline (a time.monotonic() value) and cancelToken (a CancelToken), see
+        _run_interruptible. Without them the commands block until the MSR605 answers
+        
+        Every command is timed and counted in the CardReader's metrics, see
+        _run_instrumented and cardReaderMetrics.py
+        
         Attributes:
             A lot of constants lol
     """
     
     
     
-    def __init__(self):
+    def __init__(self, transport=None, metrics=None):
         """Connects to the MSR605 using pyserial (serial connection)
         
-            Checks the first 256 COM ports, hopefully the MSR605 is connected to
-            one of those ports
+            Looks through the serial ports that exist (see cardReaderDiscovery.py), the
+            port the MSR605 was on last time is tried first
         
             Args:
-                None
+                transport: optional, an already open connection to the MSR605, anything
+                            that implements cardReaderTransport.Transport (ex: a
+                            SerialTransport for a port on the pty emulator in
+                            msr605Emulator.py) or a serial.Serial object. If it is None the
+                            serial ports are searched
+                
+                metrics: optional, the cardReaderMetrics.CardReaderMetrics the command
+                            timings are recorded in, cardReaderMetrics.DEFAULT_METRICS if
+                            it is None
         
             Returns:
                 Nothing
@@ -134,38 +375,121 @@ class CardReader():
                 MSR605ConnectError: An error occurred when connecting to the MSR605
         """
         
-        print ("\nATTEMPTING TO CONNECT TO MSR605")
+        logger.info("ATTEMPTING TO CONNECT TO MSR605")
+
+        #everything read from the serial port goes through this buffer, see __fill_buffer
+        self.__rxBuffer = bytearray()
+        self.__rxPos = 0
+        
+        #the deadline and cancel token of the command that is running, see _run_interruptible
+        self.__interrupt = None
+        
+        #the command that is running and when its first write finished, see _run_instrumented
+        self.__metrics = metrics if metrics is not None else cardReaderMetrics.DEFAULT_METRICS
+        self.__command = None
+        self.__writtenAt = None
+        self.__awaitingFirstByte = False
+        
+        #commands waiting to be sent while batch_commands() is being used
+        self.__batch = None
+        self.__batchDepth = 0
+        
+        #used to reconnect if the MSR605 is unplugged, see enable_auto_reconnect
+        self.__autoReconnect = False
+        self.__reconnecting = False
+        self.__reconnectLock = threading.RLock()
+        self.__deviceAppeared = threading.Event()
+        self.__watcher = None
+        self.__stablePort = None
+        self.__reconnectTimeout = RECONNECT_TIMEOUT
+        self.__coercivity = None
+        
+        #the density and bits per character of each track, the MSR605 can't be asked for
+        #them so they're kept track of here, see set_bpi and set_bpc
+        self.__bpi = list(ISO_BITS_PER_INCH)
+        self.__bpc = list(ISO_BITS_PER_CHARACTER)
+
+        if (transport is None):
+            #the port that was found has already been initialized by its probe (see
+            #probe_port), so it isn't done a second time
+            self.__serialConn = self.__discover()
+            self.__portName = self.__serialConn.port
         
-        #this looks for the first available COM port, can be changed to look for the MSR
-        for x in range(0, 255):
+        else:
+            self.__serialConn = transport
+            self.__portName = getattr(self.__serialConn, 'port', None)
+            
+            #this is in the Programmers Manual under 'Section 8 Communication Sequence', it
+            #states how to properly initialize the MSR605
+            logger.debug("INITIALIZING THE MSR605")
+            
+            self.reset()
+            
             try:
-
-                self.__serialConn = serial.Serial('COM' + str(x))  # opens the serial port
-            except(serial.SerialException, OSError):
-                pass #continues going through the loop
+                self.communication_test()
+            except cardReaderExceptions.CommunicationTestError as e:
+                raise (cardReaderExceptions.CommunicationTestError(e))
+                
+            self.reset()
+        
+        logger.info("CONNECTED TO MSR605")
+        
+        
+    def __discover(self):
+        """Finds the serial port the MSR605 is on
+        
+            Every candidate port is opened and handshaked at the same time on a thread pool
+            (see probe_port), the first port that passes the communication test is used and
+            the rest are closed, so connecting takes as long as the fastest port rather than
+            all of them added up. The port is saved so it is tried first next time. The probe
+            has already initialized the MSR605 (reset, communication test, reset)
+        
+            Args:
+                None
+        
+            Returns:
+                The SerialTransport for the MSR605, with the timeout taken off
+        
+            Raises:
+                MSR605ConnectError: none of the ports had an MSR605 on it
+        """
+        
+        ports = cardReaderDiscovery.candidate_ports()
+        transport = None
+        
+        if (len(ports) > 0):
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(len(ports),
+                                                                             MAX_PROBE_THREADS))
+            futures = [executor.submit(probe_port, port) for port in ports]
             
-        #checks to see if the serial connection exists
-        try:
-            self.__serialConn
-        except(NameError, AttributeError):
+            try:
+                for future in concurrent.futures.as_completed(futures, timeout=PROBE_DEADLINE):
+                    transport = future.result()
+                    
+                    if (transport is not None):
+                        break
+                        
+            except concurrent.futures.TimeoutError:
+                pass #some port is taking too long to open, treat it like it failed
+            
+            #the other ports are closed as soon as their probe finishes, nothing waits on them
+            for future in futures:
+                future.add_done_callback(lambda done, winner=transport:
+                                         _close_probe(done, winner))
+            
+            executor.shutdown(wait=False)
+        
+        if (transport is None):
             raise cardReaderExceptions.MSR605ConnectError("THE CARD READER IS BEING USED BY "
                                                           "SOMETHING ELSE OR IT IS NOT PLUGGED IN")
-
-
-        #this is in the Programmers Manual under 'Section 8 Communication Sequence', it states
-        #how to properly initialize the MSR605
-        print ("\nINITIALIZING THE MSR605")
         
-        self.reset()
+        logger.info("FOUND THE MSR605 ON %s", transport.port)
         
-        try:
-            self.communication_test()
-        except cardReaderExceptions.CommunicationTestError as e:
-            raise (cardReaderExceptions.CommunicationTestError(e))
-            
-        self.reset()
+        #the MSR605 has always been used with blocking reads
+        transport.timeout = None
+        cardReaderDiscovery.save_cached_port(transport.port)
         
-        print ("\nCONNECTED TO MSR605")
+        return transport
         
         
     def close_serial_connection(self):
@@ -183,12 +507,15 @@ class CardReader():
                 Nothing
         """
         
-        print ("\nCLOSING COM PORT SERIAL CONNECTION")
+        logger.info("CLOSING COM PORT SERIAL CONNECTION")
         
+        self.disable_auto_reconnect()
         self.__serialConn.close()
 
 
 
+    @instrumented
+    @reconnecting
     def reset(self):
         """This command reset the MSR605 to initial state.
         
@@ -202,7 +529,7 @@ class CardReader():
                 Nothing
         """
         
-        print ("\nATTEMPTING TO RESET THE MSR605")
+        logger.debug("ATTEMPTING TO RESET THE MSR605")
         
         # flusing the input and output solves the issue where the MSR605 app/gui would need
         # to be restarted if there was an issue like say swiping the card backwards, I 
@@ -213,16 +540,13 @@ class CardReader():
         # wasn't expected
         self.__serialConn.flushInput()
         self.__serialConn.flushOutput()
+        self.__clear_buffer()
 
         #writes the command code for resetting the MSR605
-        self.__serialConn.write(ESCAPE + RESET)
-        
-        #so i might be a noob here but from what i read, flush waits for the command above
-        #to fully write and complete, I thought this was better than adding time delays
-        self.__serialConn.flush() 
+        self.__send(COMMAND_FRAMES['reset'])
         
         
-        print ("MSR605 SHOULD'VE BEEN RESET")
+        logger.debug("MSR605 SHOULD'VE BEEN RESET")
         #there is no response from the MSR605
         
         return None
@@ -235,6 +559,9 @@ class CardReader():
     #
     # **************************************************
     
+    @instrumented
+    @reconnecting
+    @interruptible
     def read_card(self):
         """This command request MSR605 to read a card swiped and respond with
             the data read.
@@ -266,7 +593,11 @@ class CardReader():
                             Invalid card swipe when in write mode: 0x39h
         
             Args:
-                None
+                deadline: optional (keyword only), a time.monotonic() value, if no card is swiped
+                            by then the MSR605 is reset and an OperationTimeout is returned
+                
+                cancelToken: optional (keyword only), a CancelToken, cancelling it does the
+                            same thing as the deadline running out
         
             Returns:
                 An array of size 3, that contains the 3 tracks from a
@@ -288,6 +619,9 @@ class CardReader():
                 Not all tracks contain data, most magstripe cards do not
                 contain track 3 data.
                 
+                If the deadline runs out or it is cancelled an OperationTimeout is
+                returned instead
+                
                 For more examples you can go to:
                     http://en.wikipedia.org/wiki/Magnetic_stripe_card
                     **the examples start Financial cards part of the wiki article**
@@ -307,109 +641,42 @@ class CardReader():
                              
         """
         
-        print ("\nATTEMPTING TO READ FROM CARD (SWIPE NOW)")        
-        #read in track data will be stored in this array
-        tracks = ['','','']
+        logger.debug("ATTEMPTING TO READ FROM CARD (SWIPE NOW)")
         
         #command code for reading written to the MSR605
-        self.__serialConn.write(ESCAPE + READ)
-        self.__serialConn.flush()
-        
-        
-        #response from the MSR605
-        #goes through what is expected as output from the MSR
-        if self.__serialConn.read() != ESCAPE:
-            return cardReaderExceptions.CardReadError("[Datablock] READ ERROR, R/W Data "
-                                            "Field, looking for ESCAPE(\x1B)", None)
-        
-        if self.__serialConn.read() != b's':
-            return cardReaderExceptions.CardReadError("[Datablock] READ ERROR, R/W Data "
-                                            "Field, looking for s (\x73)", None)
-        
-        if self.__serialConn.read() != ESCAPE:
-            return cardReaderExceptions.CardReadError("[Carddata] READ ERROR, R/W Data "
-                                            "Field, looking for ESCAPE(\x1B)", None)
+        self.__send(COMMAND_FRAMES['read'])
         
+        #response from the MSR605, the parser goes through what is expected as output from
+        #the MSR, see readResponseParser.py
+        response = self.__parse_response(ReadResponseParser(True, self.__bpi, self.__bpc))
         
+        if (response.errorField == "Datablock"):
+            return cardReaderExceptions.CardReadError(response.error, None)
         
-        #track one data will be read in, this isn't raising an exception because the card
-        #might not have track 1 data 
-        if self.__serialConn.read() != START_OF_HEADING:
-            
-            #could be changed to be stored in some sort of error data structure and returned
-            #with track data array but lets keep it simple for now ;)
-            print ("This card might not have a TRACK 1")
-            print ("[Carddata] READ ERROR, R/W Data Field, looking for START OF HEAD - SOH(\x01)")
-            
-        #if there is a track 1 then the data is read and stored
-        else:
-            
-            tracks[0] = self.read_until(ESCAPE, 1, True)
-            print ("TRACK 1: ", tracks[0])
-            
-            #removes any ? and %, theses are part of the ISO standard and also have
-            #to be removed for writing to the card, the MSR605 adds the question marks automatically
-            if (len(tracks[0]) > 0):
-                if(tracks[0][-1] == '?'): 
-                    tracks[0] = tracks[0][:-1]
-                
-                if(tracks[0][0] == '%'): 
-                    tracks[0] = tracks[0][1:]
-                
-            else:
-                tracks[0] = ''
-                
-        #track 2
-        if self.__serialConn.read() != START_OF_TEXT:
-            print ("This card might not have a TRACK 2")
-            print ("[Carddata] READ ERROR, R/W Data Field, looking for START OF TEXT - STX(\x02)")
-            
-        else:
-            
-            tracks[1] = self.read_until(ESCAPE, 2, True)
-            print ("TRACK 2: " , tracks[1])
-            
-            if (len(tracks[1]) > 0):
-                if(tracks[1][-1] == '?'):
-                    tracks[1] = tracks[1][:-1]
-                
-                #removes any semicolons, these are added automatically when writing
-                if(tracks[1][0] == ';'): 
-                    tracks[1] = tracks[1][1:]
-                    
-            else:
-                tracks[1] = ''
+        tracks = response.tracks
         
-        #track 3
-        if self.__serialConn.read() != END_OF_TEXT:
-            print ("This card might not have a TRACK 3")
-            print ("[Carddata] READ ERROR, R/W Data Field, looking for END OF TEXT - ETX(\x03)")
-        else:
-            
-            tracks[2] = self.read_until(FILE_SEPERATOR, 3, True)
-            print ("TRACK 3: " , tracks[2])
-            
-            if (len(tracks[2]) > 0):
-                if(tracks[2][-1] != '?'):
-                    tracks[2] += '?'
-                    
-                if(tracks[2][0] == ';'): 
-                    tracks[2] = tracks[2][1:]    
-                
-            else: #since track 3 requres a ? when writing
-                tracks[2] = '?'
+        #skipped completely when debug logging is off, so reading doesn't pay for it
+        if (logger.isEnabledFor(logging.DEBUG)):
+            for trackNum in range(1, 4):
+                #could be changed to be stored in some sort of error data structure and returned
+                #with track data array but lets keep it simple for now ;)
+                if (trackNum in response.missingTracks):
+                    logger.debug("This card might not have a TRACK %d", trackNum)
+                else:
+                    logger.debug("TRACK %d: %s", trackNum, TrackData(tracks[trackNum - 1]))
         
-        if self.__serialConn.read() != ESCAPE:
-            raise cardReaderExceptions.CardReadError("[Datablock] READ ERROR, Ending "
-                                                    "Field, looking for ESCAPE(\x1B)",
-                                                    tracks)
+        if (response.errorField == "Ending"):
+            raise cardReaderExceptions.CardReadError(response.error, tracks)
         
-        #this reads the status byte and raises exceptions
-        self.status_read()
+        #this checks the status byte and raises exceptions
+        status_check(response.status)
                 
         return tracks
     
     
+    @instrumented
+    @reconnecting
+    @interruptible
     def write_card(self, tracks, statusByteCheck):
         """This command request MSR605 to write the Data Block into the card
             swiped.
@@ -418,34 +685,47 @@ class CardReader():
             sort of format the tracks, it is changed a little bit, here is an example:
         
             Args:
-                tracks: An array of size 3, each index is a track.
+                tracks: An array of size 3, each index is a track, each one has to fit on the
+                        track at the current BPI and BPC (see track_capacity)
                 
                 statusByteCheck: A boolean that if true will enable the regular statusByte
                                 checks, if its false it will not check the statusByte
+                
+                deadline: optional (keyword only), a time.monotonic() value, if no card is swiped
+                            by then the MSR605 is reset and an OperationTimeout is returned
+                
+                cancelToken: optional (keyword only), a CancelToken, cancelling it does the
+                            same thing as the deadline running out
         
             Returns:
-               None
+               None, or an OperationTimeout if the deadline ran out or it was cancelled
         
             Raises:
-                CardWriteError: An error occurred when writing to the magstripe card
+                CardWriteError: A track is too long or an error occurred when writing to the
+                                magstripe card
         """
         
-        print ("\nWRITING TO CARD (SWIPE NOW)")
+        for trackNum in range(1, 4):
+            if (len(tracks[trackNum - 1]) > self.track_capacity(trackNum)):
+                raise cardReaderExceptions.CardWriteError("WRITE ERROR, TRACK " + str(trackNum) +
+                                                          " is longer than the " +
+                                                          str(self.track_capacity(trackNum)) +
+                                                          " characters that fit at the current "
+                                                          "BPI and BPC")
+        
+        logger.debug("WRITING TO CARD (SWIPE NOW)")
         
         #Data block of the command code when writing to a magstripe card
         dataToWrite = (ESCAPE + b's' + ESCAPE + START_OF_HEADING + (tracks[0]).encode() + ESCAPE +
         START_OF_TEXT + (tracks[1]).encode() + ESCAPE + END_OF_TEXT + (tracks[2]).encode()  + FILE_SEPERATOR)
         
-        print ("\nWRITING TO DEVICE/CARD")
-        
-        print ("DATA TO WRITE: " , dataToWrite)
+        logger.debug("DATA TO WRITE: %s", TrackData(dataToWrite))
         
         #complete command code when writing to magstripe card
-        self.__serialConn.write(ESCAPE + WRITE + dataToWrite)
-        self.__serialConn.flush()
+        self.__send(ESCAPE + WRITE + dataToWrite)
         
         #response/output from the MSR605
-        if self.__serialConn.read() != ESCAPE:
+        if self.__read_byte() != ESCAPE:
             raise cardReaderExceptions.CardWriteError("[Datablock] WRITE ERROR, R/W Data Field, "
                                                       "looking for ESCAPE(\x1B)")
         
@@ -453,14 +733,18 @@ class CardReader():
         #i've added an option just incase it's not returning anything
         if (statusByteCheck):
             self.status_read()
-        else:            
-            print ("Status (not checking byte):" , self.__serialConn.read())
+        else:
+            status = self.__read_byte()
+            logger.debug("STATUS (NOT CHECKING BYTE): %r", status)
         
-        print ("DATA HAS BEEN SUCCESSFULLY WRITTEN TO THE CARD")
+        logger.debug("DATA HAS BEEN SUCCESSFULLY WRITTEN TO THE CARD")
         
         return None
 
 
+    @instrumented
+    @reconnecting
+    @interruptible
     def erase_card(self, trackSelect):
         """This command is used to erase the card data when card swipe.
         
@@ -493,10 +777,16 @@ class CardReader():
                                             5: Track 1 & 3
                                             6: Track 2 & 3
                                             7: Track 1, 2 & 3
+            
+            deadline: optional (keyword only), a time.monotonic() value, if no card is swiped
+                        by then the MSR605 is reset and an OperationTimeout is returned
+            
+            cancelToken: optional (keyword only), a CancelToken, cancelling it does the same
+                        thing as the deadline running out
                 
                 
         Returns:
-            Nothing
+            Nothing, or an OperationTimeout if the deadline ran out or it was cancelled
     
         Raises:
             EraseCardError: An error occurred while erasing the magstripe card
@@ -507,18 +797,17 @@ class CardReader():
             raise cardReaderExceptions.EraseCardError("Track selection provided is invalid, has to "
                                                         "between 0-7")
         
-        print ("\nERASING CARD (SWIPE NOW)")
+        logger.debug("ERASING CARD (SWIPE NOW)")
         
         #command code for erasing a magstripe card
-        self.__serialConn.write(ESCAPE + ERASE_CARD + (str(trackSelect)).encode())
-        self.__serialConn.flush()
+        self.__send(ERASE_FRAMES[trackSelect])
         
         
         #response/output from the MSR605
-        if self.__serialConn.read() != ESCAPE:
+        if self.__read_byte() != ESCAPE:
             raise cardReaderExceptions.EraseCardError("ERASE CARD ERROR, looking for ESCAPE(\x1B)")
         
-        eraseCardResponse = self.__serialConn.read()
+        eraseCardResponse = self.__read_byte()
         if eraseCardResponse != b'0':
             if eraseCardResponse != b'A':            
                 raise cardReaderExceptions.EraseCardError("ERASE CARD ERROR, looking for A(\x41), "
@@ -529,9 +818,208 @@ class CardReader():
                                                 "been erased")
         
         
-        print ("CARD HAS BEEN SUCCESSFULLY ERASED")
+        logger.debug("CARD HAS BEEN SUCCESSFULLY ERASED")
+        
+        return None
+
+
+    @instrumented
+    @reconnecting
+    @interruptible
+    def read_raw(self):
+        """This command request MSR605 to read a card swiped and respond with the raw
+            data read, the bits on the card exactly as they are (no ASCII decoding, no ISO
+            standard check), so cards that aren't ISO formatted can be read too
+        
+            Here is what the response should look like (Section 6 of the Programming
+            Manual), in ASCII:
+            
+                Response: <ESC>s<ESC>[01][L1][string1]<ESC>[02][L2][string2]
+                            <ESC>[03][L3][string3]?<FS><ESC>[Status]
+                            
+                    [L1], [L2], [L3]: one byte, the length of the string after it
+                    
+                    [string1], [string2], [string3]: the raw track data, the bits are packed
+                                                    into bytes in the order they are on the
+                                                    card
+                    
+                    Status: the same as read_card
+        
+            Args:
+                deadline: optional (keyword only), a time.monotonic() value, if no card is swiped
+                            by then the MSR605 is reset and an OperationTimeout is returned
+                
+                cancelToken: optional (keyword only), a CancelToken, cancelling it does the
+                            same thing as the deadline running out
+        
+            Returns:
+                An array of size 3, each index is the raw data of a track as bytes (b'' if the
+                track is empty)
+                
+                If the deadline runs out or it is cancelled an OperationTimeout is
+                returned instead
+        
+            Raises:
+                CardReadError: The response wasn't formatted properly, the tracks that were
+                                read before the problem are in the exception
+                                
+                StatusError: If something went wrong during the reading of the card
+        """
+        
+        logger.debug("ATTEMPTING TO READ RAW DATA FROM CARD (SWIPE NOW)")
+        
+        self.__send(COMMAND_FRAMES['read_raw'])
+        
+        #the track data is taken by its length, see readResponseParser.py
+        response = self.__parse_response(RawReadResponseParser())
+        
+        if (response.errorField is not None):
+            raise cardReaderExceptions.CardReadError(response.error, response.tracks)
+        
+        tracks = response.tracks
+        
+        if (logger.isEnabledFor(logging.DEBUG)):
+            for trackNum in range(1, 4):
+                logger.debug("TRACK %d: %s", trackNum, TrackData(tracks[trackNum - 1]))
+        
+        status_check(response.status)
+        
+        return tracks
+    
+    
+    @instrumented
+    @reconnecting
+    @interruptible
+    def write_raw(self, tracks, statusByteCheck):
+        """This command request MSR605 to write raw data into the card swiped, the bytes
+            are written to the card bit for bit
+        
+            The data block is the same as the read_raw response (without the status):
+                <ESC>s<ESC>[01][L1][string1]<ESC>[02][L2][string2]<ESC>[03][L3][string3]?<FS>
+        
+            Args:
+                tracks: An array of size 3, each index is the raw data of a track (bytes,
+                        bytearray or memoryview), at most 255 bytes each
+                
+                statusByteCheck: A boolean that if true will enable the regular statusByte
+                                checks, if its false it will not check the statusByte
+                
+                deadline: optional (keyword only), a time.monotonic() value, if no card is swiped
+                            by then the MSR605 is reset and an OperationTimeout is returned
+                
+                cancelToken: optional (keyword only), a CancelToken, cancelling it does the
+                            same thing as the deadline running out
+        
+            Returns:
+               None, or an OperationTimeout if the deadline ran out or it was cancelled
+        
+            Raises:
+                CardWriteError: A track is too long or an error occurred when writing to the
+                                magstripe card
+        """
+        
+        dataToWrite = bytearray(ESCAPE + b's')
+        
+        for trackNum in range(1, 4):
+            track = tracks[trackNum - 1]
+            
+            #the length has to fit in one byte
+            if (len(track) > 255):
+                raise cardReaderExceptions.CardWriteError("RAW WRITE ERROR, TRACK " + str(trackNum) +
+                                                          " is longer than 255 bytes")
+            
+            dataToWrite += ESCAPE + bytes((trackNum, len(track)))
+            dataToWrite += track
+        
+        dataToWrite += b'?' + FILE_SEPERATOR
+        
+        logger.debug("WRITING RAW DATA TO CARD (SWIPE NOW)")
+        
+        self.__send(ESCAPE + WRITE_RAW + dataToWrite)
+        
+        if self.__read_byte() != ESCAPE:
+            raise cardReaderExceptions.CardWriteError("[Datablock] RAW WRITE ERROR, R/W Data "
+                                                      "Field, looking for ESCAPE(\x1B)")
+        
+        if (statusByteCheck):
+            self.status_read()
+        else:
+            status = self.__read_byte()
+            logger.debug("STATUS (NOT CHECKING BYTE): %r", status)
+        
+        logger.debug("RAW DATA HAS BEEN SUCCESSFULLY WRITTEN TO THE CARD")
         
         return None
+    
+    
+    @instrumented
+    @interruptible
+    def read_card_consensus(self, swipes=3, raw=False):
+        """Reads the same card several times and puts the tracks together from all the
+            swipes, a worn card that gives a different bad character on each swipe usually
+            reads properly this way (see cardConsensus.py)
+        
+            Args:
+                swipes: how many times the card is swiped
+                
+                raw: if True the swipes are raw reads (read_raw) decoded with decode_raw, the
+                        characters with a parity error count for less, this needs NumPy
+                
+                deadline: optional (keyword only), a time.monotonic() value, if it runs out
+                            while waiting for a swipe the MSR605 is reset and an
+                            OperationTimeout is returned
+                
+                cancelToken: optional (keyword only), a CancelToken, cancelling it does the
+                            same thing as the deadline running out
+        
+            Returns:
+                A list of 3 ConsensusTrack's (None for a track no swipe had), each has the
+                track text and a confidence between 0 and 1
+                
+                If the deadline runs out or it is cancelled an OperationTimeout is
+                returned instead
+        
+            Raises:
+                CardReadError or StatusError: none of the swipes could be read, it is the
+                                                exception from the last swipe
+        """
+        
+        reads = []
+        lastError = None
+        
+        for swipe in range(1, swipes + 1):
+            logger.debug("CONSENSUS READ, SWIPE %d OF %d", swipe, swipes)
+            
+            #a bad swipe is skipped, the other swipes should make up for it
+            try:
+                if (raw):
+                    tracks = self.decode_raw(self.read_raw())
+                else:
+                    tracks = self.read_card()
+            except (cardReaderExceptions.CardReadError, cardReaderExceptions.StatusError) as e:
+                logger.warning("SWIPE %d FAILED: %s", swipe, e)
+                lastError = e
+                continue
+            
+            #read_card returns (rather than raises) a Datablock error
+            if (isinstance(tracks, cardReaderExceptions.CardReadError)):
+                logger.warning("SWIPE %d FAILED: %s", swipe, tracks)
+                lastError = tracks
+                continue
+            
+            reads.append(tracks)
+        
+        if (len(reads) == 0):
+            raise lastError
+        
+        tracks = cardConsensus.consensus_read(reads, self.__bpc)
+        
+        for trackNum in range(1, 4):
+            if (tracks[trackNum - 1] is not None):
+                logger.info("TRACK %d: %s CONFIDENCE: %.3f", trackNum,
+                            TrackData(tracks[trackNum - 1].text), tracks[trackNum - 1].confidence)
+        
+        return tracks
 
     
     # **********************************
@@ -540,6 +1028,8 @@ class CardReader():
     #
     # **********************************
     
+    @instrumented
+    @reconnecting
     def led_off(self):
         """ This command is used to turn off all the LEDs.        
 
@@ -553,17 +1043,18 @@ class CardReader():
                 Nothing
         """
         
-        print ("\nLED'S OFF")
+        logger.debug("LED'S OFF")
         
         #command code to turn off all the LED's, note that LED's turn on automatically based
         #on certain commands like read and write
-        self.__serialConn.write(ESCAPE + ALL_LED_OFF)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['led_off'])
     
         #no response from the MSR605, just the LED change
         
         return None
     
+    @instrumented
+    @reconnecting
     def led_on(self):
         """ This command is used to turn on all the LEDs.
         
@@ -578,17 +1069,18 @@ class CardReader():
                 Nothing
         """
         
-        print ("\nLED'S ON")
+        logger.debug("LED'S ON")
         
         #command code to turn on all the LED's, note that LED's turn on automatically based
         #on certain commands like read and write
-        self.__serialConn.write(ESCAPE + ALL_LED_ON)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['led_on'])
     
         #no response from the MSR605, just the LED change
     
         return None
     
+    @instrumented
+    @reconnecting
     def green_led_on(self):
         """ This command is used to turn on the green LEDs.
         
@@ -602,17 +1094,18 @@ class CardReader():
                 Nothing
         """
         
-        print ("\nGREEN LED ON")
+        logger.debug("GREEN LED ON")
         
         #command code to turn on the green LED, note that LED's turn on automatically based
         #on certain commands like read and write
-        self.__serialConn.write(ESCAPE + GREEN_LED_ON)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['green_led_on'])
         
         #no response from the MSR605, just the LED change
     
         return None
     
+    @instrumented
+    @reconnecting
     def yellow_led_on(self):
         """ This command is used to turn on the yellow LED.
         
@@ -626,17 +1119,18 @@ class CardReader():
                 Nothing
         """
         
-        print ("\nYELLOW LED ON")
+        logger.debug("YELLOW LED ON")
         
         #command code to turn on the yellow LED, note that LED's turn on automatically based
         #on certain commands like read and write
-        self.__serialConn.write(ESCAPE + YELLOW_LED_ON)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['yellow_led_on'])
     
         #no response from the MSR605, just the LED change
     
         return None
     
+    @instrumented
+    @reconnecting
     def red_led_on(self):
         """ This command is used to turn on the red LED.
         
@@ -650,12 +1144,11 @@ class CardReader():
                 Nothing
         """
         
-        print ("\nRED LED ON")
+        logger.debug("RED LED ON")
         
         #command code to turn on the red LED, note that LED's turn on automatically based
         #on certain commands like read and write
-        self.__serialConn.write(ESCAPE + RED_LED_ON)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['red_led_on'])
         
         #no response from the MSR605, just the LED change
         
@@ -667,6 +1160,9 @@ class CardReader():
     #
     # ****************************************
     
+    @instrumented
+    @reconnecting
+    @interruptible
     def communication_test(self):
         """This command is used to verify that the communication link between computer and
             MSR605 is up and good.
@@ -681,26 +1177,28 @@ class CardReader():
                 CommunicationTestError: An error occurred while testing the MSR605's communication
         """
         
-        print ("\nCHECK COMMUNICATION LINK BETWEEN THE COMPUTER AND THE MSR605")
+        logger.debug("CHECK COMMUNICATION LINK BETWEEN THE COMPUTER AND THE MSR605")
         
         #command code for testing the MSR605 Communication with the Computer 
-        self.__serialConn.write(ESCAPE + COMMUNICATIONS_TEST)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['communication_test'])
         
         #response/output from the MSR605
-        if self.__serialConn.read() != ESCAPE:
+        if self.__read_byte() != ESCAPE:
             raise cardReaderExceptions.CommunicationTestError("COMMUNICATION ERROR, looking for "
                                                               "ESCAPE(\x1B)")
             return None
         
-        if self.__serialConn.read() != b'y':
+        if self.__read_byte() != b'y':
             raise cardReaderExceptions.CommunicationTestError("COMMUNICATION ERROR, looking for "
                                                               "y(\x79)")
     
-        print ("COMMUNICATION IS GOOD")
+        logger.debug("COMMUNICATION IS GOOD")
     
         return None
 
+    @instrumented
+    @reconnecting
+    @interruptible
     def sensor_test(self):
         """ This command is used to verify that the card sensing circuit of MSR605 is
             working properly. MSR605 will not response until a card is sensed or receive
@@ -709,33 +1207,39 @@ class CardReader():
             NOTE** A CARD NEEDS TO BE SWIPED AS STATED ABOVE
         
             Args:
-               None
+                deadline: optional (keyword only), a time.monotonic() value, if no card is swiped
+                            by then the MSR605 is reset and an OperationTimeout is returned
+                
+                cancelToken: optional (keyword only), a CancelToken, cancelling it does the
+                            same thing as the deadline running out
         
             Returns:
-                Nothing
+                Nothing, or an OperationTimeout if the deadline ran out or it was cancelled
         
             Raises:
                 SensorTestError: An error occurred while testing the MSR605's communication
         """
         
-        print ("\nTESTING SENSOR'S")
+        logger.debug("TESTING SENSOR'S")
         
         #command code for testing the card sensing circuit
-        self.__serialConn.write(ESCAPE + SENSOR_TEST)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['sensor_test'])
         
         
         #response/output from the MSR605        
-        if self.__serialConn.read() != ESCAPE:
+        if self.__read_byte() != ESCAPE:
             raise cardReaderExceptions.SensorTestError("SENSOR TEST ERROR, looking for ESCAPE(\x1B)")
         
-        if self.__serialConn.read() != b'0':
+        if self.__read_byte() != b'0':
             raise cardReaderExceptions.SensorTestError("SENSOR TEST ERROR, looking for 0(\x30)")
     
-        print ("TESTS WERE SUCCESSFUL")
+        logger.info("SENSOR TESTS WERE SUCCESSFUL")
     
         return None
     
+    @instrumented
+    @reconnecting
+    @interruptible
     def ram_test(self):
         """This command is used to request MSR605 to perform a test on its on board RAM.
     
@@ -749,18 +1253,17 @@ class CardReader():
             RamTestError: An error occurred accessing the bigtable.Table object.
         """
         
-        print ("\nTESTING THE RAM")
+        logger.debug("TESTING THE RAM")
         
         #command code for testing the ram
-        self.__serialConn.write(ESCAPE + RAM_TEST)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['ram_test'])
         
         
         #response/output from the MSR605
-        if self.__serialConn.read() != ESCAPE:
+        if self.__read_byte() != ESCAPE:
             raise cardReaderExceptions.RamTestError("RAM TEST ERROR, looking for ESCAPE(\x1B)")
         
-        ramTestResponse = self.__serialConn.read()
+        ramTestResponse = self.__read_byte()
         
         if ramTestResponse != b'0':
             
@@ -772,7 +1275,7 @@ class CardReader():
             else:                
                 raise cardReaderExceptions.RamTestError("RAM TEST ERROR, the RAM test has failed")
         
-        print ("RAM TESTS SUCCESSFUL")
+        logger.info("RAM TESTS SUCCESSFUL")
         
         return None
     
@@ -784,6 +1287,9 @@ class CardReader():
     #
     # **********************************
     
+    @instrumented
+    @reconnecting
+    @interruptible
     def set_hi_co(self):
         """This command is used to set MSR605 status to write Hi-Co card.
         
@@ -800,24 +1306,23 @@ class CardReader():
             SetCoercivityError: An error occurred when setting the coercivity 
         """
         
-        print ("\nSETTING THE MSR605 TO HI-COERCIVITY")
+        logger.debug("SETTING THE MSR605 TO HI-COERCIVITY")
     
         #command code for setting the MSR605 to Hi-Coercivity
         
-        self.__serialConn.write(ESCAPE + HI_CO)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['set_hi_co'])
         
         #response/output from the MSR605
         #for some reason i get this response before getting to the escape character EVU3.10
         
         #if this is false than move on to the next part of the response
-        if self.__serialConn.read() != ESCAPE:
+        if self.__read_byte() != ESCAPE:
            
             #just read until the 0 of the EVU3.10 response
             self.read_until('0', 4, False)
             
             #after reading that weird response,i check if there is an ESCAPE character
-            if self.__serialConn.read() != ESCAPE:
+            if self.__read_byte() != ESCAPE:
                 raise cardReaderExceptions.SetCoercivityError("SETTING THE DEVICE TO HI-CO ERROR"
                                                             ", looking for ESCAPE(\x1B)", "high")
         
@@ -825,15 +1330,21 @@ class CardReader():
         
         
         
-        if self.__serialConn.read() != b'0':
+        if self.__read_byte() != b'0':
             raise cardReaderExceptions.SetCoercivityError("SETTING THE DEVICE TO HI-CO ERROR, looking "
                                                             "for 0(\x30), Device might have not been set "
                                                             "to Hi-Co", "high")
         
-        print ("SUCCESSFULLY SET THE MSR605 TO HI-COERCIVITY")
+        logger.info("SUCCESSFULLY SET THE MSR605 TO HI-COERCIVITY")
+        
+        #remembered so it can be set again after reconnecting
+        self.__coercivity = "hi"
         
         return None
     
+    @instrumented
+    @reconnecting
+    @interruptible
     def set_low_co(self):
         """This command is used to set MSR605 status to write Low-Co card.
         
@@ -850,37 +1361,42 @@ class CardReader():
             SetCoercivityError: An error occurred when setting the coercivity 
         """
         
-        print ("\nSETTING THE MSR605 TO LOW-COERCIVITY")
+        logger.debug("SETTING THE MSR605 TO LOW-COERCIVITY")
     
         #command code for setting the MSR605 to Low-Coercivity
-        self.__serialConn.write(ESCAPE + LOW_CO)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['set_low_co'])
         
         #response/output from the MSR605
         #for some reason i get this response before getting to the escape character EVU3.10
         
         #if this is false than move on to the next part of the response        
-        if self.__serialConn.read() != ESCAPE:
+        if self.__read_byte() != ESCAPE:
 
             #just read until the 0 of the EVU3.10 response
             self.read_until('0', 4, False)
             
             #after reading that weird response,i check if there is an ESCAPE character
-            if self.__serialConn.read() != ESCAPE:
+            if self.__read_byte() != ESCAPE:
                 raise cardReaderExceptions.SetCoercivityError("SETTING THE DEVICE TO LOW-CO "
                                                             "ERROR, looking for ESCAPE(\x1B)", "low")
         
 
         
-        if self.__serialConn.read() != b'0':
+        if self.__read_byte() != b'0':
             raise cardReaderExceptions.SetCoercivityError("SETTING THE DEVICE TO LOW-CO ERROR, "
                                                             "looking for 0(\x30), Device might have "
                                                             "not been set to Low-Co", "low")
         
-        print ("SUCCESSFULLY SET THE MSR605 TO LOW-COERCIVITY")
+        logger.info("SUCCESSFULLY SET THE MSR605 TO LOW-COERCIVITY")
+        
+        #remembered so it can be set again after reconnecting
+        self.__coercivity = "low"
         
         return None
     
+    @instrumented
+    @reconnecting
+    @interruptible
     def get_hi_or_low_co(self):
         """This command is to get MSR605 write status, is it in Hi/Low Co
         
@@ -901,35 +1417,34 @@ class CardReader():
             GetCoercivityError: An error occurred when setting the coercivity 
         """
     
-        print ("\nGETTING THE MSR60 COERCIVITY (HI OR LOW)")
+        logger.debug("GETTING THE MSR605 COERCIVITY (HI OR LOW)")
     
         #command code for getting the MSR605 Coercivity
-        self.__serialConn.write(ESCAPE + HI_OR_LOW_CO)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['get_hi_or_low_co'])
         
         #response/output from the MSR605
         #for some reason i get this response before getting to the escape character EVU3.10
         
         #if this is false than move on to the next part of the response                
-        if self.__serialConn.read() != ESCAPE:
+        if self.__read_byte() != ESCAPE:
             
             #just read until the 0 of the EVU3.10 response        
             self.read_until('0', 4, False)
             
             #after reading that weird response,i check if there is an ESCAPE character
-            if self.__serialConn.read() != ESCAPE:
+            if self.__read_byte() != ESCAPE:
                 raise cardReaderExceptions.GetCoercivityError("HI-CO OR LOW-CO ERROR, looking"
                                                               "for ESCAPE(\x1B)")
         
         
-        coMode = self.__serialConn.read()
+        coMode = self.__read_byte()
         
         if coMode == b'h':
-            print ("COERCIVITY: HI-CO")
+            logger.info("COERCIVITY: HI-CO")
             return "HI-CO"
         
         elif coMode == b'l':
-            print ("COERCIVITY: LOW-CO")
+            logger.info("COERCIVITY: LOW-CO")
             return "LOW-CO"
         
         else:
@@ -940,26 +1455,172 @@ class CardReader():
 
     # ***************************************************
     #
-    #     Data Processing (lol idk what to call these)
+    #     MSR605 Track Density (BPI/BPC) functions 
     #
     # ***************************************************
     
-    def read_until(self, endCharacter, trackNum, compareToISO):
-        """This reads from the serial COM port and continues to read until it reaches
-            the end character (endCharacter)
-
-    
+    @instrumented
+    @reconnecting
+    @interruptible
+    def set_bpi(self, track, density):
+        """This command is used to select the density (bits per inch) a track is written
+            with, 210 BPI fits almost 3 times as much data on a track as 75 BPI
+            
+            The ISO standard is 210 BPI for track 1 and 3 and 75 BPI for track 2
+        
         Args:
-            endCharacter: this is character (like a delimiter), the function returns all
-                            the data up to this character, ex: ESCAPE, 's'
-                            
-                            
-            trackNum: this is an integer between 1 and 3, the # represents a track #, it
-                        is used to check if the track data fits the ISO standard, it is
-                        sorta canonicalized, used in the iso_standard_track_check function
+            track: the track # (1, 2 or 3)
             
-            compareToISO: this is a boolean that if True will use the trackNum provided and
-                            compare the data provided with the ISO Standard for Magnetic Strip
+            density: 75 or 210
+            
+        Returns:
+            Nothing
+    
+        Raises:
+            SetBPIError: The track or density is invalid or the MSR605 didn't accept it
+        """
+        
+        frame = BPI_FRAMES.get((track, density))
+        
+        if (frame is None):
+            raise cardReaderExceptions.SetBPIError("SETTING THE BPI ERROR, the track has to be 1, 2 "
+                                                   "or 3 and the density 75 or 210", track)
+        
+        logger.debug("SETTING TRACK %d TO %d BPI", track, density)
+        
+        self.__send(frame)
+        
+        if self.__read_byte() != ESCAPE:
+            raise cardReaderExceptions.SetBPIError("SETTING THE BPI ERROR, looking for "
+                                                   "ESCAPE(\x1B)", track)
+        
+        if self.__read_byte() != b'0':
+            raise cardReaderExceptions.SetBPIError("SETTING THE BPI ERROR, looking for 0(\x30), "
+                                                   "the BPI might have not been set", track)
+        
+        logger.info("SUCCESSFULLY SET TRACK %d TO %d BPI", track, density)
+        
+        #remembered for reading and so it can be set again after reconnecting
+        self.__bpi[track - 1] = density
+        
+        return None
+    
+    @instrumented
+    @reconnecting
+    @interruptible
+    def set_bpc(self, track1, track2, track3):
+        """This command is used to set the bits per character (including the parity bit) of
+            each track, fewer bits per character fits more characters on a track
+            
+            The ISO standard is 7 for track 1 (alphanumeric) and 5 for track 2 and 3 (numeric)
+        
+        Args:
+            track1, track2, track3: the bits per character of each track, between 5 and 8
+            
+        Returns:
+            Nothing
+    
+        Raises:
+            SetBPCError: A value is invalid or the MSR605 didn't accept them
+        """
+        
+        bpc = [track1, track2, track3]
+        
+        for bits in bpc:
+            if not (isinstance(bits, int) and bits >= 5 and bits <= 8):
+                raise cardReaderExceptions.SetBPCError("SETTING THE BPC ERROR, the bits per "
+                                                       "character have to be between 5 and 8")
+        
+        logger.debug("SETTING THE BPC TO %s", bpc)
+        
+        self.__send(ESCAPE + SET_BPC + bytes(bpc))
+        
+        if self.__read_byte() != ESCAPE:
+            raise cardReaderExceptions.SetBPCError("SETTING THE BPC ERROR, looking for "
+                                                   "ESCAPE(\x1B)")
+        
+        if self.__read_byte() != b'0':
+            raise cardReaderExceptions.SetBPCError("SETTING THE BPC ERROR, looking for 0(\x30), "
+                                                   "the BPC might have not been set")
+        
+        #the MSR605 sends back the BPC it was set to
+        for bits in bpc:
+            if self.__read_byte() != bytes((bits,)):
+                raise cardReaderExceptions.SetBPCError("SETTING THE BPC ERROR, the MSR605 sent "
+                                                       "back a different BPC")
+        
+        logger.info("SUCCESSFULLY SET THE BPC TO %s", bpc)
+        
+        #remembered for reading and so it can be set again after reconnecting
+        self.__bpc = bpc
+        
+        return None
+    
+    def get_bpi(self):
+        """Returns a list with the density (bits per inch) of each track, the last values
+            set with set_bpi (the ISO standard ones if it hasn't been used)
+        """
+        
+        return list(self.__bpi)
+    
+    def get_bpc(self):
+        """Returns a list with the bits per character of each track, the last values set
+            with set_bpc (the ISO standard ones if it hasn't been used)
+        """
+        
+        return list(self.__bpc)
+    
+    def track_capacity(self, trackNum):
+        """Returns how many characters fit on a track at its current BPI and BPC"""
+        
+        return track_length_limit(trackNum, self.__bpi[trackNum - 1], self.__bpc[trackNum - 1])
+    
+    def decode_raw(self, tracks):
+        """Decodes the raw tracks from read_raw using the current BPC (see isoTrackDecoder.py,
+            it needs NumPy)
+        
+        Args:
+            tracks: the 3 raw tracks
+            
+        Returns:
+            A list of 3 DecodedTrack's (None for a track that couldn't be decoded)
+    
+        Raises:
+            ValueError: a track is set to a BPC that isn't an ISO one (only 5 and 7 can be
+                        decoded)
+        """
+        
+        #only imported when it's needed, so the rest of CardReader doesn't need NumPy
+        from isoTrackDecoder import decode_tracks
+        
+        return decode_tracks(tracks, self.__bpc)
+
+
+    # ***************************************************
+    #
+    #     Data Processing (lol idk what to call these)
+    #
+    # ***************************************************
+    
+    def read_until(self, endCharacter, trackNum, compareToISO):
+        """This reads from the serial COM port and continues to read until it reaches
+            the end character (endCharacter)
+            
+            The data is pulled off the port in bulk (see __fill_buffer), the end character is
+            found with a single find() over the buffer and each chunk is decoded once
+
+    
+        Args:
+            endCharacter: this is character (like a delimiter), the function returns all
+                            the data up to this character, ex: ESCAPE, 's'
+                            
+                            
+            trackNum: this is an integer between 1 and 3, the # represents a track #, it
+                        is used to check if the track data fits the ISO standard, it is
+                        sorta canonicalized, used in the iso_standard_track_check function
+            
+            compareToISO: this is a boolean that if True will use the trackNum provided and
+                            compare the data provided with the ISO Standard for Magnetic Strip
                             cards, if False the ISO Standard check will not be run
                         
     
@@ -973,9 +1634,6 @@ class CardReader():
             Nothing
         """
         
-        #counter
-        i = 0
-        
         #track 3 can contain more characters than track 1 or 2, it being 107 characters
         #this is just a small check, doesn't need to be there but i thought might as well
         #conform to the ISO standard and make sure we don't have an infinite loop
@@ -986,41 +1644,628 @@ class CardReader():
         else:
             cond = 107
         
-        string = ""
-       
-        while (i < cond): 
-            strCompare = self.__serialConn.read()
-            str = strCompare.decode()
+        if (isinstance(endCharacter, str)):
+            endCharacter = endCharacter.encode()
+        
+        #counts the characters that made it past the ISO check, same as the old byte by byte loop
+        i = 0
+        pieces = []
+        
+        while (i < cond):
+            if (self.__rxPos >= len(self.__rxBuffer)):
+                self.__clear_buffer()
+                
+                #nothing came in (only happens if the port has a timeout), return what we have
+                if (self.__fill_buffer() == 0):
+                    break
+            
+            #looks for the end character in everything that has been received so far, rather
+            #than reading and comparing one byte at a time
+            end = self.__rxBuffer.find(endCharacter, self.__rxPos)
+            stop = end if end != -1 else len(self.__rxBuffer)
+            
+            chunk = self.__rxBuffer[self.__rxPos:stop]
             
-            #only runs the ISO checks if required
+            #only runs the ISO checks if required, the control characters are always let through,
+            #the whole chunk is checked at once with a table of the bytes to take out
             if (compareToISO):
-                #checks if the track data is valid based on the track data 
-                if not (strCompare == ESCAPE or strCompare == FILE_SEPERATOR or strCompare == ACKNOWLEDGE or                    
-                        strCompare == START_OF_HEADING or strCompare == START_OF_TEXT or strCompare == END_OF_TEXT ):
-                    
-                    if (iso_standard_track_check(str,trackNum) == False):
-                        continue
+                chunk = chunk.translate(None, iso_delete_table(trackNum, CONTROL_CHARACTERS))
             
-            #if the special End of Line character is read, usually is the control character (ex: ESCAPE)
+            #latin-1 maps every byte to a character so a bad byte can't raise a UnicodeDecodeError
+            chunk = chunk.decode('latin-1')
             
-            if (isinstance(endCharacter, bytes)):                
-                if (str == endCharacter.decode()):
-                    return string
-                
-            else:                
-                if (str == endCharacter):
-                    return string
+            if (i + len(chunk) >= cond):
+                #the track is longer than the ISO standard allows, stop right after the character
+                #that reaches the limit and leave the rest in the buffer
+                return ''.join(pieces) + self.__consume_until_limit(stop, cond - i, trackNum,
+                                                                      compareToISO)
             
-            if (strCompare != ESCAPE):
-                string += str #keeps accumlating the track data
-                
-            i += 1
+            i += len(chunk)
+            pieces.append(chunk.replace('\x1b', ''))
+            
+            if (end != -1):
+                self.__rxPos = end + 1
+                return ''.join(pieces)
+            
+            self.__rxPos = stop
             
         #some cards i tried didn't follow the format/standard they were suppposed to, so rather than
         #adding special cases, i just return the data
+        return ''.join(pieces)
+    
+    
+    def __consume_until_limit(self, stop, remaining, trackNum, compareToISO):
+        """Takes characters from the receive buffer until the track length limit is hit
+        
+            Only used by read_until for the rare track that is longer than the ISO standard
+            allows, so it is fine for this to go character by character
+    
+        Args:
+            stop: the buffer position where the scan for the end character stopped
+            
+            remaining: how many more characters can be accepted before hitting the limit
+            
+            trackNum: the track #, used for the ISO standard check
+            
+            compareToISO: if True the ISO standard check is run on each character
+    
+        Returns:
+            A string with the accepted characters, ESCAPE characters are counted but not kept
+            
+        Raises:
+            Nothing
+        """
+        
+        string = ""
+        
+        while (remaining > 0 and self.__rxPos < stop):
+            char = chr(self.__rxBuffer[self.__rxPos])
+            self.__rxPos += 1
+            
+            if (compareToISO and not (char in CONTROL_CHARACTERS or
+                                      iso_standard_track_check(char, trackNum))):
+                continue
+            
+            if (char != '\x1b'):
+                string += char
+            
+            remaining -= 1
+        
         return string
     
+    
+    def __parse_response(self, parser):
+        """Feeds the MSR605's response to a parser until the parser has the whole response
+        
+            The receive buffer is handed to the parser without copying it, anything left
+            after the end of the response stays in the buffer for the next command
+    
+        Args:
+            parser: a push parser with a feed() method and a bytesUsed attribute, like
+                    the ReadResponseParser
+    
+        Returns:
+            Whatever the parser returns when the response is complete
+            
+        Raises:
+            CardReadError: nothing came in before the serial port's timeout, so the response
+                            will never be finished (ex: a replayed session that has run out)
+        """
+        
+        while True:
+            if (self.__rxPos >= len(self.__rxBuffer)):
+                self.__clear_buffer()
+                
+                #with a deadline or cancel token __fill_buffer keeps waiting, so an empty read
+                #only happens when the port has a timeout and nothing is coming
+                if (self.__fill_buffer() == 0):
+                    raise cardReaderExceptions.CardReadError("[Datablock] READ ERROR, the "
+                                                             "MSR605 stopped responding before "
+                                                             "the end of the response", None)
+            
+            with memoryview(self.__rxBuffer) as view:
+                with view[self.__rxPos:] as chunk:
+                    result = parser.feed(chunk)
+            
+            self.__rxPos += parser.bytesUsed
+            
+            if (result is not None):
+                return result
+    
+    
+    def __fill_buffer(self):
+        """Pulls everything that is waiting on the serial port into the receive buffer
+        
+            This used to be a read() for every byte, now it is one read for all the bytes the
+            serial port already has, if nothing is waiting it blocks for one byte just like
+            before (or until the port's timeout if one is set)
+    
+        Args:
+            None
+    
+        Returns:
+            The number of bytes that were added to the receive buffer
+            
+        Raises:
+            Nothing
+        """
+        
+        waiting = self.__serialConn.in_waiting
+        data = self.__serialConn.read(waiting if waiting > 0 else 1)
+        
+        #a command with a deadline or cancel token reads with a short timeout and checks them
+        #every time the read comes back empty
+        while (not data and self.__interrupt is not None):
+            self.__check_interrupt()
+            
+            waiting = self.__serialConn.in_waiting
+            data = self.__serialConn.read(waiting if waiting > 0 else 1)
+        
+        if (self.__awaitingFirstByte and data):
+            self.__awaitingFirstByte = False
+            self.__metrics.observe(self.__portName, self.__command, 'first_byte',
+                                   time.monotonic() - self.__writtenAt)
+        
+        self.__rxBuffer += data
+        
+        return len(data)
+    
+    
+    def __read_byte(self):
+        """Returns the next byte of the response from the MSR605
+        
+            The byte comes from the receive buffer, the buffer is only refilled from the
+            serial port once everything in it has been used
+    
+        Args:
+            None
+    
+        Returns:
+            A bytes object with a single byte in it, or an empty bytes object if nothing came
+            in before the serial port's timeout
+            
+        Raises:
+            Nothing
+        """
         
+        if (self.__rxPos >= len(self.__rxBuffer)):
+            self.__clear_buffer()
+            
+            if (self.__fill_buffer() == 0):
+                return b''
+        
+        byte = self.__rxBuffer[self.__rxPos:self.__rxPos + 1]
+        self.__rxPos += 1
+        
+        return bytes(byte)
+    
+    
+    def __clear_buffer(self):
+        """Throws away anything left in the receive buffer, the bytearray itself is reused"""
+        
+        del self.__rxBuffer[:]
+        self.__rxPos = 0
+    
+        
+    # **********************************
+    #
+    #     Reconnecting (hot-plug)
+    #
+    # **********************************
+    
+    def enable_auto_reconnect(self, stablePort=None, timeout=None):
+        """Reconnects to the MSR605 by itself if it is unplugged and plugged back in
+        
+            A thread watches for the MSR605's port in the list of serial ports (see
+            cardReaderDiscovery.port_present), on Linux its entry in /dev/serial/by-id (that
+            name stays the same when the MSR605 is plugged back in, even if it comes back as
+            a different /dev/ttyUSB#). Any command that fails because the MSR605 was unplugged
+            waits for it to come back, reconnects and runs again (see reconnect)
+            
+            The wait happens inside the command, on the thread that called it, so a GUI
+            should give a short timeout and tell the user when the MSR605 doesn't come back
+    
+        Args:
+            stablePort: optional, the port to watch and reconnect to, by default the
+                        /dev/serial/by-id link for the port the MSR605 is on (or the port
+                        itself if there isn't one, ex: on Windows)
+            
+            timeout: optional, how long (in seconds) a command waits for the MSR605 to come
+                        back before raising MSR605ConnectError, RECONNECT_TIMEOUT if None
+    
+        Returns:
+            Nothing
+            
+        Raises:
+            MSR605ConnectError: the port the MSR605 is on isn't known (the transport that
+                                was passed in doesn't have a port)
+        """
+        
+        if (stablePort is None):
+            if (self.__portName is None):
+                raise cardReaderExceptions.MSR605ConnectError("CAN'T RECONNECT, THE PORT THE "
+                                                              "MSR605 IS ON ISN'T KNOWN")
+            
+            stablePort = cardReaderDiscovery.stable_port_name(self.__portName)
+        
+        self.__stablePort = stablePort
+        self.__reconnectTimeout = RECONNECT_TIMEOUT if timeout is None else timeout
+        self.__autoReconnect = True
+        
+        if (self.__watcher is None):
+            self.__watcher = threading.Thread(target=self.__watch_port, name="CardReaderWatcher",
+                                              daemon=True)
+            self.__watcher.start()
+    
+    
+    def disable_auto_reconnect(self):
+        """Stops watching for the MSR605 being unplugged"""
+        
+        self.__autoReconnect = False
+        
+        if (self.__watcher is not None):
+            self.__deviceAppeared.set()
+            self.__watcher.join()
+            self.__watcher = None
+    
+    
+    def auto_reconnect_enabled(self):
+        """Returns True if enable_auto_reconnect() is on and a reconnect isn't already going on"""
+        
+        return self.__autoReconnect and not self.__reconnecting
+    
+    
+    def reconnect(self, timeout=None, deadline=None, cancelToken=None):
+        """Opens the MSR605's port again after it was unplugged
+        
+            The port is tried right away and then again with exponential backoff
+            (RECONNECT_BACKOFF_START doubling up to RECONNECT_BACKOFF_MAX), the watcher thread
+            cuts the wait short as soon as the port shows up again. Once it is connected the
+            MSR605 is initialized and the last coercivity that was set is set again
+    
+        Args:
+            timeout: optional, seconds to keep trying, the timeout given to
+                        enable_auto_reconnect (RECONNECT_TIMEOUT by default) if None
+            
+            deadline: optional, a time.monotonic() value, the reconnect stops trying at
+                        this time even if the timeout hasn't run out (the deadline of the
+                        command that was running, see @reconnecting)
+            
+            cancelToken: optional, a CancelToken, cancelling it stops the reconnect
+    
+        Returns:
+            True if the MSR605 was reconnected, False if the deadline ran out or it was
+            cancelled first
+            
+        Raises:
+            MSR605ConnectError: the MSR605 didn't come back before the timeout
+        """
+        
+        with self.__reconnectLock:
+            self.__reconnecting = True
+            
+            try:
+                return self.__reconnect(self.__reconnectTimeout if timeout is None else timeout,
+                                        deadline, cancelToken)
+            finally:
+                self.__reconnecting = False
+    
+    
+    def __reconnect(self, timeout, deadline, cancelToken):
+        """The reconnect loop, see reconnect"""
+        
+        logger.warning("RECONNECTING TO THE MSR605")
+        
+        try:
+            self.__serialConn.close()
+        except(serial.SerialException, OSError):
+            pass #it is already gone
+        
+        port = self.__stablePort if self.__stablePort is not None else self.__portName
+        
+        if (port is None):
+            raise cardReaderExceptions.MSR605ConnectError("CAN'T RECONNECT, THE PORT THE "
+                                                          "MSR605 IS ON ISN'T KNOWN")
+        
+        giveUp = time.monotonic() + timeout
+        delay = RECONNECT_BACKOFF_START
+        
+        while True:
+            if (cancelToken is not None and cancelToken.cancelled):
+                return False
+            
+            self.__deviceAppeared.clear()
+            
+            try:
+                self.__serialConn = SerialTransport(port, timeout=PROBE_TIMEOUT)
+                
+                try:
+                    self.reset()
+                    self.communication_test()
+                    self.__serialConn.timeout = None
+                except BaseException:
+                    self.__serialConn.close()
+                    raise
+                
+                break
+                
+            except(cardReaderExceptions.CommunicationTestError, serial.SerialException, OSError):
+                pass
+            
+            now = time.monotonic()
+            
+            if (deadline is not None and now + delay >= deadline and deadline < giveUp):
+                logger.warning("THE MSR605 DIDN'T COME BACK BEFORE THE COMMAND'S DEADLINE")
+                return False
+            
+            if (now + delay >= giveUp):
+                raise cardReaderExceptions.MSR605ConnectError("THE MSR605 WAS UNPLUGGED AND "
+                                                              "DIDN'T COME BACK")
+            
+            #the watcher thread wakes this up as soon as the port is back
+            self.__deviceAppeared.wait(delay)
+            delay = min(delay * 2, RECONNECT_BACKOFF_MAX)
+        
+        #whatever was set before the MSR605 was unplugged is set again
+        if (self.__coercivity == "hi"):
+            self.set_hi_co()
+        elif (self.__coercivity == "low"):
+            self.set_low_co()
+        
+        for trackNum in range(1, 4):
+            if (self.__bpi[trackNum - 1] != ISO_BITS_PER_INCH[trackNum - 1]):
+                self.set_bpi(trackNum, self.__bpi[trackNum - 1])
+        
+        if (self.__bpc != list(ISO_BITS_PER_CHARACTER)):
+            self.set_bpc(*self.__bpc)
+        
+        logger.warning("RECONNECTED TO THE MSR605")
+        
+        return True
+    
+    
+    def __watch_port(self):
+        """The watcher thread, polls the MSR605's port and lets reconnect know when it's back"""
+        
+        present = cardReaderDiscovery.port_present(self.__stablePort)
+        
+        while (self.__autoReconnect):
+            time.sleep(RECONNECT_POLL_INTERVAL)
+            
+            nowPresent = cardReaderDiscovery.port_present(self.__stablePort)
+            
+            if (nowPresent and not present):
+                logger.info("THE MSR605 HAS BEEN PLUGGED BACK IN")
+                self.__deviceAppeared.set()
+            
+            elif (present and not nowPresent):
+                logger.warning("THE MSR605 HAS BEEN UNPLUGGED")
+            
+            present = nowPresent
+    
+    
+    @contextlib.contextmanager
+    def batch_commands(self):
+        """Collects the commands the MSR605 doesn't respond to and sends them in one write
+        
+            reset and the LED commands called inside the with block are held back and sent
+            together, with one write and one flush, when the block ends. A command that does
+            have a response (ex: read_card) sends everything that was held back in the same
+            write as itself, so the order the commands were called in doesn't change
+            
+            Example:
+                with msr.batch_commands():
+                    msr.reset()
+                    msr.led_off()
+                    msr.green_led_on()
+    
+        Args:
+            None
+    
+        Returns:
+            A context manager
+            
+        Raises:
+            Nothing, if the with block raises, the held back commands are thrown away
+        """
+        
+        if (self.__batchDepth == 0):
+            self.__batch = bytearray()
+        
+        self.__batchDepth += 1
+        
+        try:
+            yield self
+            
+            if (self.__batchDepth == 1 and len(self.__batch) > 0):
+                self.__serialConn.write(bytes(self.__batch))
+                self.__serialConn.flush()
+            
+        finally:
+            self.__batchDepth -= 1
+            
+            if (self.__batchDepth == 0):
+                self.__batch = None
+    
+    
+    def __send(self, frame):
+        """Writes a command frame to the MSR605
+        
+            Inside batch_commands() a command with no response is only added to the batch,
+            any other command is sent along with the batch
+    
+        Args:
+            frame: the bytes of the command, ex: COMMAND_FRAMES['reset']
+    
+        Returns:
+            Nothing
+            
+        Raises:
+            Nothing
+        """
+        
+        if (self.__batch is not None):
+            if (frame in NO_RESPONSE_FRAMES):
+                self.__batch += frame
+                return None
+            
+            if (len(self.__batch) > 0):
+                frame = bytes(self.__batch) + frame
+                del self.__batch[:]
+        
+        start = time.monotonic()
+        
+        self.__serialConn.write(frame)
+        
+        #so i might be a noob here but from what i read, flush waits for the command above
+        #to fully write and complete, I thought this was better than adding time delays
+        self.__serialConn.flush()
+        
+        if (self.__command is not None):
+            end = time.monotonic()
+            self.__metrics.observe(self.__portName, self.__command, 'write', end - start)
+            
+            if (self.__writtenAt is None):
+                self.__writtenAt = end
+                self.__awaitingFirstByte = True
+        
+        return None
+    
+    
+    def _run_instrumented(self, method, args, kwargs):
+        """Runs a command and records it in the metrics (used by the @instrumented decorator)
+        
+            The phases that are timed are write (writing the command), first_byte (end of the
+            write to the first byte back), frame (end of the write to the end of the response)
+            and total. A command run by another command (ex: reset after a timeout) is timed
+            on its own, then the outer command carries on where it was
+    
+        Args:
+            method: the undecorated CardReader method
+            
+            args, kwargs: its arguments
+    
+        Returns:
+            What the method returned
+            
+        Raises:
+            Whatever the method raised
+        """
+        
+        previous = (self.__command, self.__writtenAt, self.__awaitingFirstByte)
+        
+        self.__command = method.__name__
+        self.__writtenAt = None
+        self.__awaitingFirstByte = False
+        
+        outcome = 'ok'
+        start = time.monotonic()
+        
+        try:
+            result = method(self, *args, **kwargs)
+            
+            if (isinstance(result, OperationTimeout)):
+                outcome = 'cancelled' if result.cancelled else 'timeout'
+            
+            #read_card returns a Datablock CardReadError rather than raising it
+            elif (isinstance(result, Exception)):
+                outcome = type(result).__name__
+            
+            return result
+        
+        except cardReaderExceptions.StatusError as e:
+            outcome = 'StatusError'
+            self.__metrics.count_status_error(self.__portName, e.errorNum)
+            raise
+        
+        except BaseException as e:
+            outcome = type(e).__name__
+            raise
+        
+        finally:
+            end = time.monotonic()
+            
+            self.__metrics.observe(self.__portName, self.__command, 'total', end - start)
+            
+            #commands the MSR605 doesn't answer (reset, the LED's) don't have a frame
+            if (self.__writtenAt is not None and not self.__awaitingFirstByte and outcome == 'ok'):
+                self.__metrics.observe(self.__portName, self.__command, 'frame',
+                                       end - self.__writtenAt)
+            
+            self.__metrics.count_outcome(self.__portName, self.__command, outcome)
+            
+            self.__command, self.__writtenAt, self.__awaitingFirstByte = previous
+    
+    
+    def _run_interruptible(self, method, args, kwargs, deadline, cancelToken):
+        """Runs a command with a deadline and/or a cancel token, used by @interruptible
+        
+            While the command waits for the MSR605 the serial port is read with a short
+            timeout (INTERRUPT_POLL_INTERVAL) so the deadline and the token can be checked.
+            If the deadline runs out or the token is cancelled the MSR605 is reset, so it
+            isn't left waiting for a swipe and is ready for the next command
+    
+        Args:
+            method: the command (the function that @interruptible wrapped)
+            
+            args, kwargs: the arguments for the command
+            
+            deadline: a time.monotonic() value, None for no deadline
+            
+            cancelToken: a CancelToken, None if it can't be cancelled
+    
+        Returns:
+            What the command returns, or an OperationTimeout if the deadline ran out or it
+            was cancelled
+            
+        Raises:
+            What the command raises
+        """
+        
+        #a command that is called by another command is covered by the outer one's deadline
+        if (self.__interrupt is not None):
+            return method(self, *args, **kwargs)
+        
+        previousTimeout = self.__serialConn.timeout
+        self.__interrupt = (deadline, cancelToken)
+        
+        try:
+            self.__check_interrupt()
+            self.__serialConn.timeout = INTERRUPT_POLL_INTERVAL
+            
+            return method(self, *args, **kwargs)
+            
+        except _Interrupted as e:
+            self.__interrupt = None
+            
+            logger.info("%s %s", method.__name__.upper(),
+                        "WAS CANCELLED" if e.cancelled else "RAN OUT OF TIME")
+            self.reset()
+            
+            return OperationTimeout(method.__name__, e.cancelled)
+        
+        finally:
+            self.__interrupt = None
+            
+            try:
+                self.__serialConn.timeout = previousTimeout
+            except(serial.SerialException, OSError):
+                pass #the MSR605 was unplugged, the command's exception is more useful
+    
+    
+    def __check_interrupt(self):
+        """Raises _Interrupted if the running command's deadline has passed or it has been
+            cancelled"""
+        
+        deadline, cancelToken = self.__interrupt
+        
+        if (cancelToken is not None and cancelToken.cancelled):
+            raise _Interrupted(True)
+        
+        if (deadline is not None and time.monotonic() >= deadline):
+            raise _Interrupted(False)
+    
+    
     def status_read(self):
         """This reads the Status Byte of the response from the MSR605
 
@@ -1037,32 +2282,7 @@ class CardReader():
         """
         
         #reads in the Status Byte
-        status = (self.__serialConn.read()).decode()
-        print ("STATUS: " , status)
-        #checks what the stauts byte coorelates with, based off of the info provided from the
-        #MSR605  programming manual
-        if (status == '0'):
-            print ("CARD SUCCESSFULLY READ")
-        
-        elif (status == '1'):
-            print ("[Datablock] Error: 1(0x30h), 'Error, Write, or read error'")
-            raise cardReaderExceptions.StatusError("[Datablock] Error, 'Error, Write, or read error'", 1)
-        
-        elif (status == '2'):
-            print ("[Datablock] Error: 2(0x32h), 'Command format error'")
-            raise cardReaderExceptions.StatusError("[Datablock] Error, 'Command format error'", 2)
-        
-        elif (status == '4'):
-            print ("[Datablock] Error: 4(0x34h), 'Invalid command'")
-            raise cardReaderExceptions.StatusError("[Datablock] Error, 'Invalid command'", 4)
-    
-        elif (status == '9'):
-            print ("[Datablock] Error: 9(0x39h), 'Invalid card swipe when in write MODE'")
-            raise cardReaderExceptions.StatusError("[Datablock] Error, 'Invalid card swipe when in write "
-                                                    "mode'", 9)
-            
-        else: 
-            print ("UNKNOWN STATUS: " + status)
+        status_check((self.__read_byte()).decode('latin-1'))
             
         return None
     
@@ -1074,6 +2294,9 @@ class CardReader():
     # ***********************
     
        
+    @instrumented
+    @reconnecting
+    @interruptible
     def get_device_model(self):
         """This command is used to get the model of MSR605.
        
@@ -1089,29 +2312,31 @@ class CardReader():
             GetDeviceModelError: An error occurred when obtaining the device model
         """
         
-        print ("\nGETTING THE DEVICE MODEL")
+        logger.debug("GETTING THE DEVICE MODEL")
     
         #command code for getting the device model
-        self.__serialConn.write(ESCAPE + DEVICE_MODEL)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['get_device_model'])
         
         #response/output from the MSR605
-        if self.__serialConn.read() != ESCAPE:
+        if self.__read_byte() != ESCAPE:
             raise cardReaderExceptions.GetDeviceModelError("GETTING DEVICE MODEL ERROR, looking "
                                                  "for ESCAPE(\x1B)")
         
-        model = (self.__serialConn.read()).decode()
-        print ("MODEL: " + model)
+        model = (self.__read_byte()).decode()
+        logger.info("MODEL: %s", model)
         
-        if self.__serialConn.read() != b'S':
+        if self.__read_byte() != b'S':
             raise cardReaderExceptions.GetDeviceModelError("GETTING DEVICE MODEL ERROR, looking for "
                                                             "S(\x53), check the response, the model "
                                                             "might be right")
         
-        print ("SUCCESSFULLY RETRIEVED THE DEVICE MODEL")
+        logger.debug("SUCCESSFULLY RETRIEVED THE DEVICE MODEL")
         
         return model
     
+    @instrumented
+    @reconnecting
+    @interruptible
     def get_firmware_version(self):
         """This command can get the firmware version of MSR605.
     
@@ -1129,22 +2354,21 @@ class CardReader():
                                         version
         """
     
-        print ("\nGETTING THE FIRMWARE VERSION OF THE MSR605")
+        logger.debug("GETTING THE FIRMWARE VERSION OF THE MSR605")
     
         #command code for getting the firmware version of the MSR605
-        self.__serialConn.write(ESCAPE + FIRMWARE)
-        self.__serialConn.flush()
+        self.__send(COMMAND_FRAMES['get_firmware_version'])
         
         #response/output from the MSR605
-        if self.__serialConn.read() != ESCAPE:
+        if self.__read_byte() != ESCAPE:
             raise cardReaderExceptions.GetFirmwareVersionError("GETTING FIRMWARE VERSION ERROR, "
                                                     "looking for ESCAPE(\x1B)")
         
-        firmware = (self.__serialConn.read()).decode()
+        firmware = (self.__read_byte()).decode()
         
-        print ("FIRMWARE: " + firmware)
+        logger.info("FIRMWARE: %s", firmware)
         
-        print ("SUCCESSFULLY RETRIEVED THE FIRMWARE VERSION")
+        logger.debug("SUCCESSFULLY RETRIEVED THE FIRMWARE VERSION")
         return firmware
     
     
@@ -1152,4 +2376,132 @@ class CardReader():
         return self.__serialConn
     
     def setSerialConn(self, serialConn):
-        self.__serialConn = serialConn
\ No newline at end of file
+        #anything with the transport methods works (see cardReaderTransport.py), ex: to record
+        #the rest of the session (see sessionRecorder.py)
+        #   msr.setSerialConn(RecordingConnection(msr.getSerialConn(), 'session.rec'))
+        #a hot plug reconnect opens a new SerialTransport, which isn't recorded
+        self.__serialConn = serialConn
+        self.__clear_buffer()
+    
+    def getMetrics(self):
+        return self.__metrics
+    
+    def setMetrics(self, metrics):
+        #ex: a reader from probe_reader, which was connected with throwaway metrics
+        self.__metrics = metrics
+
+
+
+#only wraps the commands if profiling is on (MSR605_PROFILE_DIR or cardReaderProfiling.enable)
+cardReaderProfiling.register(CardReader, PROFILED_COMMANDS)
+
+
+def probe_port(port, timeout=PROBE_TIMEOUT):
+    """Checks if the MSR605 is on a serial port
+    
+        The port is opened with a short timeout and goes through the same initialization
+        CardReader does (reset, communication test, reset). This is run on a thread for
+        each port when CardReader is looking for the MSR605
+    
+    Args:
+        port: the name of the serial port, ex: /dev/ttyUSB0
+        
+        timeout: how long (in seconds) the port gets to answer each read
+    
+    Returns:
+        The open SerialTransport if the MSR605 answered, None if it didn't
+        
+    Raises:
+        Nothing
+    """
+    
+    reader = probe_reader(port, timeout)
+    
+    return reader.getSerialConn() if reader is not None else None
+
+
+def probe_reader(port, timeout=PROBE_TIMEOUT):
+    """The same as probe_port, but gives back the CardReader the port was initialized with
+        so it doesn't have to be initialized again (see cardReaderPool.discover_readers)
+    
+        The CardReader has its own metrics (so the ports that aren't the MSR605 don't show
+        up), use setMetrics to change them, and the port still has the probe's timeout
+    
+    Args:
+        port, timeout: see probe_port
+    
+    Returns:
+        The CardReader if the MSR605 answered, None if it didn't
+        
+    Raises:
+        Nothing
+    """
+    
+    try:
+        transport = SerialTransport(port, timeout=timeout)
+    except(serial.SerialException, OSError):
+        return None #the port is gone or being used by something else
+    
+    try:
+        return CardReader(transport, cardReaderMetrics.CardReaderMetrics())
+    except(cardReaderExceptions.CommunicationTestError, serial.SerialException, OSError):
+        transport.close()
+        return None
+
+
+def _close_probe(future, winner):
+    """Closes a port that was probed but isn't the one being used"""
+    
+    if (future.cancelled() or future.exception() is not None):
+        return
+    
+    transport = future.result()
+    
+    if (transport is not None and transport is not winner):
+        transport.close()
+
+
+def status_check(status):
+    """Checks the Status Byte of the response from the MSR605
+    
+        Used by CardReader.status_read and CardReader.read_card (which gets the Status Byte
+        from the ReadResponseParser), and by the AsyncCardReader
+
+    Args:
+       status: the Status Byte as a string, ex: '0'
+       
+    Returns:
+       Nothing
+
+    Raises:
+        StatusError: An error occurred when the MSR605 was performing the function you
+                        requested
+    """
+    
+    logger.debug("STATUS: %s", status)
+    #checks what the stauts byte coorelates with, based off of the info provided from the
+    #MSR605  programming manual
+    if (status == '0'):
+        logger.debug("STATUS OK")
+    
+    elif (status == '1'):
+        logger.warning("[Datablock] Error: 1(0x31h), 'Error, Write, or read error'")
+        raise cardReaderExceptions.StatusError("[Datablock] Error, 'Error, Write, or read error'", 1)
+    
+    elif (status == '2'):
+        logger.warning("[Datablock] Error: 2(0x32h), 'Command format error'")
+        raise cardReaderExceptions.StatusError("[Datablock] Error, 'Command format error'", 2)
+    
+    elif (status == '4'):
+        logger.warning("[Datablock] Error: 4(0x34h), 'Invalid command'")
+        raise cardReaderExceptions.StatusError("[Datablock] Error, 'Invalid command'", 4)
+
+    elif (status == '9'):
+        logger.warning("[Datablock] Error: 9(0x39h), 'Invalid card swipe when in write MODE'")
+        raise cardReaderExceptions.StatusError("[Datablock] Error, 'Invalid card swipe when in write "
+                                                "mode'", 9)
+        
+    else: 
+        logger.warning("UNKNOWN STATUS: %r", status)
+        
+    return None
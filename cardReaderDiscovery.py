@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+""" cardReaderDiscovery.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows, Linux
+    Python: 3.7 or newer
+
+    Description: This finds the serial ports the MSR605 could be on, CardReader uses it
+                 when it isn't given a transport
+
+                Rather than trying COM0 to COM254, the ports that actually exist are listed
+                with pySerial's list_ports (plus /dev/ttyUSB* and /dev/ttyACM* on Linux) and
+                only the ones from a USB to serial chip the MSR605 uses are kept.
+
+                The port the MSR605 was found on last time is saved in a small cache file and
+                is tried first the next time
+"""
+
+
+import glob, os
+
+from serial.tools import list_ports
+
+
+#USB (vendor id, product id) of the USB to serial chips the MSR605 has been sold with
+MSR605_USB_IDS = (
+    (0x067B, 0x2303), #Prolific PL2303, most MSR605's
+    (0x0403, 0x6001), #FTDI FT232R
+    (0x10C4, 0xEA60), #Silicon Labs CP210x
+)
+
+#where the last port the MSR605 was found on is saved
+PORT_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.msr605_port')
+
+
+def candidate_ports(usbIds=MSR605_USB_IDS, cacheFile=PORT_CACHE_FILE):
+    """Lists the serial ports that could have an MSR605 on them, best guess first
+
+        Args:
+            usbIds: the (vendor id, product id) pairs to look for, None keeps every port
+
+            cacheFile: the port cache file, the cached port is put first, None to not use it
+
+        Returns:
+            A list of port names, ex: ['/dev/ttyUSB0', '/dev/ttyACM0'] or ['COM3'], every
+            port list_ports knows about if none of them match usbIds
+
+        Raises:
+            Nothing
+    """
+
+    ports = []
+    otherDevices = set()
+
+    for port in list_ports.comports():
+        if (usbIds is None or (port.vid, port.pid) in usbIds):
+            ports.append(port.device)
+
+        elif (port.vid is not None):
+            #a USB device that isn't one of ours, don't bother opening it
+            otherDevices.add(port.device)
+
+    #list_ports doesn't always have the USB info (ex: inside containers), so any USB serial
+    #device it didn't rule out is still tried, after the ones that matched
+    for device in sorted(glob.glob('/dev/ttyUSB*')) + sorted(glob.glob('/dev/ttyACM*')):
+        if (device not in ports and device not in otherDevices):
+            ports.append(device)
+
+    #the MSR605 might have a USB to serial chip that isn't in usbIds (ex: on Windows, where
+    #there's no /dev/ttyUSB* to fall back on), so with nothing else to try every port is tried
+    if (len(ports) == 0):
+        ports = [port.device for port in list_ports.comports()]
+
+    cachedPort = load_cached_port(cacheFile) if cacheFile is not None else None
+
+    if (cachedPort is not None):
+        if (cachedPort in ports):
+            ports.remove(cachedPort)
+
+        ports.insert(0, cachedPort)
+
+    return ports
+
+
+def stable_port_name(port):
+    """Returns a name for the port that stays the same if the MSR605 is unplugged and plugged
+        back in
+
+        On Linux a USB serial device can come back as a different /dev/ttyUSB#, but its link
+        in /dev/serial/by-id (made from the USB serial number) doesn't change
+
+        Args:
+            port: the port the MSR605 is on right now, ex: /dev/ttyUSB0
+
+        Returns:
+            The /dev/serial/by-id link to the port, or the port itself if there isn't one
+
+        Raises:
+            Nothing
+    """
+
+    realPort = os.path.realpath(port)
+
+    for link in sorted(glob.glob('/dev/serial/by-id/*')):
+        if (os.path.realpath(link) == realPort):
+            return link
+
+    return port
+
+
+def port_present(port):
+    """True if the port is plugged in, used to notice the MSR605 coming back after it was
+        unplugged
+
+        The port is looked for in pySerial's list_ports (a COM port on Windows is never a
+        file, so checking the filesystem doesn't work there). On Linux and macOS a port
+        list_ports doesn't know about (ex: a /dev/serial/by-id link, or anything inside a
+        container) is present if its device file is
+
+        Args:
+            port: the port name, ex: COM3, /dev/ttyUSB0 or a /dev/serial/by-id link
+
+        Returns:
+            True if it's there
+
+        Raises:
+            Nothing
+    """
+
+    devices = set(info.device for info in list_ports.comports())
+
+    if (port in devices):
+        return True
+
+    if (os.name == 'nt'):
+        return False
+
+    return os.path.realpath(port) in devices or os.path.exists(port)
+
+
+def load_cached_port(cacheFile=PORT_CACHE_FILE):
+    """Returns the port the MSR605 was last found on, or None if there isn't one saved"""
+
+    try:
+        with open(cacheFile) as f:
+            port = f.read().strip()
+    except OSError:
+        return None
+
+    return port or None
+
+
+def save_cached_port(port, cacheFile=PORT_CACHE_FILE):
+    """Saves the port the MSR605 was found on so it is tried first next time
+
+        Args:
+            port: the port name
+
+            cacheFile: where to save it
+
+        Returns:
+            Nothing
+
+        Raises:
+            Nothing, the cache is only a speed up so failing to write it is ignored
+    """
+
+    try:
+        with open(cacheFile, 'w') as f:
+            f.write(port + '\n')
+    except OSError:
+        pass
@@ -87,4 +87,16 @@ class SetCoercivityError(Exception):
         
 class GetCoercivityError(Exception):
     def __init__(self, arg):
-        super(GetCoercivityError, self).__init__(arg)
\ No newline at end of file
+        super(GetCoercivityError, self).__init__(arg)
+
+
+class SetBPIError(Exception):
+    #also stores the track the BPI was being set for
+    def __init__(self, arg, track):
+        super(SetBPIError, self).__init__(arg)
+        self.track = track
+
+
+class SetBPCError(Exception):
+    def __init__(self, arg):
+        super(SetBPCError, self).__init__(arg)
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+
+""" cardReaderMetrics.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows, Linux
+    Python: 3.7 or newer
+
+    Description: This keeps track of how long each MSR605 command takes and how it turned out
+
+                CardReader times every command it runs (with time.monotonic) and puts the
+                timings into histograms with fixed buckets, one for each command and phase:
+                    write: writing the command to the serial port
+                    first_byte: from the end of the write to the first byte of the response
+                    frame: from the end of the write to the end of the response
+                    total: the whole command, start to finish
+
+                It also counts how each command turned out (ok, timeout, cancelled or the
+                exception it raised) and every StatusError by its error #.
+
+                The numbers can be looked at with snapshot(), or written to a file in the
+                Prometheus text format for node_exporter's textfile collector (openmetrics_text
+                has them in the OpenMetrics format):
+                    writer = TextfileWriter(cardReaderMetrics.DEFAULT_METRICS,
+                                            '/var/lib/node_exporter/textfile/msr605.prom')
+                    ...
+                    writer.close()
+"""
+
+
+import bisect, os, threading
+
+
+#upper bounds (in seconds) of the histogram buckets, there is always a +Inf bucket after these,
+#from a fast serial write up to waiting on a card swipe
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0, 60.0)
+
+#how often (in seconds) TextfileWriter writes the file
+TEXTFILE_INTERVAL = 15.0
+
+
+class Histogram():
+    """Counts of observations in fixed buckets, plus their sum
+
+        Attributes:
+            buckets: the upper bounds of the buckets (not counting +Inf)
+
+            counts: how many observations fell in each bucket (not cumulative), the last one is
+                    +Inf
+
+            sum: the total of all the observations
+
+            count: how many observations there are
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        #a value equal to a bound goes in that bucket (le is less than or equal)
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Returns the cumulative bucket counts, the way OpenMetrics wants them"""
+
+        total = 0
+        counts = []
+
+        for count in self.counts:
+            total += count
+            counts.append(total)
+
+        return counts
+
+    def copy(self):
+        histogram = Histogram(self.buckets)
+        histogram.counts = list(self.counts)
+        histogram.sum = self.sum
+        histogram.count = self.count
+        return histogram
+
+    def __repr__(self):
+        return "Histogram(count=%d, sum=%.6f)" % (self.count, self.sum)
+
+
+class CardReaderMetrics():
+    """The timings and counters of one or more CardReader's
+
+        Everything is labelled with the device (the port the MSR605 is on) so several
+        CardReader's (ex: a CardReaderPool) can share one CardReaderMetrics. It is thread
+        safe.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Creates empty metrics
+
+            Args:
+                buckets: the upper bounds (seconds) of the histogram buckets
+
+            Returns:
+                Nothing
+
+            Raises:
+                Nothing
+        """
+
+        self.__buckets = tuple(buckets)
+        self.__lock = threading.Lock()
+        self.reset()
+
+
+    def reset(self):
+        """Throws away everything that has been recorded"""
+
+        with self.__lock:
+            self.__latency = {}
+            self.__outcomes = {}
+            self.__statusErrors = {}
+
+
+    def observe(self, device, command, phase, seconds):
+        """Records how long a phase of a command took
+
+            Args:
+                device: the port of the MSR605, None if it isn't known
+
+                command: the CardReader method, ex: 'read_card'
+
+                phase: 'write', 'first_byte', 'frame' or 'total'
+
+                seconds: how long it took
+
+            Returns:
+                Nothing
+
+            Raises:
+                Nothing
+        """
+
+        key = (device, command, phase)
+
+        with self.__lock:
+            histogram = self.__latency.get(key)
+
+            if (histogram is None):
+                histogram = self.__latency[key] = Histogram(self.__buckets)
+
+            histogram.observe(seconds)
+
+
+    def count_outcome(self, device, command, outcome):
+        """Counts a finished command, outcome is 'ok', 'timeout', 'cancelled' or the name of
+            the exception it raised (or returned)
+        """
+
+        key = (device, command, outcome)
+
+        with self.__lock:
+            self.__outcomes[key] = self.__outcomes.get(key, 0) + 1
+
+
+    def count_status_error(self, device, errorNum):
+        """Counts a StatusError by its error # (1, 2, 4 or 9)"""
+
+        key = (device, errorNum)
+
+        with self.__lock:
+            self.__statusErrors[key] = self.__statusErrors.get(key, 0) + 1
+
+
+    def snapshot(self):
+        """Returns a copy of everything that has been recorded
+
+            Args:
+                None
+
+            Returns:
+                A dictionary:
+                    {
+                        'latency': {(device, command, phase): Histogram},
+                        'outcomes': {(device, command, outcome): count},
+                        'statusErrors': {(device, errorNum): count}
+                    }
+
+            Raises:
+                Nothing
+        """
+
+        with self.__lock:
+            return {
+                'latency': dict((key, histogram.copy())
+                                for key, histogram in self.__latency.items()),
+                'outcomes': dict(self.__outcomes),
+                'statusErrors': dict(self.__statusErrors),
+            }
+
+
+    def prometheus_text(self):
+        """Returns everything that has been recorded in the Prometheus text format (0.0.4),
+            the one node_exporter's textfile collector reads"""
+
+        return self.__text(False)
+
+
+    def openmetrics_text(self):
+        """Returns everything that has been recorded in the OpenMetrics text format"""
+
+        return self.__text(True)
+
+
+    def __text(self, openMetrics):
+        """Builds prometheus_text (openMetrics False) or openmetrics_text (openMetrics True)
+
+            The two formats are the same except that in OpenMetrics a counter family doesn't
+            have the _total on the end of its name (its samples do), and there are UNIT and
+            EOF lines. Prometheus would treat a family without the _total as an empty counter
+            and the _total samples as untyped
+        """
+
+        snapshot = self.snapshot()
+        lines = []
+
+        lines.append("# HELP msr605_command_duration_seconds How long each phase of an MSR605 "
+                     "command took.")
+        lines.append("# TYPE msr605_command_duration_seconds histogram")
+
+        if (openMetrics):
+            lines.append("# UNIT msr605_command_duration_seconds seconds")
+
+        for (device, command, phase), histogram in sorted(snapshot['latency'].items(),
+                                                          key=_sort_key):
+            labels = _labels(device=device, command=command, phase=phase)
+            bounds = [_format_number(bound) for bound in histogram.buckets] + ["+Inf"]
+
+            for bound, count in zip(bounds, histogram.cumulative()):
+                lines.append('msr605_command_duration_seconds_bucket{%s,le="%s"} %d' %
+                             (labels, bound, count))
+
+            lines.append("msr605_command_duration_seconds_count{%s} %d" % (labels, histogram.count))
+            lines.append("msr605_command_duration_seconds_sum{%s} %s" %
+                         (labels, _format_number(histogram.sum)))
+
+        family = "msr605_commands" if openMetrics else "msr605_commands_total"
+        lines.append("# HELP %s MSR605 commands that finished, by outcome." % family)
+        lines.append("# TYPE %s counter" % family)
+
+        for (device, command, outcome), count in sorted(snapshot['outcomes'].items(),
+                                                        key=_sort_key):
+            lines.append("msr605_commands_total{%s} %d" %
+                         (_labels(device=device, command=command, outcome=outcome), count))
+
+        family = "msr605_status_errors" if openMetrics else "msr605_status_errors_total"
+        lines.append("# HELP %s Status bytes from the MSR605 that were errors." % family)
+        lines.append("# TYPE %s counter" % family)
+
+        for (device, errorNum), count in sorted(snapshot['statusErrors'].items(), key=_sort_key):
+            lines.append("msr605_status_errors_total{%s} %d" %
+                         (_labels(device=device, code=errorNum), count))
+
+        if (openMetrics):
+            lines.append("# EOF")
+
+        return "\n".join(lines) + "\n"
+
+
+    def write_textfile(self, path):
+        """Writes prometheus_text() to a file
+
+            The text is written to a temporary file next to it which is then renamed over it,
+            so node_exporter never reads a half written file
+
+            Args:
+                path: where to write it, for node_exporter it has to end with .prom and be in
+                        the --collector.textfile.directory
+
+            Returns:
+                Nothing
+
+            Raises:
+                OSError: the file couldn't be written
+        """
+
+        #doesn't end in .prom so node_exporter ignores it
+        tempPath = path + "." + str(os.getpid()) + ".tmp"
+
+        try:
+            with open(tempPath, 'w') as f:
+                f.write(self.prometheus_text())
+
+            os.replace(tempPath, path)
+
+        except OSError:
+            try:
+                os.remove(tempPath)
+            except OSError:
+                pass
+
+            raise
+
+
+class TextfileWriter():
+    """Writes a CardReaderMetrics to a textfile every so often on a background thread"""
+
+    def __init__(self, metrics, path, interval=TEXTFILE_INTERVAL):
+        """Starts the background thread, the file is written right away
+
+            Args:
+                metrics: the CardReaderMetrics to write (ex: DEFAULT_METRICS)
+
+                path: the file to write, see CardReaderMetrics.write_textfile
+
+                interval: seconds between writes
+
+            Returns:
+                Nothing
+
+            Raises:
+                OSError: the file couldn't be written the first time
+        """
+
+        self.__metrics = metrics
+        self.__path = path
+        self.__interval = interval
+        self.__stop = threading.Event()
+
+        metrics.write_textfile(path)
+
+        self.__thread = threading.Thread(target=self.__run, name="MSR605MetricsWriter",
+                                         daemon=True)
+        self.__thread.start()
+
+
+    def close(self):
+        """Stops the background thread and writes the file one last time"""
+
+        if (self.__stop.is_set()):
+            return
+
+        self.__stop.set()
+        self.__thread.join()
+
+        self.__metrics.write_textfile(self.__path)
+
+
+    def __run(self):
+        while (not self.__stop.wait(self.__interval)):
+            try:
+                self.__metrics.write_textfile(self.__path)
+            except OSError:
+                #the directory might come back (ex: a tmpfs being remounted), try next time
+                pass
+
+
+def _labels(**labels):
+    """Formats labels for OpenMetrics, a label that is None is left out"""
+
+    return ",".join('%s="%s"' % (name, _escape(value))
+                    for name, value in sorted(labels.items()) if value is not None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value):
+    return repr(float(value))
+
+
+def _sort_key(item):
+    #the device can be None, which can't be compared with a str
+    return tuple(str(part) for part in item[0])
+
+
+#the metrics every CardReader records to unless it is given its own
+DEFAULT_METRICS = CardReaderMetrics()
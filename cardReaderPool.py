@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+
+""" cardReaderPool.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows, Linux
+    Python: 3.7 or newer
+
+    Description: This drives several MSR605's at the same time
+
+                The pool owns one CardReader per MSR605 and each one gets its own worker
+                thread. There is one job queue for all of them, so a job goes to whichever
+                MSR605 is free first and more MSR605's means more cards per minute.
+
+                Example:
+                    pool = CardReaderPool()
+
+                    futures = [pool.write_card(tracks, True) for tracks in cardsToWrite]
+
+                    for future in futures:
+                        future.result() #raises the same exceptions CardReader does
+
+                    print(pool.stats())
+                    pool.close()
+"""
+
+
+import concurrent.futures, queue, threading, time
+
+import cardReader, cardReaderDiscovery, cardReaderExceptions, cardReaderMetrics
+
+
+#the CardReader methods that can be sent to the pool
+POOL_OPERATIONS = frozenset(('read_card', 'write_card', 'erase_card', 'read_raw', 'write_raw',
+                             'read_card_consensus', 'reset', 'led_off',
+                             'led_on', 'green_led_on', 'yellow_led_on', 'red_led_on',
+                             'communication_test', 'sensor_test', 'ram_test', 'set_hi_co',
+                             'set_low_co', 'get_hi_or_low_co', 'set_bpi', 'set_bpc',
+                             'get_device_model', 'get_firmware_version'))
+
+
+class DeviceStats():
+    """How much work one MSR605 in the pool has done
+
+        Attributes:
+            port: the port the MSR605 is on (None if it isn't known)
+
+            jobs: how many jobs it has finished (including ones that raised)
+
+            errors: how many of those jobs raised an exception
+
+            busySeconds: total time spent running jobs
+
+            busy: True if it is running a job right now
+    """
+
+    __slots__ = ('port', 'jobs', 'errors', 'busySeconds', 'busy')
+
+    def __init__(self, port):
+        self.port = port
+        self.jobs = 0
+        self.errors = 0
+        self.busySeconds = 0.0
+        self.busy = False
+
+    def copy(self):
+        stats = DeviceStats(self.port)
+        stats.jobs = self.jobs
+        stats.errors = self.errors
+        stats.busySeconds = self.busySeconds
+        stats.busy = self.busy
+        return stats
+
+    def __repr__(self):
+        return ("DeviceStats(port=%r, jobs=%d, errors=%d, busySeconds=%.3f, busy=%r)" %
+                (self.port, self.jobs, self.errors, self.busySeconds, self.busy))
+
+
+class CardReaderPool():
+    """A pool of MSR605's that share one job queue
+
+        Attributes:
+            readers: the CardReader for each MSR605, in the same order as stats()
+    """
+
+    def __init__(self, readers=None):
+        """Starts a worker thread for each MSR605
+
+            Args:
+                readers: optional list of CardReader's to use, if None every MSR605 that is
+                            plugged in is found and connected to (see discover_readers)
+
+            Returns:
+                Nothing
+
+            Raises:
+                MSR605ConnectError: no MSR605's were found
+        """
+
+        if (readers is None):
+            readers = discover_readers()
+
+        if (len(readers) == 0):
+            raise cardReaderExceptions.MSR605ConnectError("NO MSR605'S WERE FOUND FOR THE POOL")
+
+        self.readers = list(readers)
+
+        self.__jobs = queue.Queue()
+        self.__statsLock = threading.Lock()
+        self.__stats = [DeviceStats(getattr(reader.getSerialConn(), 'port', None))
+                        for reader in self.readers]
+        #held while a job or the stops are being queued, so a job can't end up behind the stops
+        self.__closeLock = threading.Lock()
+        self.__closed = False
+
+        self.__workers = []
+
+        for index in range(len(self.readers)):
+            worker = threading.Thread(target=self.__work, args=(index,),
+                                      name="CardReaderPool-" + str(index), daemon=True)
+            worker.start()
+            self.__workers.append(worker)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+    def submit(self, operation, *args, **kwargs):
+        """Queues a CardReader method to be run on the next free MSR605
+
+            Args:
+                operation: the name of the CardReader method, ex: 'read_card', it has to be
+                            one of POOL_OPERATIONS
+
+                args, kwargs: what to pass to the method
+
+            Returns:
+                A concurrent.futures.Future, result() gives back what the method returned or
+                raises what it raised
+
+            Raises:
+                ValueError: the operation isn't one the pool can run
+
+                RuntimeError: the pool has been closed
+        """
+
+        if (operation not in POOL_OPERATIONS):
+            raise ValueError("CardReaderPool can't run " + repr(operation))
+
+        future = concurrent.futures.Future()
+
+        with self.__closeLock:
+            if (self.__closed):
+                raise RuntimeError("CardReaderPool is closed")
+
+            self.__jobs.put((future, operation, args, kwargs))
+
+        return future
+
+
+    def read_card(self):
+        """Queues a read_card, returns a Future for the tracks"""
+
+        return self.submit('read_card')
+
+
+    def write_card(self, tracks, statusByteCheck):
+        """Queues a write_card, returns a Future"""
+
+        return self.submit('write_card', tracks, statusByteCheck)
+
+
+    def erase_card(self, trackSelect):
+        """Queues an erase_card, returns a Future"""
+
+        return self.submit('erase_card', trackSelect)
+
+
+    def pending(self):
+        """Returns about how many jobs are waiting for an MSR605"""
+
+        return self.__jobs.qsize()
+
+
+    def stats(self):
+        """Returns a list with a copy of the DeviceStats of each MSR605"""
+
+        with self.__statsLock:
+            return [stats.copy() for stats in self.__stats]
+
+
+    def close(self):
+        """Finishes the jobs that were already queued, stops the workers and closes the
+            connection to every MSR605
+
+            A job that is somehow still queued after the workers stop (ex: a worker thread
+            died) has its Future failed with RuntimeError, so nothing waits on it forever
+
+            Args:
+                None
+
+            Returns:
+                Nothing
+
+            Raises:
+                Nothing
+        """
+
+        with self.__closeLock:
+            if (self.__closed):
+                return
+
+            self.__closed = True
+
+            #one stop for each worker, they're behind every job that was already queued
+            for worker in self.__workers:
+                self.__jobs.put(None)
+
+        for worker in self.__workers:
+            worker.join()
+
+        while True:
+            try:
+                job = self.__jobs.get_nowait()
+            except queue.Empty:
+                break
+
+            if (job is not None and job[0].set_running_or_notify_cancel()):
+                job[0].set_exception(RuntimeError("CardReaderPool was closed before the job "
+                                                  "was run"))
+
+        for reader in self.readers:
+            reader.close_serial_connection()
+
+
+    def __work(self, index):
+        """A worker thread, runs jobs on one MSR605 until close() is called"""
+
+        reader = self.readers[index]
+        stats = self.__stats[index]
+
+        while True:
+            job = self.__jobs.get()
+
+            if (job is None):
+                return
+
+            future, operation, args, kwargs = job
+
+            if (not future.set_running_or_notify_cancel()):
+                continue
+
+            with self.__statsLock:
+                stats.busy = True
+
+            start = time.monotonic()
+            failed = False
+
+            try:
+                result = getattr(reader, operation)(*args, **kwargs)
+            except Exception as e:
+                failed = True
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+            with self.__statsLock:
+                stats.busy = False
+                stats.jobs += 1
+                stats.busySeconds += time.monotonic() - start
+
+                if (failed):
+                    stats.errors += 1
+
+
+def discover_readers():
+    """Connects to every MSR605 that is plugged in
+
+        All the candidate ports are probed at the same time (see cardReader.probe_reader),
+        unlike CardReader() this keeps every port that answers, not just the first one. The
+        CardReader's from the probes are used as they are, the MSR605's aren't initialized a
+        second time
+
+        Args:
+            None
+
+        Returns:
+            A list of CardReader's, it is empty if nothing was found
+
+        Raises:
+            Nothing
+    """
+
+    ports = cardReaderDiscovery.candidate_ports()
+
+    if (len(ports) == 0):
+        return []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(ports),
+                                               cardReader.MAX_PROBE_THREADS)) as executor:
+        futures = [executor.submit(cardReader.probe_reader, port) for port in ports]
+
+    readers = []
+    found = False
+
+    try:
+        for future in futures:
+            reader = future.result()
+
+            if (reader is not None):
+                #the MSR605 has always been used with blocking reads
+                reader.getSerialConn().timeout = None
+                reader.setMetrics(cardReaderMetrics.DEFAULT_METRICS)
+                readers.append(reader)
+
+        found = True
+
+    finally:
+        #something went wrong, none of the MSR605's that answered are kept open
+        if (not found):
+            for future in futures:
+                if (future.exception() is None and future.result() is not None):
+                    future.result().close_serial_connection()
+
+    return readers
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+
+""" cardReaderProfiling.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows, Linux
+    Python: 3.7 or newer
+
+    Description: This profiles CardReader commands and GUI buttons, for when reading cards
+                 gets slow and it isn't clear if it's the MSR605, the parsing or the GUI
+
+                It's turned on with an environment variable before starting the program:
+                    MSR605_PROFILE_DIR=profiles python3 GUI.py
+
+                or from code:
+                    cardReaderProfiling.enable('profiles')
+                    ...
+                    cardReaderProfiling.disable()
+
+                Every operation gets its own cProfile file in the directory (ex:
+                CardReader.read_card-1503678000123-4242-1.prof), they can be opened with
+                pstats, snakeviz, etc:
+                    python3 -m pstats profiles/CardReader.read_card-1503678000123-4242-1.prof
+
+                The memory each operation allocated (with tracemalloc) goes in memory.jsonl in
+                the same directory, one JSON object per operation. Every Nth operation can also
+                save a tracemalloc snapshot (MSR605_PROFILE_SNAPSHOTS=N).
+
+                When profiling is off the methods aren't wrapped at all, so it costs nothing.
+                Only one operation is profiled at a time, a CardReader command the GUI calls
+                is in the GUI button's profile and an operation on another thread while one is
+                being profiled isn't profiled.
+
+                Environment variables:
+                    MSR605_PROFILE_DIR: where to put the profiles, profiling is on if it's set
+                    MSR605_PROFILE_MEMORY: 0 to turn off tracemalloc (it slows everything down)
+                    MSR605_PROFILE_SNAPSHOTS: save a tracemalloc snapshot every this many
+                                                operations (0, the default, is never)
+"""
+
+
+import cProfile, functools, itertools, json, logging, os, threading, time, tracemalloc
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR_ENV = 'MSR605_PROFILE_DIR'
+PROFILE_MEMORY_ENV = 'MSR605_PROFILE_MEMORY'
+PROFILE_SNAPSHOTS_ENV = 'MSR605_PROFILE_SNAPSHOTS'
+
+#the memory use of each operation is added to this file in the profile directory
+MEMORY_LOG = 'memory.jsonl'
+
+#how many frames of each allocation tracemalloc keeps (more makes the snapshots more useful and
+#everything slower)
+TRACEMALLOC_FRAMES = 1
+
+
+#the classes and method names that get profiled, see register
+_registered = []
+
+#(class, name): the method before it was wrapped, only has something in it while profiling is on
+_originals = {}
+
+#the settings from enable, None when profiling is off
+_settings = None
+
+#held while an operation is being profiled, see _run_profiled
+_active = threading.Lock()
+
+_counter = itertools.count(1)
+_settingsLock = threading.Lock()
+
+
+class _Settings():
+    __slots__ = ('directory', 'memory', 'snapshotEvery', 'startedTracemalloc')
+
+    def __init__(self, directory, memory, snapshotEvery, startedTracemalloc):
+        self.directory = directory
+        self.memory = memory
+        self.snapshotEvery = snapshotEvery
+        self.startedTracemalloc = startedTracemalloc
+
+
+def register(cls, names):
+    """Adds methods to profile when profiling is on (they are wrapped right away if it's
+        already on)
+
+        Args:
+            cls: the class, ex: CardReader
+
+            names: the names of the methods to profile, ex: ('read_card', 'write_card')
+
+        Returns:
+            Nothing
+
+        Raises:
+            AttributeError: the class doesn't have one of the methods
+    """
+
+    for name in names:
+        getattr(cls, name)
+
+    with _settingsLock:
+        _registered.append((cls, tuple(names)))
+
+        if (_settings is not None):
+            _wrap(cls, names)
+
+
+def enable(directory, memory=True, snapshotEvery=0):
+    """Turns profiling on, every registered method is wrapped
+
+        Args:
+            directory: where to put the profiles, it is created if it doesn't exist
+
+            memory: if True tracemalloc is started and the memory each operation allocated is
+                    saved in memory.jsonl
+
+            snapshotEvery: save a tracemalloc snapshot every this many operations, 0 is never
+
+        Returns:
+            Nothing
+
+        Raises:
+            OSError: the directory couldn't be created
+    """
+
+    global _settings
+
+    os.makedirs(directory, exist_ok=True)
+
+    with _settingsLock:
+        if (_settings is not None):
+            _disable()
+
+        startedTracemalloc = False
+
+        if (memory and not tracemalloc.is_tracing()):
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            startedTracemalloc = True
+
+        _settings = _Settings(directory, memory, snapshotEvery, startedTracemalloc)
+
+        for cls, names in _registered:
+            _wrap(cls, names)
+
+    logger.info("PROFILING TO %s", directory)
+
+
+def disable():
+    """Turns profiling off, the methods are put back the way they were"""
+
+    with _settingsLock:
+        _disable()
+
+
+def enabled():
+    """True if profiling is on"""
+
+    return _settings is not None
+
+
+def enable_from_environment():
+    """Turns profiling on if MSR605_PROFILE_DIR is set, this is done when the module is
+        imported
+
+        Returns:
+            True if profiling was turned on
+    """
+
+    directory = os.environ.get(PROFILE_DIR_ENV)
+
+    if (not directory):
+        return False
+
+    try:
+        snapshotEvery = int(os.environ.get(PROFILE_SNAPSHOTS_ENV, '0'))
+    except ValueError:
+        logger.warning("%s has to be a number, not taking snapshots", PROFILE_SNAPSHOTS_ENV)
+        snapshotEvery = 0
+
+    try:
+        enable(directory, os.environ.get(PROFILE_MEMORY_ENV) != '0', snapshotEvery)
+    except OSError as e:
+        logger.warning("COULDN'T PROFILE TO %s: %s", directory, e)
+        return False
+
+    return True
+
+
+def _disable():
+    global _settings
+
+    if (_settings is None):
+        return
+
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+
+    _originals.clear()
+
+    if (_settings.startedTracemalloc):
+        tracemalloc.stop()
+
+    _settings = None
+
+
+def _wrap(cls, names):
+    for name in names:
+        if ((cls, name) in _originals):
+            continue
+
+        #from the class's own dictionary, so a staticmethod/classmethod would stay one
+        original = cls.__dict__.get(name, getattr(cls, name))
+        _originals[(cls, name)] = original
+
+        setattr(cls, name, _profiled(original, cls.__name__ + "." + name))
+
+
+def _profiled(method, operation):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        return _run_profiled(method, operation, args, kwargs)
+
+    return wrapper
+
+
+def _run_profiled(method, operation, args, kwargs):
+    """Runs a method under cProfile (and tracemalloc) and saves the results"""
+
+    settings = _settings
+
+    #profiling was turned off on another thread, or something else is already being profiled
+    #(this operation is part of it if it's on the same thread)
+    if (settings is None or not _active.acquire(blocking=False)):
+        return method(*args, **kwargs)
+
+    try:
+        profile = cProfile.Profile()
+
+        try:
+            profile.enable()
+        except ValueError:
+            #another profiler (ex: python -m cProfile) is already running
+            return method(*args, **kwargs)
+
+        memory = settings.memory and tracemalloc.is_tracing()
+
+        if (memory):
+            memoryBefore = tracemalloc.get_traced_memory()[0]
+
+            #only in python 3.9+, before that the peak is the peak since tracemalloc started
+            if (hasattr(tracemalloc, 'reset_peak')):
+                tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+
+        try:
+            return method(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            profile.disable()
+
+            if (memory):
+                memoryAfter, memoryPeak = tracemalloc.get_traced_memory()
+
+            try:
+                number = next(_counter)
+                name = "%s-%d-%d-%d" % (operation, int(time.time() * 1000), os.getpid(), number)
+
+                profile.dump_stats(os.path.join(settings.directory, name + ".prof"))
+
+                if (memory):
+                    record = {
+                        'operation': operation,
+                        'profile': name + ".prof",
+                        'seconds': seconds,
+                        'allocated': memoryAfter - memoryBefore,
+                        'peak': memoryPeak - memoryBefore,
+                    }
+
+                    with open(os.path.join(settings.directory, MEMORY_LOG), 'a') as f:
+                        f.write(json.dumps(record) + "\n")
+
+                    if (settings.snapshotEvery > 0 and number % settings.snapshotEvery == 0):
+                        tracemalloc.take_snapshot().dump(os.path.join(settings.directory,
+                                                                      name + ".snapshot"))
+
+            except OSError as e:
+                #losing a profile shouldn't stop a card from being read
+                logger.warning("COULDN'T SAVE THE PROFILE OF %s: %s", operation, e)
+
+    finally:
+        _active.release()
+
+
+enable_from_environment()
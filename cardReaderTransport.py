@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+""" cardReaderTransport.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows, Linux
+    Python: 3.7 or newer
+
+    Description: This contains the transport interface that CardReader talks to the MSR605
+                 through, and the serial port implementation of it
+
+                The interface is the part of pySerial's Serial class that CardReader uses, so
+                a serial.Serial object can still be handed to CardReader directly. Anything
+                else (an emulator, a recording, a network socket) just has to implement the
+                methods in Transport.
+"""
+
+
+import abc, io
+
+import serial
+
+
+class Transport(abc.ABC):
+    """The methods CardReader needs from whatever connects it to the MSR605
+
+        Subclasses have to implement all of these (a subclass that is missing one can't be
+        made), they have the same meaning as the methods with the same name in pySerial's
+        Serial class. fileno is only needed by AsyncCardReader, by default there isn't one
+
+        Attributes:
+            in_waiting: the number of bytes that can be read without blocking
+
+            timeout: the read timeout in seconds, None blocks until a byte comes in (CardReader
+                        sets it while connecting and while a command can be interrupted)
+    """
+
+    @property
+    @abc.abstractmethod
+    def in_waiting(self):
+        raise NotImplementedError
+
+    @property
+    @abc.abstractmethod
+    def timeout(self):
+        raise NotImplementedError
+
+    @timeout.setter
+    @abc.abstractmethod
+    def timeout(self, timeout):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def read(self, size=1):
+        """Reads up to size bytes, blocks until at least one byte (or the timeout)
+
+            Args:
+                size: the most bytes to return
+
+            Returns:
+                A bytes object, it is empty if the timeout ran out before anything came in
+
+            Raises:
+                Whatever the transport raises when the device is gone (serial.SerialException
+                for serial ports)
+        """
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def write(self, data):
+        """Writes data to the device
+
+            Args:
+                data: bytes to send
+
+            Returns:
+                The number of bytes written
+
+            Raises:
+                Whatever the transport raises when the device is gone
+        """
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def flush(self):
+        """Waits until everything written has been sent"""
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def flushInput(self):
+        """Throws away anything that was received but not read yet"""
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def flushOutput(self):
+        """Throws away anything that was written but not sent yet"""
+
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def close(self):
+        """Closes the connection"""
+
+        raise NotImplementedError
+
+    def fileno(self):
+        """Returns the file descriptor the device is read from, AsyncCardReader waits on it
+            with the event loop
+
+            Raises:
+                io.UnsupportedOperation: the transport doesn't have one (the default)
+        """
+
+        raise io.UnsupportedOperation(type(self).__name__ + " doesn't have a file descriptor")
+
+
+class SerialTransport(Transport):
+    """Transport over a serial port, using pySerial
+
+        Attributes:
+            port: the name of the serial port, ex: COM3 or /dev/ttyUSB0
+    """
+
+    def __init__(self, port, timeout=None):
+        """Opens the serial port
+
+            Args:
+                port: the name of the serial port, ex: COM3 or /dev/ttyUSB0
+
+                timeout: read timeout in seconds, None blocks until a byte comes in (this is
+                            how CardReader has always opened the port)
+
+            Returns:
+                Nothing
+
+            Raises:
+                serial.SerialException: the port doesn't exist or is being used
+        """
+
+        self.port = port
+        self.__serialConn = serial.Serial(port, timeout=timeout)
+
+    @property
+    def in_waiting(self):
+        return self.__serialConn.in_waiting
+
+    @property
+    def timeout(self):
+        return self.__serialConn.timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self.__serialConn.timeout = timeout
+
+    def read(self, size=1):
+        return self.__serialConn.read(size)
+
+    def write(self, data):
+        return self.__serialConn.write(data)
+
+    def flush(self):
+        self.__serialConn.flush()
+
+    def flushInput(self):
+        self.__serialConn.reset_input_buffer()
+
+    def flushOutput(self):
+        self.__serialConn.reset_output_buffer()
+
+    def close(self):
+        self.__serialConn.close()
+
+    def fileno(self):
+        return self.__serialConn.fileno()
@@ -0,0 +1,746 @@
+#!/usr/bin/env python3
+
+""" cardStore.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows, Linux
+    Python: 3.7 or newer, SQLite 3.24 or newer (3.34 or newer for the trigram search index)
+
+    Description: This is the card database (cardDatabase.db), the GUI saves the cards it reads
+                 in it and anything else (a script, a CardReaderPool worker, etc) can use it too
+
+                ex:
+                    with CardStore() as store:
+                        if (not store.insert(msr.read_card(), allowDuplicates=False)):
+                            print("already saved")
+
+                        for rowid, trackOne, trackTwo, trackThree in store.iterate():
+                            ...
+
+                The database is opened in WAL mode with synchronous=NORMAL, so saving a card
+                doesn't wait for the disk (a power cut can lose the last few cards saved, but
+                can't corrupt the database) and reading the database doesn't block saving.
+                One CardStore can be shared by several threads.
+
+                Every card has a hash of its tracks (trackHash, BLAKE2b) with a UNIQUE index on
+                it, so checking for a duplicate is an index lookup rather than going through
+                the whole table. Only the first copy of a card has its hash, the duplicates
+                saved with allowDuplicates=True have NULL so they don't break the UNIQUE index.
+
+                Each track has an index too, so the cards can be gone through in order of any
+                track a page at a time (see page, the database window uses it).
+
+                The tracks are also in a full text index (CardsSearch, FTS5 with the trigram
+                tokenizer) that triggers keep up to date, so search can find any part of a
+                track, ex: a name or a few digits of a PAN, without going through every card:
+                    for rowid, trackOne, trackTwo, trackThree in store.search('DOE/J'):
+                        ...
+
+                The version of the database is kept in PRAGMA user_version, an older database
+                is upgraded when it is opened (see migrate)
+"""
+
+
+import contextlib, hashlib, logging, sqlite3, threading
+
+
+logger = logging.getLogger(__name__)
+
+DATABASE_PATH = "cardDatabase.db"
+
+#PRAGMA user_version of a database that is up to date, 0 is the table GUI.py used to make
+#(no trackHash), 1 added trackHash, 2 added the indexes on the tracks, 3 added CardsSearch and
+#4 turned the NULL tracks into empty strings and 5 gave Cards an INTEGER PRIMARY KEY
+SCHEMA_VERSION = 5
+
+#the size (in bytes) of the track hash
+HASH_SIZE = 16
+
+#the tracks are joined with this before they are hashed, it's a control character so it can't
+#be in a track
+HASH_SEPARATOR = '\x1c'
+
+#how many rows are hashed at a time when an old database is upgraded
+MIGRATE_BATCH = 10000
+
+#set on every connection, cache_size is negative so it is in KiB (about 20MB)
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA temp_store=MEMORY",
+)
+
+#how long (in seconds) to wait for another connection that is writing to the database
+BUSY_TIMEOUT = 5.0
+
+#how many rows iterate() gets from the database at a time, and page() by default
+ITERATE_BATCH = 1000
+
+#the columns the cards can be put in order by (see page), each track has an index
+SORT_COLUMNS = ('rowid', 'trackOne', 'trackTwo', 'trackThree')
+
+#the most cards search() returns by default
+SEARCH_LIMIT = 1000
+
+#the trigram tokenizer indexes every 3 characters, a shorter search can't use the index
+SEARCH_MIN_LENGTH = 3
+
+#sqlite3 keeps this many prepared statements per connection, more than the store uses so
+#none of them are ever prepared twice
+CACHED_STATEMENTS = 64
+
+#id is the rowid (an INTEGER PRIMARY KEY is), without it VACUUM can renumber the cards and
+#CardsSearch would point at the wrong ones
+CARDS_COLUMNS = """(id INTEGER PRIMARY KEY, trackOne text NOT NULL DEFAULT '',
+                   trackTwo text NOT NULL DEFAULT '', trackThree text NOT NULL DEFAULT '',
+                   trackHash blob)"""
+
+CREATE_TABLE = """CREATE TABLE IF NOT EXISTS Cards """ + CARDS_COLUMNS
+
+CREATE_HASH_INDEX = """CREATE UNIQUE INDEX IF NOT EXISTS CardsTrackHash ON Cards(trackHash)"""
+
+#the rowid is part of every index, so these also give the order page() uses
+CREATE_SORT_INDEXES = (
+    """CREATE INDEX IF NOT EXISTS CardsTrackOne ON Cards(trackOne)""",
+    """CREATE INDEX IF NOT EXISTS CardsTrackTwo ON Cards(trackTwo)""",
+    """CREATE INDEX IF NOT EXISTS CardsTrackThree ON Cards(trackThree)""",
+)
+
+#the tracks aren't copied into CardsSearch (content='Cards'), it only has the index and gets
+#the tracks from Cards
+CREATE_SEARCH_TABLE = """CREATE VIRTUAL TABLE IF NOT EXISTS CardsSearch USING fts5(trackOne,
+                         trackTwo, trackThree, content='Cards', content_rowid='id',
+                         tokenize='trigram')"""
+
+#an FTS5 table with content='Cards' has to be told about every change to Cards, the update
+#trigger is only for the tracks so filling in trackHash doesn't reindex the card
+CREATE_SEARCH_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS CardsSearchInsert AFTER INSERT ON Cards BEGIN
+           INSERT INTO CardsSearch(rowid, trackOne, trackTwo, trackThree)
+               VALUES(new.id, new.trackOne, new.trackTwo, new.trackThree);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS CardsSearchDelete AFTER DELETE ON Cards BEGIN
+           INSERT INTO CardsSearch(CardsSearch, rowid, trackOne, trackTwo, trackThree)
+               VALUES('delete', old.id, old.trackOne, old.trackTwo, old.trackThree);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS CardsSearchUpdate AFTER UPDATE OF trackOne, trackTwo,
+           trackThree ON Cards BEGIN
+           INSERT INTO CardsSearch(CardsSearch, rowid, trackOne, trackTwo, trackThree)
+               VALUES('delete', old.id, old.trackOne, old.trackTwo, old.trackThree);
+           INSERT INTO CardsSearch(rowid, trackOne, trackTwo, trackThree)
+               VALUES(new.id, new.trackOne, new.trackTwo, new.trackThree);
+       END""",
+)
+
+#the names of the triggers in CREATE_SEARCH_TRIGGERS
+SEARCH_TRIGGERS = ('CardsSearchInsert', 'CardsSearchDelete', 'CardsSearchUpdate')
+
+#indexes the cards that were already in the database
+REBUILD_SEARCH = """INSERT INTO CardsSearch(CardsSearch) VALUES('rebuild')"""
+
+SELECT_CARD = """SELECT rowid FROM Cards WHERE trackHash=? LIMIT 1"""
+
+#a card that is already in the database isn't saved
+INSERT_CARD = """INSERT INTO Cards(trackOne, trackTwo, trackThree, trackHash) VALUES(?, ?, ?, ?)
+                 ON CONFLICT DO NOTHING"""
+
+#a card is always saved, a duplicate without its hash
+INSERT_CARD_ALLOW_DUPLICATE = """INSERT INTO Cards(trackOne, trackTwo, trackThree, trackHash)
+                                 VALUES(?1, ?2, ?3, CASE WHEN EXISTS
+                                     (SELECT 1 FROM Cards WHERE trackHash=?4) THEN NULL
+                                     ELSE ?4 END)"""
+
+SELECT_BATCH = """SELECT rowid, trackOne, trackTwo, trackThree FROM Cards WHERE rowid > ?
+                  ORDER BY rowid LIMIT ?"""
+
+SELECT_ROWID = """SELECT rowid, trackOne, trackTwo, trackThree FROM Cards WHERE rowid=?"""
+
+SEARCH_CARDS = """SELECT rowid, trackOne, trackTwo, trackThree FROM CardsSearch
+                  WHERE CardsSearch MATCH ? AND rowid > ? ORDER BY rowid LIMIT ?"""
+
+#for a search that is too short for the index (or a SQLite without FTS5), goes through the table
+SCAN_CARDS = """SELECT rowid, trackOne, trackTwo, trackThree FROM Cards WHERE rowid > ? AND
+                (%s) ORDER BY rowid LIMIT ?"""
+
+#SQLite counts the entries of the smallest index rather than reading the table
+COUNT_CARDS = """SELECT COUNT(*) FROM Cards"""
+
+
+class CardStore():
+    """The Cards table of the card database
+
+        Every card is 3 tracks (strings), the same as what CardReader.read_card returns
+    """
+
+    def __init__(self, path=DATABASE_PATH):
+        """Opens the database (it is created if it doesn't exist)
+
+            Args:
+                path: the database file, ':memory:' for a database that isn't saved
+
+            Returns:
+                Nothing
+
+            Raises:
+                sqlite3.Error: the database couldn't be opened
+        """
+
+        self.path = path
+
+        #autocommit, transactions are started and committed by __transaction so a card is
+        #saved with one commit
+        self.__conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                      check_same_thread=False,
+                                      cached_statements=CACHED_STATEMENTS)
+        self.__lock = threading.RLock()
+
+        try:
+            for pragma in PRAGMAS:
+                self.__conn.execute(pragma)
+
+            self.__create_or_migrate()
+
+            #False if this SQLite doesn't have FTS5 (or the trigram tokenizer), search still
+            #works but it has to go through the whole table
+            self.searchable = self.__open_search()
+
+        except sqlite3.Error:
+            self.__conn.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def close(self):
+        with self.__lock:
+            self.__conn.close()
+
+    def insert(self, tracks, allowDuplicates=True):
+        """Saves a card
+
+            Args:
+                tracks: the 3 tracks
+
+                allowDuplicates: if False the card isn't saved if it's already in the database
+
+            Returns:
+                True if the card was saved, False if it was a duplicate
+
+            Raises:
+                sqlite3.Error: the card couldn't be saved
+        """
+
+        with self.__transaction() as conn:
+            cursor = conn.execute(INSERT_CARD_ALLOW_DUPLICATE if allowDuplicates else INSERT_CARD,
+                                  _hashed(tracks))
+
+            return cursor.rowcount == 1
+
+    def insert_many(self, cards, allowDuplicates=True):
+        """Saves a lot of cards in one transaction
+
+            Args:
+                cards: iterable of cards (the 3 tracks of each)
+
+                allowDuplicates: if False a card that is already in the database (or earlier in
+                                cards) isn't saved
+
+            Returns:
+                How many cards were saved
+
+            Raises:
+                sqlite3.Error: the cards couldn't be saved, none of them are
+        """
+
+        with self.__transaction() as conn:
+            cursor = conn.executemany(INSERT_CARD_ALLOW_DUPLICATE if allowDuplicates else
+                                      INSERT_CARD, (_hashed(tracks) for tracks in cards))
+
+            return cursor.rowcount
+
+    def contains(self, tracks):
+        """True if the card is in the database"""
+
+        with self.__lock:
+            return self.__conn.execute(SELECT_CARD, (track_hash(tracks),)).fetchone() is not None
+
+    def get(self, rowid):
+        """Returns the card with that rowid as (rowid, trackOne, trackTwo, trackThree), None if
+            there isn't one
+        """
+
+        with self.__lock:
+            return self.__conn.execute(SELECT_ROWID, (rowid,)).fetchone()
+
+    def count(self):
+        """How many cards are in the database"""
+
+        with self.__lock:
+            return self.__conn.execute(COUNT_CARDS).fetchone()[0]
+
+    def iterate(self, batchSize=ITERATE_BATCH):
+        """Goes through every card in the order they were saved
+
+            The cards are fetched batchSize at a time (from where the last batch ended, not
+            with an OFFSET), so a big database doesn't have to fit in memory and other threads
+            can use the store between batches
+
+            Args:
+                batchSize: how many cards to get from the database at a time
+
+            Returns:
+                A generator of (rowid, trackOne, trackTwo, trackThree)
+
+            Raises:
+                sqlite3.Error: the cards couldn't be read
+        """
+
+        lastRowid = 0
+
+        while True:
+            with self.__lock:
+                rows = self.__conn.execute(SELECT_BATCH, (lastRowid, batchSize)).fetchall()
+
+            if (not rows):
+                return
+
+            for row in rows:
+                yield row
+
+            lastRowid = rows[-1][0]
+
+    def page(self, sortColumn='rowid', key=None, limit=ITERATE_BATCH, forward=True,
+             descending=False):
+        """Gets a page of cards in order, starting after (or before) a card
+
+            This is keyset pagination, the page starts from the sort key of the card at the
+            edge of the last page rather than an OFFSET, so it is an index lookup however far
+            into the database it is
+
+            ex:
+                rows = store.page('trackOne')
+                rows = store.page('trackOne', sort_key(rows[-1], 'trackOne'))
+
+            Args:
+                sortColumn: one of SORT_COLUMNS, cards with the same value are in rowid order
+
+                key: the sort_key of the card the page starts after (forward) or ends before
+                    (not forward), None starts at the start (or end) of the database
+
+                limit: the most cards to get
+
+                forward: True for the cards after key, False for the cards before it
+
+                descending: True if the cards are in descending order
+
+            Returns:
+                List of (rowid, trackOne, trackTwo, trackThree), in sorted order even when
+                going backwards
+
+            Raises:
+                ValueError: sortColumn isn't one of SORT_COLUMNS
+
+                sqlite3.Error: the cards couldn't be read
+        """
+
+        columns = _sort_columns(sortColumn)
+
+        #going backwards is going forwards in the other order, then turned around
+        reverse = descending == forward
+        order = ", ".join(column + (" DESC" if reverse else "") for column in columns)
+
+        query = "SELECT rowid, trackOne, trackTwo, trackThree FROM Cards"
+        parameters = ()
+
+        if (key is not None):
+            query += " WHERE (%s) %s (%s)" % (", ".join(columns), "<" if reverse else ">",
+                                              ", ".join("?" * len(columns)))
+            parameters = tuple(key)
+
+        query += " ORDER BY " + order + " LIMIT ?"
+
+        with self.__lock:
+            rows = self.__conn.execute(query, parameters + (limit,)).fetchall()
+
+        if (not forward):
+            rows.reverse()
+
+        return rows
+
+    def page_at(self, sortColumn='rowid', offset=0, limit=ITERATE_BATCH, descending=False):
+        """Gets a page of cards that starts offset cards into the sorted order
+
+            This has to go through offset index entries, use page to move a page at a time
+            and this to jump somewhere (ex: dragging the scrollbar)
+
+            Args:
+                sortColumn, limit, descending: see page
+
+                offset: how many cards come before the page
+
+            Returns:
+                List of (rowid, trackOne, trackTwo, trackThree)
+
+            Raises:
+                ValueError: sortColumn isn't one of SORT_COLUMNS
+
+                sqlite3.Error: the cards couldn't be read
+        """
+
+        order = ", ".join(column + (" DESC" if descending else "")
+                          for column in _sort_columns(sortColumn))
+
+        with self.__lock:
+            return self.__conn.execute("SELECT rowid, trackOne, trackTwo, trackThree FROM Cards "
+                                       "ORDER BY " + order + " LIMIT ? OFFSET ?",
+                                       (limit, max(0, offset))).fetchall()
+
+    def search(self, text, column=None, limit=SEARCH_LIMIT, after=0):
+        """Finds the cards that have text anywhere in a track (not case sensitive)
+
+            ex:
+                store.search('DOE/J')                #a name, or the start of one
+                store.search('1111', 'trackTwo')     #part of a PAN on track 2
+
+            The search uses the CardsSearch index when text is at least SEARCH_MIN_LENGTH
+            characters, anything shorter goes through the table
+
+            Args:
+                text: what to look for, it is matched as it is (no query syntax)
+
+                column: 'trackOne', 'trackTwo' or 'trackThree' to only look in one track, None
+                        looks in all of them
+
+                limit: the most cards to return
+
+                after: only cards with a rowid after this, the rowid of the last card of the
+                        last page to get the next page
+
+            Returns:
+                List of (rowid, trackOne, trackTwo, trackThree), in the order they were saved
+
+            Raises:
+                ValueError: column isn't a track
+
+                sqlite3.Error: the cards couldn't be read
+        """
+
+        columns = SORT_COLUMNS[1:] if column is None else (column,)
+
+        if (column is not None and column not in SORT_COLUMNS[1:]):
+            raise ValueError("there is no track called " + str(column))
+
+        if (not text):
+            return []
+
+        if (self.searchable and len(text) >= SEARCH_MIN_LENGTH):
+            #a phrase (in double quotes) is matched as it is, with the trigram tokenizer that
+            #is a substring search
+            query = '"' + text.replace('"', '""') + '"'
+
+            if (column is not None):
+                query = column + " : " + query
+
+            with self.__lock:
+                return self.__conn.execute(SEARCH_CARDS, (query, after, limit)).fetchall()
+
+        pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        where = " OR ".join(name + " LIKE ? ESCAPE '\\'" for name in columns)
+
+        with self.__lock:
+            return self.__conn.execute(SCAN_CARDS % where, (after,) + (pattern,) * len(columns) +
+                                       (limit,)).fetchall()
+
+    def migrate(self, batchSize=MIGRATE_BATCH):
+        """Upgrades a database made by an older version, run when it is opened
+
+            Version 1 (trackHash): the column and its index are added first, then the hashes
+            are filled in batchSize rows at a time (each batch is its own transaction, so
+            saving cards isn't blocked for long and a migration that is stopped picks up where
+            it left off). The rows are gone through in the order they were saved, so the first
+            copy of a card gets the hash and any duplicates of it keep NULL.
+
+            Version 2: the indexes on the tracks are made.
+
+            Version 3: CardsSearch and its triggers, they're made (and every card indexed)
+            whenever the database is opened without them, so a database upgraded by a SQLite
+            without FTS5 gets them once it's opened with one that has it.
+
+            Version 4: the tracks that are NULL (GUI.py used to save them like that) are
+            turned into empty strings, the keyset in page() never matches a NULL so those
+            cards couldn't be paged to.
+
+            Version 5: Cards is made again with an INTEGER PRIMARY KEY (id) and the cards are
+            copied into it with the same rowids (in one transaction). CardsSearch is dropped
+            and made again on id, a VACUUM could renumber the rowids of the old table.
+
+            Args:
+                batchSize: how many rows to hash per transaction
+
+            Returns:
+                How many rows were given a hash
+
+            Raises:
+                sqlite3.Error: the database couldn't be upgraded
+        """
+
+        hashed = 0
+        version = self.__conn.execute("PRAGMA user_version").fetchone()[0]
+
+        if (version < 1):
+            hashed = self.__add_track_hash(batchSize)
+
+        if (version < 2):
+            with self.__transaction() as conn:
+                for index in CREATE_SORT_INDEXES:
+                    conn.execute(index)
+
+                conn.execute("PRAGMA user_version=2")
+
+        if (version < 3):
+            #CardsSearch is made by __add_search, after the upgrade
+            with self.__transaction() as conn:
+                conn.execute("PRAGMA user_version=3")
+
+        if (version < 4):
+            with self.__transaction() as conn:
+                for column in SORT_COLUMNS[1:]:
+                    conn.execute("UPDATE Cards SET %s='' WHERE %s IS NULL" % (column, column))
+
+                conn.execute("PRAGMA user_version=4")
+
+        if (version < 5):
+            with self.__transaction() as conn:
+                #its triggers are dropped with Cards, it's made again by __add_search
+                conn.execute("DROP TABLE IF EXISTS CardsSearch")
+
+                conn.execute("CREATE TABLE CardsRebuild " + CARDS_COLUMNS)
+                conn.execute("""INSERT INTO CardsRebuild(id, trackOne, trackTwo, trackThree,
+                                trackHash) SELECT rowid, trackOne, trackTwo, trackThree,
+                                trackHash FROM Cards ORDER BY rowid""")
+                conn.execute("DROP TABLE Cards")
+                conn.execute("ALTER TABLE CardsRebuild RENAME TO Cards")
+
+                conn.execute(CREATE_HASH_INDEX)
+
+                for index in CREATE_SORT_INDEXES:
+                    conn.execute(index)
+
+                conn.execute("PRAGMA user_version=5")
+
+        return hashed
+
+    def __open_search(self):
+        """Checks CardsSearch can be used, making it if it isn't there
+
+            A database made by a SQLite with FTS5 has CardsSearch even when this one doesn't
+            have FTS5, then its triggers are dropped (every card saved would fail in them) and
+            the search goes through the table. The next time the database is opened by a
+            SQLite with FTS5 the triggers are made again and every card is indexed again
+
+            Returns:
+                True if CardsSearch can be used (see searchable)
+        """
+
+        if (not self.__has_schema('table', 'CardsSearch')):
+            return self.__add_search()
+
+        try:
+            self.__conn.execute("SELECT 1 FROM CardsSearch LIMIT 0").fetchall()
+
+        except sqlite3.OperationalError as e:
+            logger.warning("THE SEARCH INDEX CAN'T BE USED BY THIS SQLITE, SEARCHING WILL BE SLOW "
+                           "AND NEW CARDS WON'T BE INDEXED UNTIL THE DATABASE IS OPENED WITH A "
+                           "SQLITE THAT HAS FTS5: %s", e)
+
+            with self.__transaction() as conn:
+                for trigger in SEARCH_TRIGGERS:
+                    conn.execute("DROP TRIGGER IF EXISTS " + trigger)
+
+            return False
+
+        #a SQLite without FTS5 dropped the triggers, so the index is missing cards
+        if (not all(self.__has_schema('trigger', trigger) for trigger in SEARCH_TRIGGERS)):
+            return self.__add_search()
+
+        return True
+
+    def __has_schema(self, kind, name):
+        return self.__conn.execute("SELECT 1 FROM sqlite_master WHERE type=? AND name=?",
+                                   (kind, name)).fetchone() is not None
+
+    def __add_search(self):
+        """Makes CardsSearch and its triggers and indexes every card (in one transaction)
+
+            Returns:
+                True if it was made, False if this SQLite doesn't have FTS5
+        """
+
+        try:
+            with self.__transaction() as conn:
+                conn.execute(CREATE_SEARCH_TABLE)
+
+                for trigger in CREATE_SEARCH_TRIGGERS:
+                    conn.execute(trigger)
+
+                conn.execute(REBUILD_SEARCH)
+
+        except sqlite3.OperationalError as e:
+            #no FTS5 or no trigram tokenizer (SQLite before 3.34)
+            logger.warning("COULDN'T MAKE THE SEARCH INDEX, SEARCHING WILL BE SLOW: %s", e)
+            return False
+
+        return True
+
+    def __add_track_hash(self, batchSize):
+        """The version 1 upgrade, see migrate"""
+
+        with self.__transaction() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(Cards)")]
+
+            if ('trackHash' not in columns):
+                conn.execute("ALTER TABLE Cards ADD COLUMN trackHash blob")
+
+            conn.execute(CREATE_HASH_INDEX)
+
+        hashed = 0
+        lastRowid = 0
+
+        while True:
+            with self.__transaction() as conn:
+                rows = conn.execute("""SELECT rowid, trackOne, trackTwo, trackThree FROM Cards
+                                       WHERE rowid > ? AND trackHash IS NULL ORDER BY rowid
+                                       LIMIT ?""", (lastRowid, batchSize)).fetchall()
+
+                if (not rows):
+                    conn.execute("PRAGMA user_version=1")
+                    break
+
+                #a duplicate of a card that already has the hash is left as NULL
+                cursor = conn.executemany("UPDATE OR IGNORE Cards SET trackHash=? WHERE rowid=?",
+                                          ((track_hash(row[1:]), row[0]) for row in rows))
+
+                hashed += cursor.rowcount
+                lastRowid = rows[-1][0]
+
+            logger.info("HASHED %d CARDS (UP TO ROW %d)", hashed, lastRowid)
+
+        return hashed
+
+    def __create_or_migrate(self):
+        """Makes the table in a new database, or upgrades an old one"""
+
+        version = self.__conn.execute("PRAGMA user_version").fetchone()[0]
+
+        if (version >= SCHEMA_VERSION):
+            return
+
+        with self.__transaction() as conn:
+            exists = conn.execute("""SELECT 1 FROM sqlite_master WHERE type='table' AND
+                                     name='Cards'""").fetchone() is not None
+
+            if (not exists):
+                conn.execute(CREATE_TABLE)
+                conn.execute(CREATE_HASH_INDEX)
+
+                for index in CREATE_SORT_INDEXES:
+                    conn.execute(index)
+
+                conn.execute("PRAGMA user_version=" + str(SCHEMA_VERSION))
+
+        if (not exists):
+            return
+
+        logger.warning("UPGRADING THE CARD DATABASE %s FROM VERSION %d", self.path, version)
+        self.migrate()
+
+    @contextlib.contextmanager
+    def __transaction(self):
+        """Runs the block in a transaction, committed at the end or rolled back if it raises
+
+            BEGIN IMMEDIATE takes the write lock straight away, so the duplicate check and the
+            insert can't have another connection's insert in between
+        """
+
+        with self.__lock:
+            self.__conn.execute("BEGIN IMMEDIATE")
+
+            try:
+                yield self.__conn
+            except BaseException:
+                self.__conn.execute("ROLLBACK")
+                raise
+            else:
+                self.__conn.execute("COMMIT")
+
+
+def track_hash(tracks):
+    """The hash of a card's tracks, the same tracks always give the same hash
+
+        Args:
+            tracks: the 3 tracks (a track that is None is the same as an empty one)
+
+        Returns:
+            HASH_SIZE bytes, BLAKE2b of the tracks joined with HASH_SEPARATOR
+
+        Raises:
+            ValueError: there aren't 3 tracks
+    """
+
+    trackOne, trackTwo, trackThree = tracks
+
+    data = HASH_SEPARATOR.join(track or '' for track in (trackOne, trackTwo, trackThree))
+
+    return hashlib.blake2b(data.encode('utf-8', 'surrogatepass'), digest_size=HASH_SIZE).digest()
+
+
+def sort_key(row, sortColumn='rowid'):
+    """The key of a row from page/page_at/iterate, to start the next page from"""
+
+    if (sortColumn == 'rowid'):
+        return (row[0],)
+
+    #there are no NULL tracks in the database (see migrate), this is for rows from somewhere
+    #else so they can still be sorted
+    value = row[SORT_COLUMNS.index(sortColumn)]
+
+    return (value if value is not None else '', row[0])
+
+
+def _sort_columns(sortColumn):
+    """The columns to ORDER BY, rowid is always last so every card has its own place"""
+
+    if (sortColumn not in SORT_COLUMNS):
+        raise ValueError("the cards can't be sorted by " + str(sortColumn))
+
+    return ('rowid',) if sortColumn == 'rowid' else (sortColumn, 'rowid')
+
+
+def _hashed(tracks):
+    """The tracks and their hash, as the parameters for the Cards queries"""
+
+    trackOne, trackTwo, trackThree = tracks
+
+    #a track that is None is saved as an empty string, so it can be sorted and paged through
+    return (trackOne or '', trackTwo or '', trackThree or '', track_hash(tracks))
@@ -26,8 +26,12 @@
     Platform: Windows
     Python: 3.5.2
 
-    Description: This file contains 2 dictionaries and 1 function, this is used to check if
-                    track data conforms to ISO Standard for magstripe cards 
+    Description: This file contains 2 dictionaries and the functions that use them, this is
+                    used to check if track data conforms to ISO Standard for magstripe cards 
+                    
+                iso_standard_track_check checks one character, filter_track checks a whole
+                track at once (with bytes.translate and a table of the characters to delete,
+                so the whole track is one pass in C rather than a function call per character)
     
                 The characters were obtained from this website:
                     http://www.abacus21.com/magnetic-strip-encoding-1586.html
@@ -35,6 +39,12 @@
 """
 
 
+import functools, logging, re
+
+
+logger = logging.getLogger(__name__)
+
+
 #1st track ISO standard character set dictionary
 #i take advantage of the values and use them as return values for the
 #function that checks if the track data meets the ISO standard
@@ -129,10 +139,20 @@ isoDictionaryTrackTwoThree = {
 
 
 
-    
+#the characters each track # allows, built from the dictionaries above
+ISO_TRACK_CHARACTERS = {
+    1: frozenset(isoDictionaryTrackOne),
+    2: frozenset(isoDictionaryTrackTwoThree),
+    3: frozenset(isoDictionaryTrackTwoThree),
+}
+
+
 def iso_standard_track_check(char, trackNum):
     """This checks if the character provided meets the ISO Standards for Magnetic Stripe Cards
     
+        To check a whole track use filter_track, it's a lot faster than calling this for every
+        character
+    
         Args:
             char: this is a single character, it is from the track data and it will be
                     checked to see if if fits the ISO standard
@@ -148,18 +168,115 @@ def iso_standard_track_check(char, trackNum):
             Nothing
     """
     
-    char = str(char)
+    characters = ISO_TRACK_CHARACTERS.get(trackNum)
     
-    #checks the track # to find out which dictionary to use to check if the character is in the
-    #ISO standard character set
-    if trackNum == 1:
-        return isoDictionaryTrackOne.get(char, False)
+    #if a valid track # is not provided, just return true, no data is lost this way
+    if (characters is None):
+        logger.warning("ISO STANDARD CHECK, TRACK # IS INVALID, IT IS: %s", trackNum)
+        return True
     
-    elif trackNum == 2 or trackNum == 3:
-        return isoDictionaryTrackTwoThree.get(char, False)
+    return str(char) in characters
+
+
+@functools.lru_cache(maxsize=None)
+def iso_delete_table(trackNum, keep=''):
+    """Returns the bytes that aren't in the ISO standard character set of a track, for
+        bytes.translate(None, table)
+        
+        The table is only worked out the first time, after that it is cached
     
-    #if a valid track # is not provided, just return true, no data is lost this way
+        Args:
+            trackNum: the track # (1, 2 or 3)
+            
+            keep: characters (str, bytes or a frozenset of 1 character str's) that are let
+                    through even though they aren't ISO standard, ex: the MSR605's control
+                    characters
+            
+        Returns:
+            bytes with every byte value (0-255) that should be taken out of the track, empty if
+            the track # is invalid (nothing is taken out, the same as iso_standard_track_check)
+    
+        Raises:
+            Nothing
+    """
+    
+    characters = ISO_TRACK_CHARACTERS.get(trackNum)
+    
+    if (characters is None):
+        return b''
+    
+    allowed = set(characters.union(_characters(keep)))
+    
+    return bytes(value for value in range(256) if chr(value) not in allowed)
+
+
+@functools.lru_cache(maxsize=None)
+def _rejected_pattern(trackNum, keep, isBytes):
+    """A compiled regex that matches every character filter_track takes out, used to find
+        where they were
+    """
+    
+    delete = iso_delete_table(trackNum, keep)
+    
+    if (isBytes):
+        return re.compile(b'[' + b''.join(re.escape(bytes([value])) for value in delete) + b']')
+    
+    #a str can have characters past 255, none of them are ISO standard
+    allowed = ''.join(re.escape(char) for char in
+                      sorted(ISO_TRACK_CHARACTERS[trackNum].union(_characters(keep))))
+    
+    return re.compile('[^' + allowed + ']')
+
+
+def filter_track(data, trackNum, keep=''):
+    """Takes every character that isn't in the ISO standard character set out of a track
+    
+        Args:
+            data: the track, str, bytes, bytearray or memoryview (a str gives back a str,
+                    anything else gives back bytes)
+            
+            trackNum: the track # (1, 2 or 3), nothing is taken out if it is invalid
+            
+            keep: characters that are let through even though they aren't ISO standard, see
+                    iso_delete_table
+            
+        Returns:
+            A tuple (the track without the characters that aren't ISO standard, list of the
+            positions in data of the characters that were taken out)
+            
+            ex:
+                filter_track('12a4', 2) returns ('124', [2])
+            
+        Raises:
+            Nothing
+    """
+    
+    if (trackNum not in ISO_TRACK_CHARACTERS):
+        logger.warning("ISO STANDARD CHECK, TRACK # IS INVALID, IT IS: %s", trackNum)
+        return (data if isinstance(data, str) else bytes(data)), []
+    
+    if (isinstance(data, str)):
+        pattern = _rejected_pattern(trackNum, keep, False)
+        cleaned = pattern.sub('', data)
     else:
-        print ("ISO STANDARD CHECK, TRACK # IS INVALID, IT IS:" , trackNum)
-        return true;
-       
\ No newline at end of file
+        data = bytes(data)
+        pattern = None
+        cleaned = data.translate(None, iso_delete_table(trackNum, keep))
+    
+    #the usual case, nothing was taken out so there is no need to look for where
+    if (len(cleaned) == len(data)):
+        return cleaned, []
+    
+    if (pattern is None):
+        pattern = _rejected_pattern(trackNum, keep, True)
+    
+    return cleaned, [match.start() for match in pattern.finditer(data)]
+
+
+def _characters(keep):
+    """The characters in keep as a set of str's"""
+    
+    if (isinstance(keep, (bytes, bytearray))):
+        return frozenset(keep.decode('latin-1'))
+    
+    return frozenset(keep)
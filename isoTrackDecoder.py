@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+""" isoTrackDecoder.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows, Linux
+    Python: 3.7 or newer, NumPy 1.20 or newer (for sliding_window_view)
+
+    Description: This turns the raw track data from CardReader.read_raw into characters
+                 (and back again for write_raw)
+
+                The ISO standard encodings are:
+                    Track 1: 7 bits per character, 6 data bits (least significant bit first)
+                            and an odd parity bit, the character is the value + 0x20
+                            start sentinel %, end sentinel ?
+
+                    Track 2 and 3: 5 bits per character, 4 data bits and an odd parity bit,
+                            the character is the value + 0x30
+                            start sentinel ;, end sentinel ?
+
+                After the end sentinel comes the LRC character, its data bits are the XOR of
+                the data bits of every character from the start sentinel to the end sentinel.
+
+                The bits are unpacked with NumPy and every character is checked at once, the
+                start sentinel is looked for at every bit offset in one pass and the card is
+                tried in both swipe directions. This needs NumPy (pip install numpy)
+"""
+
+
+import numpy as np
+
+
+#bits per character: (the value added to the data bits to get the ASCII character, start
+#sentinel, end sentinel), the sentinels are data bit values
+ISO_FORMATS = {
+    7: (0x20, 0x05, 0x1F),
+    5: (0x30, 0x0B, 0x0F),
+}
+
+#the bits per character of each track in the ISO standard
+TRACK_BITS_PER_CHARACTER = {1: 7, 2: 5, 3: 5}
+
+#how many of the start sentinel matches (in each direction) are tried before giving up
+MAX_OFFSETS = 4
+
+#the zeros written before and after the data by encode_track, so the reader can sync up
+LEADING_ZERO_BITS = 24
+
+
+class DecodedTrack():
+    """What decode_track returns
+
+        Attributes:
+            text: the characters between the start and end sentinels (the sentinels are not
+                    included, the same as the tracks read_card returns)
+
+            parityErrors: list of the positions in text of the characters with a bad parity bit,
+                            -1 is the start sentinel and len(text) is the end sentinel
+
+            lrc: True if the LRC character matched, False if it didn't, None if there was no
+                    LRC character after the end sentinel
+
+            endSentinel: False if the end sentinel wasn't found (text is everything after the
+                            start sentinel)
+
+            reversed: True if the card was swiped backwards (the bits had to be reversed)
+
+            bitOffset: where in the bits the start sentinel was found
+    """
+
+    __slots__ = ('text', 'parityErrors', 'lrc', 'endSentinel', 'reversed', 'bitOffset')
+
+    def __init__(self, text, parityErrors, lrc, endSentinel, reversed, bitOffset):
+        self.text = text
+        self.parityErrors = parityErrors
+        self.lrc = lrc
+        self.endSentinel = endSentinel
+        self.reversed = reversed
+        self.bitOffset = bitOffset
+
+    def valid(self):
+        """True if the track decoded with no parity errors, an end sentinel and a good LRC"""
+
+        return self.endSentinel and not self.parityErrors and self.lrc is not False
+
+    def __repr__(self):
+        return ("DecodedTrack(text=%r, parityErrors=%r, lrc=%r, endSentinel=%r, reversed=%r, "
+                "bitOffset=%r)" % (self.text, self.parityErrors, self.lrc, self.endSentinel,
+                                   self.reversed, self.bitOffset))
+
+
+def decode_track(data, trackNum=None, bitsPerChar=None, bitOrder='little',
+                 maxOffsets=MAX_OFFSETS):
+    """Decodes the raw data of one track
+
+        Args:
+            data: the raw track data (bytes, bytearray or memoryview), ex: one of the tracks
+                    from CardReader.read_raw
+
+            trackNum: 1, 2 or 3, picks the ISO encoding for the track
+
+            bitsPerChar: 5 or 7, used instead of trackNum if it is given
+
+            bitOrder: 'little' if the first bit on the card is the lowest bit of each byte,
+                        'big' if it is the highest
+
+            maxOffsets: how many start sentinel matches to try in each direction, the best
+                        one is kept
+
+        Returns:
+            A DecodedTrack, or None if there is no start sentinel in either direction
+
+        Raises:
+            ValueError: the track # or bits per character isn't an ISO one
+    """
+
+    bitsPerChar = _bits_per_char(trackNum, bitsPerChar)
+
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder=bitOrder)
+
+    best = None
+    bestScore = None
+
+    for reverse in (False, True):
+        candidateBits = bits[::-1] if reverse else bits
+
+        for offset in _start_sentinel_offsets(candidateBits, bitsPerChar, maxOffsets):
+            decoded = _decode_at(candidateBits, offset, bitsPerChar, reverse)
+
+            #a track with an end sentinel beats one without, then fewer parity errors, then
+            #a good LRC
+            score = (decoded.endSentinel, -len(decoded.parityErrors), decoded.lrc is True,
+                     len(decoded.text))
+
+            if (bestScore is None or score > bestScore):
+                best = decoded
+                bestScore = score
+
+        if (best is not None and best.valid()):
+            break
+
+    return best
+
+
+def decode_tracks(tracks, bitsPerChar=None, bitOrder='little'):
+    """Decodes all 3 tracks from CardReader.read_raw
+
+        Args:
+            tracks: list of the 3 tracks raw data
+
+            bitsPerChar: optional list with the bits per character of each track, the ISO
+                            ones are used if it is None
+
+            bitOrder: see decode_track
+
+        Returns:
+            A list of 3 DecodedTrack's (None for a track that couldn't be decoded)
+
+        Raises:
+            ValueError: a bits per character isn't an ISO one
+    """
+
+    if (bitsPerChar is None):
+        bitsPerChar = (None, None, None)
+
+    return [decode_track(tracks[i], i + 1, bitsPerChar[i], bitOrder) for i in range(3)]
+
+
+def encode_track(text, trackNum=None, bitsPerChar=None, bitOrder='little',
+                 leadingZeros=LEADING_ZERO_BITS):
+    """Encodes track text the way it is on the card, the opposite of decode_track
+
+        Args:
+            text: the characters to encode, without the sentinels (they are added)
+
+            trackNum: 1, 2 or 3, picks the ISO encoding for the track
+
+            bitsPerChar: 5 or 7, used instead of trackNum if it is given
+
+            bitOrder: see decode_track
+
+            leadingZeros: how many zero bits to put before (and after) the data
+
+        Returns:
+            bytes with the start sentinel, the text, the end sentinel and the LRC
+
+        Raises:
+            ValueError: a character can't be encoded on the track or the track # or bits per
+                        character isn't an ISO one
+    """
+
+    bitsPerChar = _bits_per_char(trackNum, bitsPerChar)
+    base, startSentinel, endSentinel = ISO_FORMATS[bitsPerChar]
+    dataBits = bitsPerChar - 1
+
+    values = np.frombuffer(text.encode('latin-1'), dtype=np.uint8).astype(np.int16) - base
+
+    if (np.any(values < 0) or np.any(values >= (1 << dataBits))):
+        raise ValueError("text has characters that can't be encoded with " + str(bitsPerChar) +
+                         " bits per character")
+
+    values = np.concatenate(([startSentinel], values, [endSentinel])).astype(np.uint8)
+    values = np.append(values, np.bitwise_xor.reduce(values))
+
+    #one row per character, the data bits least significant first then the parity bit
+    characters = np.unpackbits(values[:, np.newaxis], axis=1, bitorder='little')[:, :dataBits]
+    parity = 1 - (characters.sum(axis=1) & 1)
+    characters = np.column_stack((characters, parity)).astype(np.uint8)
+
+    zeros = np.zeros(leadingZeros, dtype=np.uint8)
+
+    return np.packbits(np.concatenate((zeros, characters.ravel(), zeros)),
+                       bitorder=bitOrder).tobytes()
+
+
+def _bits_per_char(trackNum, bitsPerChar):
+    """Works out the bits per character from the arguments of decode_track/encode_track"""
+
+    if (bitsPerChar is None):
+        if (trackNum not in TRACK_BITS_PER_CHARACTER):
+            raise ValueError("track # has to be 1, 2 or 3, it is: " + str(trackNum))
+
+        bitsPerChar = TRACK_BITS_PER_CHARACTER[trackNum]
+
+    if (bitsPerChar not in ISO_FORMATS):
+        raise ValueError("only 5 and 7 bits per character can be decoded, not " +
+                         str(bitsPerChar))
+
+    return bitsPerChar
+
+
+def _start_sentinel_offsets(bits, bitsPerChar, maxOffsets):
+    """Returns the first maxOffsets bit offsets where the start sentinel (with its parity bit)
+        is in bits
+    """
+
+    if (len(bits) < bitsPerChar):
+        return []
+
+    #the value of the bitsPerChar bits starting at every offset, all at once
+    windows = np.lib.stride_tricks.sliding_window_view(bits, bitsPerChar)
+    values = windows @ (1 << np.arange(bitsPerChar))
+
+    startSentinel = ISO_FORMATS[bitsPerChar][1]
+    parityBit = (bin(startSentinel).count('1') + 1) & 1
+
+    return np.flatnonzero(values == (startSentinel | (parityBit << (bitsPerChar - 1))))[:maxOffsets]
+
+
+def _decode_at(bits, offset, bitsPerChar, reverse):
+    """Decodes the characters starting at a start sentinel"""
+
+    base, startSentinel, endSentinel = ISO_FORMATS[bitsPerChar]
+    dataBits = bitsPerChar - 1
+
+    count = (len(bits) - offset) // bitsPerChar
+    characters = bits[offset:offset + count * bitsPerChar].reshape(count, bitsPerChar)
+
+    values = characters[:, :dataBits] @ (1 << np.arange(dataBits))
+    parityOk = (characters.sum(axis=1) & 1) == 1
+
+    ends = np.flatnonzero(values == endSentinel)
+
+    if (len(ends) > 0):
+        end = int(ends[0])
+        endFound = True
+    else:
+        end = count
+        endFound = False
+
+    text = (values[1:end] + base).astype(np.uint8).tobytes().decode('latin-1')
+
+    #positions in text, so the start sentinel is -1
+    parityErrors = (np.flatnonzero(~parityOk[:min(end + 1, count)]) - 1).tolist()
+
+    lrc = None
+
+    if (endFound and end + 1 < count):
+        lrcValue = int(np.bitwise_xor.reduce(values[:end + 1]))
+        lrc = bool(values[end + 1] == lrcValue and parityOk[end + 1])
+
+    return DecodedTrack(text, parityErrors, lrc, endFound, reverse, int(offset))
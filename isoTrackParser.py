@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+
+""" isoTrackParser.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows, Linux
+    Python: 3.7 or newer
+
+    Description: This splits tracks 1 and 2 of a financial card (ISO/IEC 7813) into their
+                 fields, so nothing else has to pick apart the strings read_card returns
+
+                Track 1 (format B):
+                    %B[PAN]^[NAME]^[YYMM][SERVICE CODE][DISCRETIONARY DATA]?[LRC]
+
+                Track 2:
+                    ;[PAN]=[YYMM][SERVICE CODE][DISCRETIONARY DATA]?[LRC]
+
+                ex:
+                    card = parse_card(msr.read_card())
+
+                    print(card.pan, card.name, card.expiry)
+
+                The tracks can be given with or without the sentinels (read_card takes them
+                off) and with the LRC character if there is one. Nothing is split until a field
+                is used, and the records have __slots__ so going through a lot of stored cards
+                doesn't make a dictionary for each one.
+"""
+
+
+from isoStandardDictionary import filter_track
+
+
+START_SENTINELS = {1: '%', 2: ';'}
+END_SENTINEL = '?'
+
+#the value subtracted from a character to get its data bits, for the LRC (see isoTrackDecoder.py)
+CHARACTER_BASES = {1: 0x20, 2: 0x30}
+
+#the data bits of each track (6 for track 1, 4 for track 2)
+DATA_BITS_MASKS = {1: 0x3F, 2: 0x0F}
+
+TRACK_ONE_SEPARATOR = '^'
+TRACK_TWO_SEPARATOR = '='
+
+FORMAT_CODE_B = 'B'
+
+#the PAN is 19 digits at most, the ISO/IEC 7812 issuer identification number makes it at least 12
+PAN_MIN_LENGTH = 12
+PAN_MAX_LENGTH = 19
+
+#the longest the name on track 1 can be
+NAME_MAX_LENGTH = 26
+
+
+def track_lrc(data, trackNum):
+    """Works out the LRC character of a track
+
+        Args:
+            data: the track between the sentinels (the sentinels are not included)
+
+            trackNum: 1 or 2
+
+        Returns:
+            The LRC character, the XOR of the data bits of the start sentinel, every character
+            and the end sentinel
+
+        Raises:
+            ValueError: the track # isn't 1 or 2
+    """
+
+    if (trackNum not in CHARACTER_BASES):
+        raise ValueError("track # has to be 1 or 2, it is: " + str(trackNum))
+
+    base = CHARACTER_BASES[trackNum]
+    mask = DATA_BITS_MASKS[trackNum]
+    lrc = 0
+
+    for char in START_SENTINELS[trackNum] + data + END_SENTINEL:
+        lrc ^= (ord(char) - base) & mask
+
+    return chr(lrc + base)
+
+
+def luhn_check(pan):
+    """True if the PAN's last digit is the right Luhn check digit"""
+
+    if (not pan.isdigit()):
+        return False
+
+    total = 0
+
+    for i, digit in enumerate(reversed(pan)):
+        value = ord(digit) - 0x30
+
+        if (i & 1):
+            value *= 2
+
+            if (value > 9):
+                value -= 9
+
+        total += value
+
+    return total % 10 == 0
+
+
+def _split_track(text, trackNum):
+    """Takes the sentinels and the LRC character off of a track
+
+        Returns:
+            (the data between the sentinels, True if both sentinels were there, the LRC
+            character or None if there isn't one)
+    """
+
+    startSentinel = START_SENTINELS[trackNum]
+    hasStart = text.startswith(startSentinel)
+
+    if (hasStart):
+        text = text[1:]
+
+    lrc = None
+
+    #the LRC always comes right after the end sentinel and can be a ? itself, so the second
+    #last character is checked first, a ? in the middle of the track isn't the end sentinel
+    if (len(text) >= 2 and text[-2] == END_SENTINEL):
+        lrc = text[-1]
+        text = text[:-2]
+        hasEnd = True
+
+    elif (text.endswith(END_SENTINEL)):
+        text = text[:-1]
+        hasEnd = True
+
+    else:
+        hasEnd = False
+
+    return text, hasStart and hasEnd, lrc
+
+
+def _field(index, doc):
+    """A read only property for one of the parsed fields, they are all parsed the first time
+        any of them are used
+    """
+
+    def getter(self):
+        fields = self._fields
+
+        if (fields is None):
+            fields = self._fields = self._parse()
+
+        return fields[index]
+
+    return property(getter, doc=doc)
+
+
+class _Track():
+    """What Track1 and Track2 have in common"""
+
+    __slots__ = ('data', 'sentinels', 'lrc', '_fields')
+
+    TRACK_NUM = None
+
+    def __init__(self, text):
+        """Keeps the track, the fields aren't split until they are used
+
+            Args:
+                text: the track, with or without the sentinels and LRC character
+
+            Returns:
+                Nothing
+
+            Raises:
+                Nothing
+        """
+
+        self.data, self.sentinels, self.lrc = _split_track(text, self.TRACK_NUM)
+        self._fields = None
+
+    def lrc_valid(self):
+        """True if the LRC character matches the track, False if it doesn't and None if the
+            track doesn't have one
+        """
+
+        if (self.lrc is None):
+            return None
+
+        return self.lrc == track_lrc(self.data, self.TRACK_NUM)
+
+    def invalid_characters(self):
+        """Returns the positions in data of the characters that aren't ISO standard"""
+
+        return filter_track(self.data, self.TRACK_NUM)[1]
+
+    def valid(self):
+        """True if the track has everything ISO/IEC 7813 asks for, its fields are the right
+            length, the PAN's check digit is right (Luhn), all its characters are ISO standard
+            and the LRC (if there is one) matches
+        """
+
+        return (self._fields_valid() and not self.invalid_characters() and
+                self.lrc_valid() is not False)
+
+    def _fields_valid(self):
+        pan = self.pan
+
+        return (pan is not None and PAN_MIN_LENGTH <= len(pan) <= PAN_MAX_LENGTH and
+                luhn_check(pan) and len(self.expiry) == 4 and self.expiry.isdigit() and
+                len(self.serviceCode) == 3 and self.serviceCode.isdigit())
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.data)
+
+
+class Track1(_Track):
+    """Track 1 of a financial card (format B)
+
+        Attributes:
+            data: the track without the sentinels and LRC
+
+            sentinels: True if the track had both sentinels (read_card takes them off)
+
+            lrc: the LRC character, None if there wasn't one
+
+            formatCode: the first character, B for a financial card
+
+            pan: the primary account number (card number), None if the track couldn't be split
+
+            name: the cardholder's name, ex: DOE/JOHN
+
+            expiry: the expiry date, YYMM
+
+            serviceCode: the 3 digit service code
+
+            discretionary: whatever is left, it's up to the card issuer
+    """
+
+    __slots__ = ()
+
+    TRACK_NUM = 1
+
+    formatCode = _field(0, "the format code, B for a financial card")
+    pan = _field(1, "the primary account number")
+    name = _field(2, "the cardholder's name")
+    expiry = _field(3, "the expiry date, YYMM")
+    serviceCode = _field(4, "the 3 digit service code")
+    discretionary = _field(5, "the discretionary data")
+
+    def _parse(self):
+        data = self.data
+        first = data.find(TRACK_ONE_SEPARATOR)
+        second = data.find(TRACK_ONE_SEPARATOR, first + 1) if first != -1 else -1
+
+        if (second == -1):
+            return (data[:1], None, None, '', '', '')
+
+        rest = data[second + 1:]
+
+        return (data[:1], data[1:first], data[first + 1:second], rest[:4], rest[4:7], rest[7:])
+
+    def _fields_valid(self):
+        return (self.formatCode == FORMAT_CODE_B and self.name is not None and
+                len(self.name) <= NAME_MAX_LENGTH and super(Track1, self)._fields_valid())
+
+
+class Track2(_Track):
+    """Track 2 of a financial card
+
+        Attributes:
+            data: the track without the sentinels and LRC
+
+            sentinels: True if the track had both sentinels (read_card takes them off)
+
+            lrc: the LRC character, None if there wasn't one
+
+            pan: the primary account number (card number), None if the track couldn't be split
+
+            expiry: the expiry date, YYMM
+
+            serviceCode: the 3 digit service code
+
+            discretionary: whatever is left, it's up to the card issuer
+    """
+
+    __slots__ = ()
+
+    TRACK_NUM = 2
+
+    pan = _field(0, "the primary account number")
+    expiry = _field(1, "the expiry date, YYMM")
+    serviceCode = _field(2, "the 3 digit service code")
+    discretionary = _field(3, "the discretionary data")
+
+    def _parse(self):
+        data = self.data
+        separator = data.find(TRACK_TWO_SEPARATOR)
+
+        if (separator == -1):
+            return (None, '', '', '')
+
+        rest = data[separator + 1:]
+
+        return (data[:separator], rest[:4], rest[4:7], rest[7:])
+
+
+class CardRecord():
+    """The tracks of one card, split into their fields
+
+        The card's fields come from track 1 if it has them, otherwise track 2 (track 2 is
+        what most readers use, but track 1 is the only one with the name)
+
+        Attributes:
+            track1: a Track1, None if the card didn't have track 1
+
+            track2: a Track2, None if the card didn't have track 2
+
+            track3: track 3 as it was read (it has no standard format for financial cards)
+    """
+
+    __slots__ = ('track1', 'track2', 'track3')
+
+    def __init__(self, track1, track2, track3=None):
+        self.track1 = track1
+        self.track2 = track2
+        self.track3 = track3
+
+    @property
+    def pan(self):
+        return self.__pick('pan')
+
+    @property
+    def name(self):
+        return self.track1.name if self.track1 is not None else None
+
+    @property
+    def expiry(self):
+        return self.__pick('expiry')
+
+    @property
+    def serviceCode(self):
+        return self.__pick('serviceCode')
+
+    def valid(self):
+        """True if every track the card has is valid and tracks 1 and 2 have the same PAN and
+            expiry
+        """
+
+        tracks = [track for track in (self.track1, self.track2) if track is not None]
+
+        if (not tracks or not all(track.valid() for track in tracks)):
+            return False
+
+        if (len(tracks) == 2):
+            return (self.track1.pan == self.track2.pan and
+                    self.track1.expiry == self.track2.expiry)
+
+        return True
+
+    def __pick(self, field):
+        for track in (self.track1, self.track2):
+            if (track is not None):
+                value = getattr(track, field)
+
+                if (value):
+                    return value
+
+        return None
+
+    def __repr__(self):
+        return "CardRecord(track1=%r, track2=%r, track3=%r)" % (self.track1, self.track2,
+                                                                self.track3)
+
+
+def _has_data(track):
+    #read_card gives back ? for an empty track 3, and empty strings for tracks 1 and 2
+    return bool(track) and track != END_SENTINEL
+
+
+def parse_card(tracks):
+    """Splits the tracks of a card into their fields
+
+        Args:
+            tracks: the 3 tracks, ex: what read_card returns or a row from the Cards table,
+                    with or without the sentinels
+
+        Returns:
+            A CardRecord
+
+        Raises:
+            Nothing
+    """
+
+    track1, track2, track3 = tracks
+
+    return CardRecord(Track1(track1) if _has_data(track1) else None,
+                      Track2(track2) if _has_data(track2) else None,
+                      track3 if _has_data(track3) else None)
@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+
+""" msr605Emulator.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Linux
+    Python: 3.7 or newer
+
+    Description: This is a software MSR605, it answers the same commands the real device
+                 does over a Linux pseudo-terminal (pty), so CardReader can be run without
+                 the hardware
+
+                Example:
+                    emulator = MSR605Emulator(tracks=['B1234^DOE/JOHN^2501', '1234=2501', ''])
+                    emulator.start()
+
+                    msr = cardReader.CardReader(SerialTransport(emulator.portName))
+                    print(msr.read_card())
+
+                    msr.close_serial_connection()
+                    emulator.stop()
+
+                Or from the command line, it prints the pty to connect to:
+                    python3 msr605Emulator.py
+
+                The commands that need a card swipe (read, write, erase and the sensor test)
+                "swipe" the emulator's card swipeDelay seconds after the command comes in, or
+                when swipe() is called if autoSwipe is False. A reset cancels the swipe like it
+                does on the real device. Every byte that is sent back can be delayed by
+                byteLatency seconds to act like the real serial link.
+
+                The raw read/write commands (ESCAPE + m / n) use rawCard, a track that is
+                empty there is encoded from the ASCII card with isoTrackDecoder (so raw reads
+                need NumPy)
+
+                The firmware version is sent back as the full string (REVU3.10 by default),
+                that is where the extra EVU3.10 that cardReader.py skips over before the
+                coercivity responses comes from
+"""
+
+
+import os, re, select, sys, threading, time, tty
+
+
+ESCAPE = b'\x1B'
+FILE_SEPERATOR = b'\x1C'
+
+#the command codes (the byte after ESCAPE), same values as in cardReader.py
+RESET = 0x61
+READ = 0x72
+WRITE = 0x77
+READ_RAW = 0x6D
+WRITE_RAW = 0x6E
+COMMUNICATIONS_TEST = 0x65
+ALL_LED_OFF = 0x81
+ALL_LED_ON = 0x82
+GREEN_LED_ON = 0x83
+YELLOW_LED_ON = 0x84
+RED_LED_ON = 0x85
+SENSOR_TEST = 0x86
+RAM_TEST = 0x87
+ERASE_CARD = 0x63
+DEVICE_MODEL = 0x74
+FIRMWARE = 0x76
+HI_CO = 0x78
+LOW_CO = 0x79
+HI_OR_LOW_CO = 0x64
+SELECT_BPI = 0x62
+SET_BPC = 0x6F
+
+#the track and density of each select BPI [Select Byte]
+BPI_SELECT_BYTES = {
+    0xA1: (1, 210),
+    0xA0: (1, 75),
+    0xD2: (2, 210),
+    0x4B: (2, 75),
+    0xC1: (3, 210),
+    0xC0: (3, 75),
+}
+
+#which LED's are on after each of the LED commands (green, yellow, red)
+LED_STATES = {
+    ALL_LED_OFF: (False, False, False),
+    ALL_LED_ON: (True, True, True),
+    GREEN_LED_ON: (True, False, False),
+    YELLOW_LED_ON: (False, True, False),
+    RED_LED_ON: (False, False, True),
+}
+
+#the data block that comes after ESCAPE + w
+WRITE_DATA_BLOCK = re.compile(b'\x1bs\x1b\x01(.*?)\x1b\x02(.*?)\x1b\x03(.*)\x1c$', re.DOTALL)
+
+
+class MSR605Emulator():
+    """A fake MSR605 on a pseudo-terminal
+
+        Attributes:
+            portName: the pty to open (ex: /dev/pts/4), set by start()
+
+            card: list of the 3 tracks on the card that gets swiped, without the
+                    sentinels (the same format read_card returns, minus the ? on track 3)
+
+            rawCard: list of the 3 tracks as bytes, what the raw read/write commands see (an
+                        empty one is encoded from card)
+
+            coercivity: 'h' or 'l'
+
+            bpi: list of the density of each track (75 or 210)
+
+            bpc: list of the bits per character of each track, a track with more than 5 is
+                    read back with the % start sentinel and encoded with 7 bits (raw reads)
+
+            leds: tuple of which LED's are on (green, yellow, red)
+
+            byteLatency: seconds to wait between each byte that is sent back
+
+            swipeDelay: seconds between a command that needs a swipe and the swipe
+
+            autoSwipe: if False the card is only swiped when swipe() is called
+    """
+
+    def __init__(self, tracks=None, byteLatency=0.0, swipeDelay=0.0, autoSwipe=True,
+                 model=b'3', firmware=b'REVU3.10'):
+        """Sets up the emulator, start() has to be called to create the pty
+
+            Args:
+                tracks: optional list of the 3 tracks on the card, blank card if None
+
+                byteLatency: seconds to wait between each byte that is sent back
+
+                swipeDelay: seconds between a command that needs a swipe and the swipe
+
+                autoSwipe: if False the card is only swiped when swipe() is called
+
+                model: the bytes sent back for the device model command
+
+                firmware: the bytes sent back for the firmware version command
+
+            Returns:
+                Nothing
+
+            Raises:
+                Nothing
+        """
+
+        self.card = list(tracks) if tracks is not None else ['', '', '']
+        self.rawCard = [b'', b'', b'']
+        self.coercivity = 'h'
+        self.bpi = [210, 75, 210]
+        self.bpc = [7, 5, 5]
+        self.leds = (False, False, False)
+
+        self.byteLatency = byteLatency
+        self.swipeDelay = swipeDelay
+        self.autoSwipe = autoSwipe
+
+        self.__model = model
+        self.__firmware = firmware
+
+        self.portName = None
+        self.__masterFd = None
+        self.__slaveFd = None
+        self.__thread = None
+        self.__running = False
+        self.__swipeEvent = threading.Event()
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+
+
+    def start(self):
+        """Creates the pty and starts answering commands on a background thread
+
+            Args:
+                None
+
+            Returns:
+                The name of the pty to connect to
+
+            Raises:
+                OSError: the pty couldn't be created
+        """
+
+        self.__masterFd, self.__slaveFd = os.openpty()
+
+        #raw mode so the terminal doesn't change any of the bytes (ex: \r to \n)
+        tty.setraw(self.__slaveFd)
+
+        self.portName = os.ttyname(self.__slaveFd)
+        self.__running = True
+
+        self.__thread = threading.Thread(target=self.__run, name="MSR605Emulator", daemon=True)
+        self.__thread.start()
+
+        return self.portName
+
+
+    def stop(self):
+        """Stops the emulator and closes the pty
+
+            Args:
+                None
+
+            Returns:
+                Nothing
+
+            Raises:
+                Nothing
+        """
+
+        self.__running = False
+
+        if (self.__thread is not None):
+            self.__thread.join()
+            self.__thread = None
+
+        for fd in (self.__masterFd, self.__slaveFd):
+            if (fd is not None):
+                os.close(fd)
+
+        self.__masterFd = None
+        self.__slaveFd = None
+
+
+    def swipe(self, tracks=None):
+        """Swipes a card through the emulator
+
+            Only needed if autoSwipe is False, the swipe is used by the command that is
+            waiting for one (a swipe with no command waiting is kept for the next one)
+
+            Args:
+                tracks: optional list of the 3 tracks, if None the current card is swiped
+
+            Returns:
+                Nothing
+
+            Raises:
+                Nothing
+        """
+
+        if (tracks is not None):
+            self.card = list(tracks)
+
+        self.__swipeEvent.set()
+
+
+    def __run(self):
+        """The emulator's main loop, runs on the background thread"""
+
+        received = bytearray()
+        pending = None
+        swipeAt = None
+
+        while (self.__running):
+            wait = 0.05
+
+            if (pending is not None and self.autoSwipe):
+                wait = max(0.0, min(wait, swipeAt - time.monotonic()))
+
+            readable, _, _ = select.select([self.__masterFd], [], [], wait)
+
+            if (readable):
+                try:
+                    received += os.read(self.__masterFd, 4096)
+                except OSError:
+                    #nothing has the pty open right now
+                    time.sleep(wait)
+                    continue
+
+            if (pending is not None):
+                #only a reset gets through while the device is waiting for a swipe
+                reset = received.find(ESCAPE + bytes([RESET]))
+
+                if (reset != -1):
+                    del received[:reset + 2]
+                    pending = None
+                    self.__swipeEvent.clear()
+
+                elif (self.__swipeEvent.is_set() or
+                      (self.autoSwipe and time.monotonic() >= swipeAt)):
+                    self.__swipeEvent.clear()
+                    self.__send(self.__swiped(pending))
+                    pending = None
+
+            if (pending is None):
+                pending = self.__handle_commands(received)
+
+                if (pending is not None):
+                    swipeAt = time.monotonic() + self.swipeDelay
+
+
+    def __handle_commands(self, received):
+        """Answers every complete command in received and removes it
+
+            Args:
+                received: bytearray of everything received that hasn't been handled yet
+
+            Returns:
+                The command that is waiting for a swipe, None if there isn't one
+
+            Raises:
+                Nothing
+        """
+
+        while (len(received) >= 2):
+            if (received[0] != ESCAPE[0]):
+                #garbage between commands, the real device ignores it too
+                del received[:1]
+                continue
+
+            code = received[1]
+
+            if (code == WRITE):
+                end = received.find(FILE_SEPERATOR, 2)
+                if (end == -1):
+                    return None
+                command = bytes(received[:end + 1])
+
+            elif (code == WRITE_RAW):
+                end = raw_data_block_end(received, 2)
+                if (end is None):
+                    return None
+                command = bytes(received[:end])
+
+            elif (code in (ERASE_CARD, SELECT_BPI)):
+                if (len(received) < 3):
+                    return None
+                command = bytes(received[:3])
+
+            elif (code == SET_BPC):
+                if (len(received) < 5):
+                    return None
+                command = bytes(received[:5])
+
+            else:
+                command = bytes(received[:2])
+
+            del received[:len(command)]
+
+            if (code in (READ, WRITE, READ_RAW, WRITE_RAW, ERASE_CARD, SENSOR_TEST)):
+                return command
+
+            self.__send(self.__answer(command))
+
+        return None
+
+
+    def __answer(self, command):
+        """Returns the response to a command that doesn't need a swipe"""
+
+        code = command[1]
+
+        if (code == COMMUNICATIONS_TEST):
+            return ESCAPE + b'y'
+
+        elif (code == RAM_TEST):
+            return ESCAPE + b'0'
+
+        elif (code == HI_CO):
+            self.coercivity = 'h'
+            return ESCAPE + b'0'
+
+        elif (code == LOW_CO):
+            self.coercivity = 'l'
+            return ESCAPE + b'0'
+
+        elif (code == HI_OR_LOW_CO):
+            return ESCAPE + self.coercivity.encode()
+
+        elif (code == DEVICE_MODEL):
+            return ESCAPE + self.__model + b'S'
+
+        elif (code == FIRMWARE):
+            return ESCAPE + self.__firmware
+
+        elif (code == SELECT_BPI):
+            if (command[2] not in BPI_SELECT_BYTES):
+                return ESCAPE + b'A'
+
+            track, density = BPI_SELECT_BYTES[command[2]]
+            self.bpi[track - 1] = density
+            return ESCAPE + b'0'
+
+        elif (code == SET_BPC):
+            if (not all(5 <= bits <= 8 for bits in command[2:5])):
+                return ESCAPE + b'A'
+
+            self.bpc = list(command[2:5])
+            return ESCAPE + b'0' + command[2:5]
+
+        elif (code in LED_STATES):
+            self.leds = LED_STATES[code]
+
+        #reset, the LED's and anything unknown don't get a response
+        return b''
+
+
+    def __swiped(self, command):
+        """Returns the response to a command that was waiting for a swipe"""
+
+        code = command[1]
+
+        if (code == READ):
+            data = ESCAPE + b's'
+
+            #the device adds the start and end sentinels, % for an alphanumeric track and ;
+            #for a numeric one
+            for trackIndex in range(3):
+                track = self.card[trackIndex]
+                startSentinel = '%' if self.bpc[trackIndex] > 5 else ';'
+
+                data += ESCAPE + bytes([trackIndex + 1])
+                data += ((startSentinel + track + '?') if track else '').encode()
+
+            #a blank card can't be read
+            return data + FILE_SEPERATOR + ESCAPE + (b'0' if any(self.card) else b'1')
+
+        elif (code == WRITE):
+            match = WRITE_DATA_BLOCK.match(command, 2)
+
+            if (match is None):
+                return ESCAPE + b'2'
+
+            tracks = [track.decode('latin-1') for track in match.groups()]
+
+            #read_card gives track 3 back with a ? on the end, it isn't part of the data
+            if (tracks[2].endswith('?')):
+                tracks[2] = tracks[2][:-1]
+
+            self.card = tracks
+
+            return ESCAPE + b'0'
+
+        elif (code == READ_RAW):
+            data = ESCAPE + b's'
+
+            tracks = list(self.rawCard)
+
+            for trackIndex in range(3):
+                if (not tracks[trackIndex] and self.card[trackIndex]):
+                    #only imported when it's needed, so the rest of the emulator doesn't need
+                    #NumPy, without it the raw read fails like a bad swipe would
+                    try:
+                        from isoTrackDecoder import encode_track
+                    except ImportError:
+                        return ESCAPE + b'1'
+
+                    bits = self.bpc[trackIndex] if self.bpc[trackIndex] in (5, 7) else None
+                    tracks[trackIndex] = encode_track(self.card[trackIndex], trackIndex + 1, bits)
+
+                data += ESCAPE + bytes([trackIndex + 1, len(tracks[trackIndex])]) + tracks[trackIndex]
+
+            #a blank card can't be read
+            return data + b'?' + FILE_SEPERATOR + ESCAPE + (b'0' if any(tracks) else b'1')
+
+        elif (code == WRITE_RAW):
+            tracks = parse_raw_data_block(command, 2)
+
+            if (tracks is None):
+                return ESCAPE + b'2'
+
+            self.rawCard = tracks
+
+            return ESCAPE + b'0'
+
+        elif (code == ERASE_CARD):
+            selectByte = command[2] & 0x07
+
+            #0 is track 1 only, otherwise each bit is a track
+            if (selectByte == 0):
+                selectByte = 1
+
+            for trackIndex in range(3):
+                if (selectByte & (1 << trackIndex)):
+                    self.card[trackIndex] = ''
+                    self.rawCard[trackIndex] = b''
+
+            return ESCAPE + b'0'
+
+        #sensor test
+        return ESCAPE + b'0'
+
+
+    def __send(self, data):
+        """Sends bytes back to CardReader, byteLatency seconds apart"""
+
+        if (not data):
+            return
+
+        if (self.byteLatency <= 0):
+            os.write(self.__masterFd, data)
+            return
+
+        for i in range(len(data)):
+            os.write(self.__masterFd, data[i:i + 1])
+            time.sleep(self.byteLatency)
+
+
+def raw_data_block_end(data, start):
+    """Finds the end of a raw data block (the one that comes after ESCAPE + n)
+
+        The track data is binary so the FS can't just be searched for, the length bytes are
+        followed instead
+
+        Args:
+            data: the bytes received so far
+
+            start: where the data block starts in data
+
+        Returns:
+            The index just after the FS that ends the block, None if it isn't all there yet
+
+        Raises:
+            Nothing
+    """
+
+    #ESC s, then ESC [track #] [length] [data] for each track
+    pos = start + 2
+
+    for trackIndex in range(3):
+        if (len(data) < pos + 3):
+            return None
+
+        pos += 3 + data[pos + 2]
+
+    end = data.find(FILE_SEPERATOR, pos)
+
+    return None if end == -1 else end + 1
+
+
+def parse_raw_data_block(data, start):
+    """Returns the 3 tracks (bytes) in a raw data block, None if it isn't formatted right"""
+
+    if (data[start:start + 2] != ESCAPE + b's'):
+        return None
+
+    pos = start + 2
+    tracks = []
+
+    for trackIndex in range(3):
+        if (data[pos:pos + 2] != ESCAPE + bytes([trackIndex + 1])):
+            return None
+
+        length = data[pos + 2]
+        tracks.append(bytes(data[pos + 3:pos + 3 + length]))
+        pos += 3 + length
+
+    #the ? before the FS is optional
+    if (data[pos:] not in (b'?' + FILE_SEPERATOR, FILE_SEPERATOR)):
+        return None
+
+    return tracks
+
+
+if __name__ == '__main__':
+    emulator = MSR605Emulator(tracks=['B4111111111111111^DOE/JOHN^2512101', '4111111111111111=2512101',
+                                      ''], swipeDelay=float(sys.argv[1]) if len(sys.argv) > 1 else 1.0)
+
+    print ("MSR605 EMULATOR RUNNING ON " + emulator.start())
+    print ("PRESS CTRL-C TO STOP")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.stop()
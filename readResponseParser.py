@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+
+""" readResponseParser.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows
+    Python: 3.7 or newer
+
+    Description: This contains a push parser for the response the MSR605 sends back after
+                 a read command (ESCAPE + r)
+
+                The response looks like this (see the read_card docstring in cardReader.py):
+                    <ESC>s<ESC>[01][string1]<ESC>[02][string2]<ESC>[03][string3]<FS><ESC>[status]
+
+                The parser doesn't do any I/O, you give it bytes as they come in (any size,
+                from any transport) and it keeps track of where it is in the response between
+                calls. Once the whole response has been fed in, feed() returns a ReadResponse.
+
+                The delimiters are found with a compiled regex, which works directly on a
+                memoryview of the bytes given to feed(), so nothing is copied to find them.
+                Each piece of track data is copied once: with compareToISO it is copied out of
+                the buffer so bytes.translate can delete what isn't ISO standard, otherwise it
+                is decoded straight from the memoryview
+
+                RawReadResponseParser does the same thing for the raw read response (ESCAPE +
+                m), where each track is a length byte followed by that many bytes of binary
+                data
+"""
+
+
+import re
+
+from isoStandardDictionary import iso_standard_track_check, iso_delete_table
+
+
+#same values as the constants in cardReader.py, they're repeated here so this module doesn't
+#need pyserial
+ESCAPE = 0x1B
+FILE_SEPERATOR = 0x1C
+START_OF_HEADING = 0x01
+START_OF_TEXT = 0x02
+END_OF_TEXT = 0x03
+
+#these are let through the ISO standard check when reading track data (ESC, FS, ACK 'y',
+#SOH, STX, ETX)
+CONTROL_CHARACTERS = frozenset('\x1b\x1cy\x01\x02\x03')
+
+#the most characters each track can have according to the ISO standard
+TRACK_LENGTH_LIMITS = (79, 40, 107)
+
+#the density (bits per inch) and bits per character (including the parity bit) of each track
+#in the ISO standard, the MSR605 can be set to others (see CardReader.set_bpi and set_bpc)
+ISO_BITS_PER_INCH = (210, 75, 210)
+ISO_BITS_PER_CHARACTER = (7, 5, 5)
+
+#how many bits fit on each track at the ISO density, the length limits above times the ISO
+#bits per character
+TRACK_BITS = (553, 200, 535)
+
+#the byte that comes before each tracks data and the byte that ends the track data
+TRACK_START_BYTES = (START_OF_HEADING, START_OF_TEXT, END_OF_TEXT)
+TRACK_END_PATTERNS = (re.compile(b'\x1b'), re.compile(b'\x1b'), re.compile(b'\x1c'))
+
+#parser states, in the order they show up in the response
+EXPECT_ESCAPE = 0
+EXPECT_S = 1
+EXPECT_CARDDATA_ESCAPE = 2
+EXPECT_TRACK_START = 3
+IN_TRACK = 4
+EXPECT_ENDING_ESCAPE = 5
+EXPECT_STATUS = 6
+DONE = 7
+
+
+class ReadResponse():
+    """What the ReadResponseParser returns once a full read response has been parsed
+
+        Attributes:
+            tracks: list of the 3 tracks, with the ? % ; sentinels removed the same way
+                    CardReader.read_card always has
+
+            status: the Status byte as a string ('0' is OK), None if the response ended early
+
+            error: None if the response was formatted properly, otherwise a string that says
+                    which part of the response was wrong
+
+            errorField: which part of the response the error is in, 'Datablock' if the response
+                        didn't even start properly (no track data at all) or 'Ending' if
+                        the ESCAPE before the status byte is missing
+
+            missingTracks: list of the track #'s that didn't have their start byte
+    """
+
+    __slots__ = ('tracks', 'status', 'error', 'errorField', 'missingTracks')
+
+    def __init__(self, tracks, status, error, errorField, missingTracks):
+        self.tracks = tracks
+        self.status = status
+        self.error = error
+        self.errorField = errorField
+        self.missingTracks = missingTracks
+
+
+class ReadResponseParser():
+    """Incremental (push) parser for the MSR605 read response
+
+        Example:
+            parser = ReadResponseParser()
+            response = None
+
+            while response is None:
+                response = parser.feed(serialConn.read(serialConn.in_waiting or 1))
+
+            leftover = data[parser.bytesUsed:]
+
+        Attributes:
+            bytesUsed: how many bytes of the last chunk given to feed() were part of the
+                        response, anything after that belongs to whatever comes next
+    """
+
+    def __init__(self, compareToISO=True, bitsPerInch=ISO_BITS_PER_INCH,
+                 bitsPerChar=ISO_BITS_PER_CHARACTER):
+        """Creates a parser that is ready for the start of a response
+
+            Args:
+                compareToISO: if True (the default) characters that are not in the ISO
+                                standard character set for the track are dropped, the same
+                                as CardReader.read_until
+
+                bitsPerInch: the density of each track (75 or 210), sets how long each
+                                track can be
+
+                bitsPerChar: the bits per character of each track (5 to 8), a track with 5
+                                is numeric (the track 2 and 3 character set and ; start
+                                sentinel) and with more it is alphanumeric (the track 1
+                                character set and % start sentinel)
+
+            Returns:
+                Nothing
+
+            Raises:
+                Nothing
+        """
+
+        self.__compareToISO = compareToISO
+
+        #which track's ISO character set each track is checked against
+        self.__isoTracks = tuple(1 if bits > 5 else 2 for bits in bitsPerChar)
+        self.__startSentinels = tuple('%' if bits > 5 else ';' for bits in bitsPerChar)
+        self.__limits = tuple(track_length_limit(trackIndex + 1, bitsPerInch[trackIndex],
+                                                 bitsPerChar[trackIndex])
+                              for trackIndex in range(3))
+
+        self.reset()
+
+
+    def reset(self):
+        """Throws away any partly parsed response, so the parser can be used again
+
+            Args:
+                None
+
+            Returns:
+                Nothing
+
+            Raises:
+                Nothing
+        """
+
+        self.__state = EXPECT_ESCAPE
+        self.__trackIndex = 0
+        self.__count = 0
+        self.__pieces = []
+        self.__tracks = ['', '', '']
+        self.__missingTracks = []
+        self.bytesUsed = 0
+
+
+    def feed(self, data):
+        """Parses the next chunk of the response
+
+            Args:
+                data: bytes, bytearray or memoryview with the next part of the response, it
+                        can be any size, even one byte at a time
+
+            Returns:
+                A ReadResponse if the response ended inside this chunk, otherwise None
+                (keep feeding it)
+
+            Raises:
+                Nothing, problems with the response are reported in ReadResponse.error
+        """
+
+        view = memoryview(data)
+
+        #a non-byte memoryview (ex: from an array) would give the wrong lengths
+        if (view.itemsize != 1):
+            view = view.cast('B')
+
+        pos = 0
+        size = len(view)
+
+        while (pos < size):
+            state = self.__state
+
+            if (state == IN_TRACK):
+                pos = self.__parse_track(view, pos, size)
+                continue
+
+            byte = view[pos]
+            pos += 1
+
+            if (state == EXPECT_ESCAPE):
+                if (byte != ESCAPE):
+                    return self.__finish(pos, None, "Datablock", "[Datablock] READ ERROR, R/W "
+                                         "Data Field, looking for ESCAPE(\x1B)")
+                self.__state = EXPECT_S
+
+            elif (state == EXPECT_S):
+                if (byte != 0x73):
+                    return self.__finish(pos, None, "Datablock", "[Datablock] READ ERROR, R/W "
+                                         "Data Field, looking for s (\x73)")
+                self.__state = EXPECT_CARDDATA_ESCAPE
+
+            elif (state == EXPECT_CARDDATA_ESCAPE):
+                if (byte != ESCAPE):
+                    return self.__finish(pos, None, "Datablock", "[Carddata] READ ERROR, R/W "
+                                         "Data Field, looking for ESCAPE(\x1B)")
+                self.__state = EXPECT_TRACK_START
+
+            elif (state == EXPECT_TRACK_START):
+                #a card might not have a track, so this isn't an error, the byte is used up
+                #either way (the same as read_card always did)
+                if (byte == TRACK_START_BYTES[self.__trackIndex]):
+                    self.__state = IN_TRACK
+                    self.__count = 0
+                    self.__pieces = []
+                else:
+                    self.__missingTracks.append(self.__trackIndex + 1)
+                    self.__next_track()
+
+            elif (state == EXPECT_ENDING_ESCAPE):
+                if (byte != ESCAPE):
+                    return self.__finish(pos, None, "Ending", "[Datablock] READ ERROR, Ending "
+                                         "Field, looking for ESCAPE(\x1B)")
+                self.__state = EXPECT_STATUS
+
+            elif (state == EXPECT_STATUS):
+                return self.__finish(pos, chr(byte), None, None)
+
+            else:
+                #DONE, anything after the response isn't ours
+                self.bytesUsed = 0
+                return None
+
+        self.bytesUsed = pos
+        return None
+
+
+    def __parse_track(self, view, pos, size):
+        """Takes as much of the current track as this chunk has
+
+            Args:
+                view: memoryview of the chunk
+
+                pos: where the track data starts in the chunk
+
+                size: length of the chunk
+
+            Returns:
+                The position in the chunk after the data that was used
+
+            Raises:
+                Nothing
+        """
+
+        trackIndex = self.__trackIndex
+        limit = self.__limits[trackIndex]
+        isoTrack = self.__isoTracks[trackIndex]
+
+        match = TRACK_END_PATTERNS[trackIndex].search(view, pos)
+        stop = match.start() if match is not None else size
+
+        #the whole chunk is checked at once, the bytes that aren't ISO standard (or control
+        #characters) are deleted by translate (which needs a bytes copy of it)
+        if (self.__compareToISO):
+            deleteTable = iso_delete_table(isoTrack, CONTROL_CHARACTERS)
+            chunk = str(bytes(view[pos:stop]).translate(None, deleteTable), 'latin-1')
+        else:
+            chunk = str(view[pos:stop], 'latin-1')
+
+        if (self.__count + len(chunk) >= limit):
+            #the track is longer than the ISO standard allows, take characters one at a time
+            #until the limit is reached, the rest is parsed as whatever comes next
+            while (self.__count < limit and pos < stop):
+                char = chr(view[pos])
+                pos += 1
+
+                if (self.__compareToISO and not (char in CONTROL_CHARACTERS or
+                                                 iso_standard_track_check(char, isoTrack))):
+                    continue
+
+                if (char != '\x1b'):
+                    self.__pieces.append(char)
+
+                self.__count += 1
+
+            if (self.__count >= limit):
+                self.__end_track()
+
+            return pos
+
+        self.__count += len(chunk)
+        self.__pieces.append(chunk.replace('\x1b', ''))
+
+        if (match is not None):
+            self.__end_track()
+            return stop + 1
+
+        return stop
+
+
+    def __end_track(self):
+        """Strips the sentinels off of the track that just ended and moves on to the next one"""
+
+        track = ''.join(self.__pieces)
+        trackIndex = self.__trackIndex
+
+        startSentinel = self.__startSentinels[trackIndex]
+
+        #removes any ? and % (track 1) or ; (tracks 2 and 3), these are part of the ISO standard
+        #and have to be removed for writing to the card, the MSR605 adds them automatically
+        if (trackIndex < 2):
+            if (len(track) > 0 and track[-1] == '?'):
+                track = track[:-1]
+            if (len(track) > 0 and track[0] == startSentinel):
+                track = track[1:]
+
+        else:
+            #track 3 requires a ? when writing
+            if (len(track) > 0):
+                if (track[-1] != '?'):
+                    track += '?'
+                if (track[0] == startSentinel):
+                    track = track[1:]
+            else:
+                track = '?'
+
+        self.__tracks[trackIndex] = track
+        self.__pieces = []
+        self.__next_track()
+
+
+    def __next_track(self):
+        """Moves the parser on to the next track, or the ending field after track 3"""
+
+        if (self.__trackIndex < 2):
+            self.__trackIndex += 1
+            self.__state = EXPECT_TRACK_START
+        else:
+            self.__state = EXPECT_ENDING_ESCAPE
+
+
+    def __finish(self, pos, status, errorField, error):
+        """Ends the response and builds the ReadResponse that feed() returns"""
+
+        self.__state = DONE
+        self.bytesUsed = pos
+
+        #nothing was read if the response didn't start properly
+        tracks = None if errorField == "Datablock" else self.__tracks
+
+        return ReadResponse(tracks, status, error, errorField, self.__missingTracks)
+
+
+def track_length_limit(trackNum, bitsPerInch, bitsPerChar):
+    """Returns how many characters fit on a track at a density and bits per character
+
+        Args:
+            trackNum: the track # (1, 2 or 3)
+
+            bitsPerInch: the density of the track (75 or 210)
+
+            bitsPerChar: the bits per character (5 to 8)
+
+        Returns:
+            The number of characters, at the ISO settings it is the same as
+            TRACK_LENGTH_LIMITS (79, 40 and 107)
+
+        Raises:
+            Nothing
+    """
+
+    trackIndex = trackNum - 1
+
+    return TRACK_BITS[trackIndex] * bitsPerInch // ISO_BITS_PER_INCH[trackIndex] // bitsPerChar
+
+
+#raw parser states, in the order they show up in the response
+RAW_EXPECT_ESCAPE = 0
+RAW_EXPECT_S = 1
+RAW_EXPECT_TRACK_ESCAPE = 2
+RAW_EXPECT_TRACK_ID = 3
+RAW_EXPECT_LENGTH = 4
+RAW_IN_TRACK = 5
+RAW_EXPECT_END = 6
+RAW_EXPECT_ENDING_ESCAPE = 7
+RAW_EXPECT_STATUS = 8
+RAW_DONE = 9
+
+
+class RawReadResponse():
+    """What the RawReadResponseParser returns once a full raw read response has been parsed
+
+        Attributes:
+            tracks: list of the 3 tracks as bytes, exactly as the MSR605 sent them (nothing is
+                    decoded or filtered), None if the response didn't start properly
+
+            status: the Status byte as a string ('0' is OK), None if the response ended early
+
+            error: None if the response was formatted properly, otherwise a string that says
+                    which part of the response was wrong
+
+            errorField: 'Datablock' if the response didn't start properly, 'Carddata' if a
+                        track block is wrong (the tracks before it are kept) or 'Ending' if
+                        the end of the response is wrong
+    """
+
+    __slots__ = ('tracks', 'status', 'error', 'errorField')
+
+    def __init__(self, tracks, status, error, errorField):
+        self.tracks = tracks
+        self.status = status
+        self.error = error
+        self.errorField = errorField
+
+
+class RawReadResponseParser():
+    """Incremental (push) parser for the MSR605 raw read response (the response to ESCAPE + m)
+
+        The raw response looks like this:
+            <ESC>s<ESC>[01][L1][string1]<ESC>[02][L2][string2]<ESC>[03][L3][string3]?<FS><ESC>[status]
+
+        Each [L] is one byte with the length of the track data after it, the track data is
+        binary (it can have an ESCAPE or FS in it) so it is taken by length and never looked
+        at. It is used the same way as ReadResponseParser
+
+        Attributes:
+            bytesUsed: how many bytes of the last chunk given to feed() were part of the
+                        response
+    """
+
+    def __init__(self):
+        self.reset()
+
+
+    def reset(self):
+        """Throws away any partly parsed response, so the parser can be used again"""
+
+        self.__state = RAW_EXPECT_ESCAPE
+        self.__trackIndex = 0
+        self.__remaining = 0
+        self.__data = bytearray()
+        self.__tracks = [b'', b'', b'']
+        self.bytesUsed = 0
+
+
+    def feed(self, data):
+        """Parses the next chunk of the raw response
+
+            Args:
+                data: bytes, bytearray or memoryview with the next part of the response
+
+            Returns:
+                A RawReadResponse if the response ended inside this chunk, otherwise None
+
+            Raises:
+                Nothing, problems with the response are reported in RawReadResponse.error
+        """
+
+        view = memoryview(data)
+
+        if (view.itemsize != 1):
+            view = view.cast('B')
+
+        pos = 0
+        size = len(view)
+
+        while (pos < size):
+            state = self.__state
+
+            if (state == RAW_IN_TRACK):
+                #the track data is copied over in one go, as much as this chunk has
+                take = min(self.__remaining, size - pos)
+                self.__data += view[pos:pos + take]
+                pos += take
+                self.__remaining -= take
+
+                if (self.__remaining == 0):
+                    self.__end_track()
+
+                continue
+
+            byte = view[pos]
+            pos += 1
+
+            if (state == RAW_EXPECT_ESCAPE):
+                if (byte != ESCAPE):
+                    return self.__finish(pos, None, "Datablock", "[Datablock] RAW READ ERROR, "
+                                         "R/W Data Field, looking for ESCAPE(\x1B)")
+                self.__state = RAW_EXPECT_S
+
+            elif (state == RAW_EXPECT_S):
+                if (byte != 0x73):
+                    return self.__finish(pos, None, "Datablock", "[Datablock] RAW READ ERROR, "
+                                         "R/W Data Field, looking for s (\x73)")
+                self.__state = RAW_EXPECT_TRACK_ESCAPE
+
+            elif (state == RAW_EXPECT_TRACK_ESCAPE):
+                if (byte != ESCAPE):
+                    return self.__finish(pos, None, "Carddata", "[Carddata] RAW READ ERROR, "
+                                         "looking for ESCAPE(\x1B) before track " +
+                                         str(self.__trackIndex + 1))
+                self.__state = RAW_EXPECT_TRACK_ID
+
+            elif (state == RAW_EXPECT_TRACK_ID):
+                if (byte != TRACK_START_BYTES[self.__trackIndex]):
+                    return self.__finish(pos, None, "Carddata", "[Carddata] RAW READ ERROR, "
+                                         "looking for the start of track " +
+                                         str(self.__trackIndex + 1))
+                self.__state = RAW_EXPECT_LENGTH
+
+            elif (state == RAW_EXPECT_LENGTH):
+                self.__remaining = byte
+
+                if (byte == 0):
+                    self.__end_track()
+                else:
+                    self.__state = RAW_IN_TRACK
+
+            elif (state == RAW_EXPECT_END):
+                #the ? before the FS is optional, some firmware doesn't send it
+                if (byte == 0x3F):
+                    continue
+
+                if (byte != FILE_SEPERATOR):
+                    return self.__finish(pos, None, "Ending", "[Datablock] RAW READ ERROR, "
+                                         "Ending Field, looking for FILE SEPERATOR(\x1C)")
+                self.__state = RAW_EXPECT_ENDING_ESCAPE
+
+            elif (state == RAW_EXPECT_ENDING_ESCAPE):
+                if (byte != ESCAPE):
+                    return self.__finish(pos, None, "Ending", "[Datablock] RAW READ ERROR, "
+                                         "Ending Field, looking for ESCAPE(\x1B)")
+                self.__state = RAW_EXPECT_STATUS
+
+            elif (state == RAW_EXPECT_STATUS):
+                return self.__finish(pos, chr(byte), None, None)
+
+            else:
+                #RAW_DONE, anything after the response isn't ours
+                self.bytesUsed = 0
+                return None
+
+        self.bytesUsed = pos
+        return None
+
+
+    def __end_track(self):
+        """Saves the track that just ended and moves on to the next one"""
+
+        self.__tracks[self.__trackIndex] = bytes(self.__data)
+        del self.__data[:]
+
+        if (self.__trackIndex < 2):
+            self.__trackIndex += 1
+            self.__state = RAW_EXPECT_TRACK_ESCAPE
+        else:
+            self.__state = RAW_EXPECT_END
+
+
+    def __finish(self, pos, status, errorField, error):
+        """Ends the response and builds the RawReadResponse that feed() returns"""
+
+        self.__state = RAW_DONE
+        self.bytesUsed = pos
+
+        tracks = None if errorField == "Datablock" else self.__tracks
+
+        return RawReadResponse(tracks, status, error, errorField)
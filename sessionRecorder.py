@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+
+""" sessionRecorder.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows, Linux
+    Python: 3.7 or newer
+
+    Description: This records everything CardReader sends to and gets from the MSR605 and
+                 plays it back later without the MSR605 (or anybody swiping cards)
+
+                Recording, from the start (so the connect is in the recording too):
+                    msr = cardReader.CardReader(RecordingConnection(SerialTransport(port),
+                                                                    'session.rec'))
+
+                or part way through a session:
+                    msr.setSerialConn(RecordingConnection(msr.getSerialConn(), 'session.rec'))
+
+                Playing it back, CardReader has to send the same commands in the same order:
+                    msr = cardReader.CardReader(ReplayTransport('session.rec'))
+
+                (with connect=True for a recording that was started with setSerialConn)
+
+                The recording file is a header followed by one record for every write and
+                every read that got data:
+                    header: MSR605REC, a version byte and the time.time() it was started (a
+                            double), a file that is added to gets another header
+                    record: 'W' or 'R', the time.monotonic() since the header (a double), the
+                            length of the data (4 bytes) and then the data
+
+                The records are only ever added to the end of the file
+"""
+
+
+import struct, threading, time
+
+from cardReaderTransport import Transport
+
+
+#the start of the file (and of every session added to it)
+MAGIC = b'MSR605REC'
+VERSION = 1
+HEADER = struct.Struct('<9sBd')
+RECORD = struct.Struct('<cdI')
+
+WRITE = b'W'
+READ = b'R'
+
+#the MSR605 connect sequence CardReader sends (reset, communication test, reset) and the
+#communication test response, played first by ReplayTransport(connect=True)
+CONNECT_EVENTS = ((WRITE, 0.0, b'\x1b\x61'), (WRITE, 0.0, b'\x1b\x65'), (READ, 0.0, b'\x1b\x79'),
+                  (WRITE, 0.0, b'\x1b\x61'))
+
+
+class ReplayMismatchError(Exception):
+    """Raised by a strict ReplayTransport when CardReader writes something other than what is
+        in the recording"""
+
+    def __init__(self, arg, position):
+        super(ReplayMismatchError, self).__init__(arg)
+        self.position = position #how many bytes had been written before the mismatch
+
+
+class RecordingConnection(Transport):
+    """Wraps a transport (see cardReaderTransport.py) and records everything that goes through
+        it, CardReader can't tell the difference
+
+        Attributes:
+            port: the port of the wrapped transport (None if it doesn't have one)
+    """
+
+    def __init__(self, transport, path):
+        """Opens the recording file (it is added to if it already exists)
+
+            Args:
+                transport: the connection to the MSR605 to record
+
+                path: the recording file
+
+            Returns:
+                Nothing
+
+            Raises:
+                OSError: the file couldn't be opened
+        """
+
+        self.port = getattr(transport, 'port', None)
+
+        self.__transport = transport
+        self.__lock = threading.Lock()
+        self.__file = open(path, 'ab')
+        self.__start = time.monotonic()
+
+        self.__file.write(HEADER.pack(MAGIC, VERSION, time.time()))
+
+    @property
+    def in_waiting(self):
+        return self.__transport.in_waiting
+
+    @property
+    def timeout(self):
+        return self.__transport.timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self.__transport.timeout = timeout
+
+    def read(self, size=1):
+        data = self.__transport.read(size)
+
+        #a read that timed out doesn't tell the replay anything
+        if (data):
+            self.__record(READ, data)
+
+        return data
+
+    def write(self, data):
+        self.__record(WRITE, data)
+        return self.__transport.write(data)
+
+    def flush(self):
+        self.__transport.flush()
+
+        #CardReader flushes after every command, so that is when the recording hits the disk
+        with self.__lock:
+            if (not self.__file.closed):
+                self.__file.flush()
+
+    def flushInput(self):
+        self.__transport.flushInput()
+
+    def flushOutput(self):
+        self.__transport.flushOutput()
+
+    def fileno(self):
+        return self.__transport.fileno()
+
+    def close(self):
+        """Closes the recording and the wrapped transport"""
+
+        with self.__lock:
+            if (not self.__file.closed):
+                self.__file.close()
+
+        self.__transport.close()
+
+    def stop_recording(self):
+        """Closes the recording file and returns the wrapped transport (still open), ex:
+            msr.setSerialConn(recording.stop_recording())
+        """
+
+        with self.__lock:
+            if (not self.__file.closed):
+                self.__file.close()
+
+        return self.__transport
+
+    def __record(self, direction, data):
+        timestamp = time.monotonic() - self.__start
+
+        with self.__lock:
+            if (not self.__file.closed):
+                self.__file.write(RECORD.pack(direction, timestamp, len(data)))
+                self.__file.write(data)
+
+
+def read_recording(path):
+    """Reads a recording file
+
+        Args:
+            path: the recording file
+
+        Returns:
+            A list of (direction, timestamp, data), direction is WRITE or READ and timestamp is
+            seconds since the start of the recording (sessions added to the file later carry
+            on from the end of the one before)
+
+        Raises:
+            ValueError: the file isn't a recording or is cut off in the middle of a record (the
+                        records before that can be read by catching it, see ReplayTransport)
+
+            OSError: the file couldn't be read
+    """
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    view = memoryview(data)
+    events = []
+    pos = 0
+    offset = 0.0
+    lastTimestamp = 0.0
+
+    while (pos < len(data)):
+        if (data.startswith(MAGIC, pos)):
+            if (len(data) - pos < HEADER.size):
+                raise ValueError("recording is cut off in a header at byte " + str(pos))
+
+            magic, version, started = HEADER.unpack_from(data, pos)
+
+            if (version != VERSION):
+                raise ValueError("recording version " + str(version) + " isn't supported")
+
+            #the next session's timestamps start from 0 again
+            offset = lastTimestamp
+            pos += HEADER.size
+            continue
+
+        if (pos == 0):
+            raise ValueError("not an MSR605 recording")
+
+        if (len(data) - pos < RECORD.size):
+            raise ValueError("recording is cut off in a record at byte " + str(pos))
+
+        direction, timestamp, length = RECORD.unpack_from(data, pos)
+        pos += RECORD.size
+
+        if (direction not in (WRITE, READ) or len(data) - pos < length):
+            raise ValueError("recording is damaged or cut off at byte " + str(pos))
+
+        lastTimestamp = offset + timestamp
+        events.append((direction, lastTimestamp, bytes(view[pos:pos + length])))
+        pos += length
+
+    return events
+
+
+class ReplayTransport(Transport):
+    """Plays a recording back into CardReader in place of the MSR605
+
+        The bytes that were read in the recording are given back to CardReader only once it has
+        written everything that was written before them, so CardReader sees the same
+        conversation it had with the MSR605. A read with nothing left to give back returns
+        b'' (like a serial port timing out, after the timeout if one is set) rather than
+        blocking forever, so a replay that goes off the recording or past its end makes
+        CardReader raise CardReadError instead of hanging.
+
+        Attributes:
+            port: the recording file
+
+            timeout: the read timeout (kept so CardReader can set it, a read only waits this
+                        long when realtime is True)
+    """
+
+    def __init__(self, path, realtime=False, strict=False, connect=False):
+        """Loads a recording
+
+            Args:
+                path: the recording file
+
+                realtime: if True each read is given back as long after the write before it
+                            as it was in the recording (the MSR605's response times and the
+                            card swipes), otherwise everything is as fast as possible
+
+                strict: if True a write that doesn't match the recording raises
+                        ReplayMismatchError, otherwise the bytes are just counted
+
+                connect: if True CardReader's connect sequence is played before the recording,
+                            for a recording that was started part way through a session
+
+            Returns:
+                Nothing
+
+            Raises:
+                ValueError: the file isn't a recording
+
+                OSError: the file couldn't be read
+        """
+
+        self.port = path
+        self.__timeout = None
+
+        events = list(CONNECT_EVENTS) if connect else []
+        events += read_recording(path)
+
+        self.__realtime = realtime
+        self.__strict = strict
+
+        #everything that was written, one after the other, to check the writes against
+        self.__expected = b''.join(data for direction, timestamp, data in events
+                                   if direction == WRITE)
+
+        #for each read: (how many bytes had been written before it, the index of the write
+        #before it, how long after that write it came, the data)
+        self.__reads = []
+        #where each write ends in __expected
+        self.__writeEnds = []
+
+        written = 0
+        lastWrite = None
+        lastWriteTime = 0.0
+
+        for direction, timestamp, data in events:
+            if (direction == WRITE):
+                written += len(data)
+                lastWrite = len(self.__writeEnds)
+                lastWriteTime = timestamp
+                self.__writeEnds.append(written)
+            else:
+                self.__reads.append((written, lastWrite, timestamp - lastWriteTime, data))
+
+        self.__lock = threading.Lock()
+        self.__written = 0
+        self.__writesDone = 0
+        self.__started = time.monotonic()
+        #when each write was finished during the replay
+        self.__writeTimes = []
+
+        self.__nextRead = 0
+        self.__readPos = 0
+
+    @property
+    def in_waiting(self):
+        with self.__lock:
+            if (self.__nextRead >= len(self.__reads)):
+                return 0
+
+            due = self.__due(self.__nextRead)
+
+            if (due is None or due > time.monotonic()):
+                return 0
+
+            return len(self.__reads[self.__nextRead][3]) - self.__readPos
+
+    @property
+    def timeout(self):
+        return self.__timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self.__timeout = timeout
+
+    def read(self, size=1):
+        waitUntil = None if self.timeout is None else time.monotonic() + self.timeout
+
+        while True:
+            with self.__lock:
+                if (self.__nextRead >= len(self.__reads)):
+                    return b''
+
+                due = self.__due(self.__nextRead)
+                now = time.monotonic()
+
+                if (due is not None and due <= now):
+                    data = self.__reads[self.__nextRead][3]
+                    chunk = data[self.__readPos:self.__readPos + size]
+                    self.__readPos += len(chunk)
+
+                    if (self.__readPos >= len(data)):
+                        self.__nextRead += 1
+                        self.__readPos = 0
+
+                    return chunk
+
+            #the read is waiting for a write that hasn't happened, it never will while this
+            #thread is blocked in read()
+            if (due is None):
+                if (waitUntil is not None):
+                    time.sleep(max(0.0, waitUntil - now))
+                return b''
+
+            if (waitUntil is not None and due > waitUntil):
+                time.sleep(max(0.0, waitUntil - now))
+                return b''
+
+            time.sleep(due - now)
+
+    def write(self, data):
+        data = bytes(data)
+
+        with self.__lock:
+            start = self.__written
+            expected = self.__expected[start:start + len(data)]
+
+            if (self.__strict and data != expected):
+                raise ReplayMismatchError("REPLAY MISMATCH, wrote " + repr(data) + " but the "
+                                          "recording has " + repr(expected), start)
+
+            self.__written += len(data)
+            now = time.monotonic()
+
+            while (self.__writesDone < len(self.__writeEnds) and
+                   self.__writeEnds[self.__writesDone] <= self.__written):
+                self.__writeTimes.append(now)
+                self.__writesDone += 1
+
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def flushInput(self):
+        #everything in the recording was actually read by CardReader, so nothing is thrown away
+        pass
+
+    def flushOutput(self):
+        pass
+
+    def close(self):
+        pass
+
+    def finished(self):
+        """True once every read in the recording has been given back"""
+
+        with self.__lock:
+            return self.__nextRead >= len(self.__reads)
+
+    def __due(self, index):
+        """When a read can be given back (a time.monotonic() value), None if CardReader
+            hasn't written what comes before it yet
+        """
+
+        writtenBefore, lastWrite, delay, data = self.__reads[index]
+
+        if (self.__written < writtenBefore):
+            return None
+
+        if (not self.__realtime):
+            return 0.0
+
+        start = self.__started if lastWrite is None else self.__writeTimes[lastWrite]
+
+        return start + delay
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+""" conftest.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Linux
+    Python: 3.7 or newer
+
+    Description: The fixtures the tests share, run the tests from the top folder with:
+                    python3 -m pytest
+
+                The tests that need an MSR605 use msr605Emulator.py (a pty), so they are
+                skipped on Windows
+"""
+
+
+import os, sys
+
+import pytest
+
+#the modules are all in the top folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+#a track 1 and 2 that are valid ISO/IEC 7813 (the PAN passes the Luhn check)
+TRACK_ONE = 'B4111111111111111^DOE/JOHN^2512101'
+TRACK_TWO = '4111111111111111=2512101'
+
+needsPty = pytest.mark.skipif(os.name != 'posix', reason="msr605Emulator.py needs a pty")
+
+
+@pytest.fixture
+def emulator():
+    """An MSR605Emulator with a financial card in it, stopped after the test"""
+
+    from msr605Emulator import MSR605Emulator
+
+    if (os.name != 'posix'):
+        pytest.skip("msr605Emulator.py needs a pty")
+
+    with MSR605Emulator(tracks=[TRACK_ONE, TRACK_TWO, '']) as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def msr(emulator):
+    """A CardReader connected to the emulator"""
+
+    import cardReader
+    from cardReaderTransport import SerialTransport
+
+    reader = cardReader.CardReader(SerialTransport(emulator.portName))
+
+    yield reader
+
+    reader.close_serial_connection()
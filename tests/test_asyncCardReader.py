@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+""" test_asyncCardReader.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Linux
+    Python: 3.7 or newer
+
+    Description: Tests for asyncCardReader.py against msr605Emulator.py, each test runs its
+                 own event loop
+"""
+
+
+import asyncio
+
+import pytest
+
+import cardReaderExceptions
+from conftest import TRACK_ONE, TRACK_TWO, needsPty
+
+
+pytestmark = needsPty
+
+
+def run(emulator, test):
+    """Connects an AsyncCardReader to the emulator and runs test(reader) on a new loop"""
+
+    from asyncCardReader import AsyncCardReader
+
+    async def main():
+        reader = await AsyncCardReader.connect(emulator.portName)
+
+        try:
+            return await test(reader)
+        finally:
+            reader.close()
+
+    return asyncio.run(main())
+
+
+def test_read_card(emulator):
+    async def test(reader):
+        return await reader.read_card(timeout=5)
+
+    assert run(emulator, test) == [TRACK_ONE, TRACK_TWO, '?']
+
+
+def test_write_then_read(emulator):
+    async def test(reader):
+        await reader.write_card(['XYZ', '42', ''], timeout=5)
+        return await reader.read_card(timeout=5)
+
+    assert run(emulator, test) == ['XYZ', '42', '?']
+
+
+def test_write_too_long(emulator):
+    async def test(reader):
+        with pytest.raises(cardReaderExceptions.CardWriteError):
+            await reader.write_card(['', '1' * (reader.track_capacity(2) + 1), ''], timeout=5)
+
+        return await reader.read_card(timeout=5)
+
+    #nothing was sent, the card is the same
+    assert run(emulator, test) == [TRACK_ONE, TRACK_TWO, '?']
+
+
+def test_set_bpc(emulator):
+    async def test(reader):
+        await reader.set_bpc(7, 7, 7)
+        emulator.card = ['ABC', 'DEF', 'GHI']
+
+        return reader.get_bpc(), await reader.read_card(timeout=5)
+
+    #read the same way CardReader reads it
+    assert run(emulator, test) == ([7, 7, 7], ['ABC', 'DEF', 'GHI?'])
+
+
+def test_raw(emulator):
+    #nothing is left on the ISO card, so the emulator doesn't need NumPy to encode it
+    emulator.card = ['', '', '']
+
+    async def test(reader):
+        await reader.write_raw([b'\x01\x02', b'', b''], timeout=5)
+        return await reader.read_raw(timeout=5)
+
+    assert run(emulator, test)[0] == b'\x01\x02'
+
+
+def test_timeout_resets(emulator):
+    emulator.autoSwipe = False
+
+    async def test(reader):
+        with pytest.raises(asyncio.TimeoutError):
+            await reader.read_card(timeout=0.2)
+
+        emulator.autoSwipe = True
+
+        return await reader.read_card(timeout=5)
+
+    assert run(emulator, test) == [TRACK_ONE, TRACK_TWO, '?']
+
+
+def test_coercivity(emulator):
+    async def test(reader):
+        await reader.set_low_co()
+        return await reader.get_hi_or_low_co()
+
+    assert run(emulator, test) == 'LOW-CO'
+
+
+def test_escape_skip_is_capped():
+    from msr605Emulator import MSR605Emulator
+
+    #everything after the R of the firmware version is left for set_hi_co to skip over
+    with MSR605Emulator(firmware=b'R' + b'x' * 64) as emulator:
+        async def test(reader):
+            await reader.get_firmware_version()
+            await asyncio.sleep(0.05)
+
+            with pytest.raises(cardReaderExceptions.SetCoercivityError):
+                await reader.set_hi_co()
+
+        run(emulator, test)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+""" test_cardConsensus.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows
+    Python: 3.7 or newer
+
+    Description: Tests for cardConsensus.py and CardReader.read_card_consensus
+"""
+
+
+from cardConsensus import consensus_read, consensus_track, read_card_tracks
+from conftest import TRACK_ONE, TRACK_TWO
+
+
+def test_bad_character_outvoted():
+    reads = [TRACK_ONE, TRACK_ONE.replace('1111', '11X1', 1), TRACK_ONE]
+    track = consensus_track(reads, 1)
+
+    assert track.text == TRACK_ONE
+    assert track.swipes == 3
+    assert track.confidence < 1.0
+
+
+def test_dropped_character():
+    reads = [TRACK_TWO, TRACK_TWO, TRACK_TWO[:5] + TRACK_TWO[6:]]
+
+    assert consensus_track(reads, 2).text == TRACK_TWO
+
+
+def test_empty_track_three_left_out():
+    #read_card gives back ? for an empty track 3, it isn't a track with a ? in it
+    tracks = consensus_read([[TRACK_ONE, TRACK_TWO, '?'], [TRACK_ONE, TRACK_TWO, '?']])
+
+    assert tracks[0].text == TRACK_ONE
+    assert tracks[1].text == TRACK_TWO
+    assert tracks[2] is None
+
+
+def test_read_card_tracks():
+    tracks = consensus_read([[TRACK_ONE, '', '?'], [TRACK_ONE, '', '?']])
+
+    #a missing track 3 is the ? read_card gives back for it
+    assert read_card_tracks(tracks) == [TRACK_ONE, '', '?']
+
+
+def test_bits_per_character():
+    #with 7 bits per character track 2 is alphanumeric, the letters aren't voted down as
+    #non ISO characters
+    reads = ['DEF^', 'DEF^', 'DEX^']
+
+    assert consensus_track(reads, 2).confidence == 0.0
+
+    track = consensus_track(reads, 2, 7)
+
+    assert track.text == 'DEF^'
+    assert track.confidence > 0.5
+    assert consensus_read([['', read, ''] for read in reads], (7, 7, 5))[1].text == 'DEF^'
+
+
+def test_read_card_consensus(msr):
+    tracks = msr.read_card_consensus(3)
+
+    assert [track.text for track in tracks[:2]] == [TRACK_ONE, TRACK_TWO]
+    assert [track.confidence for track in tracks[:2]] == [1.0, 1.0]
+    assert tracks[2] is None
+
+
+def test_read_card_consensus_bpc(msr, emulator):
+    msr.set_bpc(7, 7, 7)
+    emulator.card = ['ABC', 'DEF^', 'GHI']
+
+    tracks = msr.read_card_consensus(2)
+
+    #track 3 is read with its end sentinel, the same as read_card
+    assert [track.text for track in tracks] == ['ABC', 'DEF^', 'GHI?']
+    assert all(track.confidence == 1.0 for track in tracks)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+""" test_cardReader.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Linux
+    Python: 3.7 or newer
+
+    Description: Tests for cardReader.py against msr605Emulator.py
+"""
+
+
+import sys, threading, time
+
+import pytest
+
+import cardReader, cardReaderExceptions
+from conftest import TRACK_ONE, TRACK_TWO
+
+
+def test_read_card(msr):
+    #an empty track 3 is read back as just the end sentinel
+    assert msr.read_card() == [TRACK_ONE, TRACK_TWO, '?']
+
+
+def test_write_then_read(msr, emulator):
+    msr.write_card(['ABC', '123', '456'], True)
+
+    assert emulator.card == ['ABC', '123', '456']
+    assert msr.read_card() == ['ABC', '123', '456?']
+
+
+def test_erased_card_cant_be_read(msr):
+    msr.erase_card(7)
+
+    with pytest.raises(cardReaderExceptions.StatusError):
+        msr.read_card()
+
+
+def test_set_bpc(msr, emulator):
+    msr.set_bpc(7, 7, 7)
+    emulator.card = ['ABC', 'DEF', 'GHI']
+
+    assert msr.get_bpc() == [7, 7, 7]
+    assert emulator.bpc == [7, 7, 7]
+    assert msr.read_card() == ['ABC', 'DEF', 'GHI?']
+
+
+def test_read_past_the_end_of_a_recording(emulator, tmp_path):
+    from cardReaderTransport import SerialTransport
+    from sessionRecorder import RecordingConnection, ReplayTransport
+
+    path = str(tmp_path / 'session.rec')
+
+    recorded = cardReader.CardReader(RecordingConnection(SerialTransport(emulator.portName), path))
+    recorded.read_card()
+    recorded.close_serial_connection()
+
+    msr = cardReader.CardReader(ReplayTransport(path))
+    assert msr.read_card() == [TRACK_ONE, TRACK_TWO, '?']
+
+    #the recording has run out, so the MSR605 never answers
+    with pytest.raises(cardReaderExceptions.CardReadError):
+        msr.read_card()
+
+
+def test_read_raw_without_numpy(msr, monkeypatch):
+    #the emulator can't encode the ISO card to raw bits without NumPy
+    monkeypatch.setitem(sys.modules, 'isoTrackDecoder', None)
+
+    with pytest.raises(cardReaderExceptions.CardReadError):
+        msr.read_raw()
+
+    #the emulator is still answering
+    assert msr.read_card() == [TRACK_ONE, TRACK_TWO, '?']
+
+
+def test_coercivity(msr):
+    msr.set_low_co()
+    assert msr.get_hi_or_low_co() == 'LOW-CO'
+
+    msr.set_hi_co()
+    assert msr.get_hi_or_low_co() == 'HI-CO'
+
+
+def test_deadline_runs_out(msr, emulator):
+    emulator.autoSwipe = False
+
+    result = msr.read_card(deadline=time.monotonic() + 0.2)
+
+    assert isinstance(result, cardReader.OperationTimeout)
+    assert not result.cancelled
+
+    #the MSR605 was reset, so the next command works
+    emulator.autoSwipe = True
+    assert msr.read_card() == [TRACK_ONE, TRACK_TWO, '?']
+
+
+def test_cancel(msr, emulator):
+    emulator.autoSwipe = False
+    token = cardReader.CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+
+    result = msr.read_card(cancelToken=token)
+
+    assert isinstance(result, cardReader.OperationTimeout)
+    assert result.cancelled
+
+
+def test_reconnect_gives_up(msr):
+    msr.enable_auto_reconnect(stablePort='/dev/msr605-test-missing', timeout=0.3)
+    start = time.monotonic()
+
+    try:
+        with pytest.raises(cardReaderExceptions.MSR605ConnectError):
+            msr.reconnect()
+    finally:
+        msr.disable_auto_reconnect()
+
+    assert time.monotonic() - start < 2.0
+
+
+def test_reconnect_stops_at_the_deadline(msr):
+    msr.enable_auto_reconnect(stablePort='/dev/msr605-test-missing', timeout=60)
+    #unplugging the MSR605 looks the same to CardReader as its port being closed
+    msr.getSerialConn().close()
+    start = time.monotonic()
+
+    try:
+        result = msr.read_card(deadline=start + 0.3)
+    finally:
+        msr.disable_auto_reconnect()
+
+    assert isinstance(result, cardReader.OperationTimeout)
+    assert not result.cancelled
+    assert time.monotonic() - start < 2.0
+
+
+def test_transport_interface():
+    import io
+    from cardReaderTransport import Transport
+
+    class NoFlushOutput(Transport):
+        in_waiting = 0
+        timeout = None
+
+        def read(self, size=1):
+            return b''
+
+        def write(self, data):
+            return len(data)
+
+        def flush(self):
+            pass
+
+        def flushInput(self):
+            pass
+
+        def close(self):
+            pass
+
+    #a transport missing a method fails straight away, not in the middle of a command
+    with pytest.raises(TypeError):
+        NoFlushOutput()
+
+    class NoFileno(NoFlushOutput):
+        def flushOutput(self):
+            pass
+
+    with pytest.raises(io.UnsupportedOperation):
+        NoFileno().fileno()
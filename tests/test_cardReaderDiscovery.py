@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+""" test_cardReaderDiscovery.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Linux
+    Python: 3.7 or newer
+
+    Description: Tests for cardReaderDiscovery.py and finding the MSR605 on the emulator,
+                 list_ports is replaced with a fixed list of ports
+"""
+
+
+import collections
+
+import pytest
+
+import cardReader, cardReaderDiscovery, cardReaderMetrics
+from conftest import TRACK_ONE, TRACK_TWO
+
+
+#the parts of pySerial's ListPortInfo that are used
+PortInfo = collections.namedtuple('PortInfo', 'device vid pid')
+
+MSR605_PORT = PortInfo('/dev/msr605-test-usb', *sorted(cardReaderDiscovery.MSR605_USB_IDS)[0])
+OTHER_USB_PORT = PortInfo('/dev/ttyUSB0', 0x1234, 0x5678)
+SERIAL_PORT = PortInfo('/dev/ttyS0', None, None)
+
+
+@pytest.fixture
+def ports(monkeypatch):
+    ports = [OTHER_USB_PORT, SERIAL_PORT, MSR605_PORT]
+
+    monkeypatch.setattr(cardReaderDiscovery.list_ports, 'comports', lambda: list(ports))
+    monkeypatch.setattr(cardReaderDiscovery.glob, 'glob', lambda pattern: [])
+
+    return ports
+
+
+def test_candidate_ports(ports, tmp_path):
+    cacheFile = str(tmp_path / 'port')
+
+    #only the ports with the MSR605's USB ids
+    assert cardReaderDiscovery.candidate_ports(cacheFile=cacheFile) == [MSR605_PORT.device]
+    assert len(cardReaderDiscovery.candidate_ports(usbIds=None, cacheFile=None)) == 3
+
+    #the port it was found on last time is tried first
+    cardReaderDiscovery.save_cached_port('/dev/ttyACM0', cacheFile)
+
+    assert cardReaderDiscovery.load_cached_port(cacheFile) == '/dev/ttyACM0'
+    assert cardReaderDiscovery.candidate_ports(cacheFile=cacheFile) == ['/dev/ttyACM0',
+                                                                       MSR605_PORT.device]
+
+
+def test_candidate_ports_fallback(ports):
+    #an MSR605 on Windows with a USB to serial chip that isn't in MSR605_USB_IDS
+    ports[:] = [PortInfo('COM1', None, None), PortInfo('COM3', 0x1234, 0x5678)]
+
+    assert cardReaderDiscovery.candidate_ports(cacheFile=None) == ['COM1', 'COM3']
+
+
+def test_port_present(ports):
+    assert cardReaderDiscovery.port_present(MSR605_PORT.device)
+
+    ports.remove(MSR605_PORT)
+
+    assert not cardReaderDiscovery.port_present(MSR605_PORT.device)
+
+
+def test_com_port_present(ports, monkeypatch):
+    #a COM port is never a file, only list_ports knows if it's there
+    monkeypatch.setattr(cardReaderDiscovery.os, 'name', 'nt')
+    ports.append(PortInfo('COM3', None, None))
+
+    assert cardReaderDiscovery.port_present('COM3')
+    assert not cardReaderDiscovery.port_present('COM4')
+
+
+def test_find_emulator(emulator, monkeypatch):
+    saved = []
+
+    #a port that isn't there is probed at the same time and doesn't hold anything up
+    monkeypatch.setattr(cardReaderDiscovery, 'candidate_ports',
+                        lambda: ['/dev/msr605-test-missing', emulator.portName])
+    monkeypatch.setattr(cardReaderDiscovery, 'save_cached_port', saved.append)
+
+    metrics = cardReaderMetrics.CardReaderMetrics()
+    msr = cardReader.CardReader(metrics=metrics)
+
+    try:
+        #the probe already initialized the MSR605, so the handshake isn't done again
+        assert metrics.snapshot()['outcomes'] == {}
+        assert msr.read_card() == [TRACK_ONE, TRACK_TWO, '?']
+    finally:
+        msr.close_serial_connection()
+
+    assert saved == [emulator.portName]
+
+
+def test_probe_port(emulator):
+    assert cardReader.probe_port('/dev/msr605-test-missing') is None
+
+    transport = cardReader.probe_port(emulator.portName)
+
+    assert transport is not None
+    transport.close()
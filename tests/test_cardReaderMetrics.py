@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+""" test_cardReaderMetrics.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Linux
+    Python: 3.7 or newer
+
+    Description: Tests for cardReaderMetrics.py, on its own and recording CardReader commands
+                 against msr605Emulator.py
+"""
+
+
+import pytest
+
+import cardReader, cardReaderExceptions
+from cardReaderMetrics import CardReaderMetrics, Histogram
+from cardReaderTransport import SerialTransport
+
+
+def test_histogram():
+    histogram = Histogram((0.1, 1.0))
+
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    #a value equal to a bound goes in that bucket
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.cumulative() == [2, 3, 4]
+    assert histogram.count == 4
+    assert histogram.sum == 2.65
+
+
+def test_openmetrics_text(tmp_path):
+    metrics = CardReaderMetrics((0.1, 1.0))
+    metrics.observe('/dev/ttyUSB0', 'read_card', 'total', 0.5)
+    metrics.count_outcome('/dev/ttyUSB0', 'read_card', 'ok')
+    metrics.count_status_error('/dev/ttyUSB0', 4)
+
+    text = metrics.openmetrics_text()
+
+    #the labels are in alphabetical order
+    assert ('msr605_command_duration_seconds_bucket{command="read_card",device="/dev/ttyUSB0",'
+            'phase="total",le="1.0"} 1') in text
+    assert 'msr605_commands_total{command="read_card",device="/dev/ttyUSB0",outcome="ok"} 1' in text
+    assert 'msr605_status_errors_total{code="4",device="/dev/ttyUSB0"} 1' in text
+    assert text.endswith("# EOF\n")
+
+    #the counter families are named without the _total in OpenMetrics
+    assert "# TYPE msr605_commands counter" in text
+
+    path = str(tmp_path / 'msr605.prom')
+    metrics.write_textfile(path)
+
+    with open(path) as f:
+        assert f.read() == metrics.prometheus_text()
+
+    metrics.reset()
+    assert metrics.snapshot() == {'latency': {}, 'outcomes': {}, 'statusErrors': {}}
+
+
+def test_prometheus_text():
+    parser = pytest.importorskip('prometheus_client.parser')
+
+    metrics = CardReaderMetrics((0.1, 1.0))
+    metrics.observe('/dev/ttyUSB0', 'read_card', 'total', 0.5)
+    metrics.count_outcome('/dev/ttyUSB0', 'read_card', 'ok')
+    metrics.count_status_error('/dev/ttyUSB0', 4)
+
+    text = metrics.prometheus_text()
+
+    assert "# UNIT" not in text and "# EOF" not in text
+
+    #node_exporter's textfile collector parses the file the same way
+    families = dict((family.name, family)
+                    for family in parser.text_string_to_metric_families(text))
+
+    assert families['msr605_command_duration_seconds'].type == 'histogram'
+    assert families['msr605_commands'].type == 'counter'
+    assert families['msr605_status_errors'].type == 'counter'
+    assert [sample.value for sample in families['msr605_commands'].samples] == [1]
+
+
+def test_commands_are_recorded(emulator):
+    metrics = CardReaderMetrics()
+    msr = cardReader.CardReader(SerialTransport(emulator.portName), metrics)
+
+    try:
+        msr.read_card()
+        msr.erase_card(7)
+
+        try:
+            msr.read_card()
+        except cardReaderExceptions.StatusError:
+            pass
+
+    finally:
+        msr.close_serial_connection()
+
+    snapshot = metrics.snapshot()
+    outcomes = dict(((command, outcome), count)
+                    for (device, command, outcome), count in snapshot['outcomes'].items())
+
+    assert outcomes[('read_card', 'ok')] == 1
+    assert outcomes[('read_card', 'StatusError')] == 1
+    assert outcomes[('erase_card', 'ok')] == 1
+    assert sum(snapshot['statusErrors'].values()) == 1
+    assert any(command == 'read_card' and phase == 'total'
+               for device, command, phase in snapshot['latency'])
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+""" test_cardReaderPool.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Linux
+    Python: 3.7 or newer
+
+    Description: Tests for cardReaderPool.py with several msr605Emulator.py's
+"""
+
+
+import pytest
+
+import cardReaderDiscovery, cardReaderExceptions, cardReaderPool
+from conftest import needsPty
+
+
+pytestmark = needsPty
+
+
+@pytest.fixture
+def emulators():
+    from msr605Emulator import MSR605Emulator
+
+    emulators = [MSR605Emulator(tracks=['A%d' % i, '1%d' % i, ''], swipeDelay=0.01)
+                 for i in range(3)]
+
+    for emulator in emulators:
+        emulator.start()
+
+    yield emulators
+
+    for emulator in emulators:
+        emulator.stop()
+
+
+@pytest.fixture
+def pool(emulators, monkeypatch):
+    #a port that isn't there is probed too, it's left out
+    monkeypatch.setattr(cardReaderDiscovery, 'candidate_ports',
+                        lambda: [emulator.portName for emulator in emulators] +
+                                ['/dev/msr605-test-missing'])
+
+    pool = cardReaderPool.CardReaderPool()
+
+    yield pool
+
+    pool.close()
+
+
+def test_discover_readers(pool, emulators):
+    assert len(pool.readers) == len(emulators)
+
+
+def test_jobs_are_shared(pool, emulators):
+    futures = [pool.read_card() for i in range(30)]
+    results = [future.result(timeout=10) for future in futures]
+
+    cards = [['A%d' % i, '1%d' % i, '?'] for i in range(len(emulators))]
+    assert all(result in cards for result in results)
+
+    stats = pool.stats()
+    assert sum(device.jobs for device in stats) == 30
+    assert sum(device.errors for device in stats) == 0
+
+
+def test_job_error(pool):
+    #there is no track select 1
+    future = pool.erase_card(1)
+
+    with pytest.raises(cardReaderExceptions.EraseCardError):
+        future.result(timeout=10)
+
+    assert sum(device.errors for device in pool.stats()) == 1
+
+
+def test_unknown_operation(pool):
+    with pytest.raises(ValueError):
+        pool.submit('close_serial_connection')
+
+
+def test_close_finishes_queued_jobs(pool):
+    futures = [pool.read_card() for i in range(20)]
+
+    pool.close()
+
+    #every job queued before close() was run, none of them are left waiting
+    assert all(future.done() for future in futures)
+    assert all(not future.exception() for future in futures)
+
+    with pytest.raises(RuntimeError):
+        pool.read_card()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+""" test_cardReaderProfiling.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Linux
+    Python: 3.7 or newer
+
+    Description: Tests for cardReaderProfiling.py with CardReader against msr605Emulator.py
+"""
+
+
+import json, os, pstats
+
+import pytest
+
+import cardReader, cardReaderProfiling
+from conftest import TRACK_ONE, TRACK_TWO
+
+
+@pytest.fixture
+def profileDir(tmp_path):
+    directory = str(tmp_path / 'profiles')
+
+    cardReaderProfiling.enable(directory)
+
+    yield directory
+
+    cardReaderProfiling.disable()
+
+
+def test_read_card_profiled(profileDir, msr):
+    assert msr.read_card() == [TRACK_ONE, TRACK_TWO, '?']
+
+    profiles = [name for name in os.listdir(profileDir)
+                if name.startswith('CardReader.read_card-')]
+
+    assert len(profiles) == 1
+    assert pstats.Stats(os.path.join(profileDir, profiles[0])).total_calls > 0
+
+    with open(os.path.join(profileDir, cardReaderProfiling.MEMORY_LOG)) as f:
+        operations = [json.loads(line) for line in f]
+
+    assert any(operation.get('operation') == 'CardReader.read_card' for operation in operations)
+
+
+def test_disable_unwraps(tmp_path):
+    read_card = cardReader.CardReader.read_card
+
+    cardReaderProfiling.enable(str(tmp_path), memory=False)
+
+    try:
+        assert cardReaderProfiling.enabled()
+        assert cardReader.CardReader.read_card is not read_card
+    finally:
+        cardReaderProfiling.disable()
+
+    assert not cardReaderProfiling.enabled()
+    assert cardReader.CardReader.read_card is read_card
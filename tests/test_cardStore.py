@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+""" test_cardStore.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows
+    Python: 3.7 or newer
+
+    Description: Tests for cardStore.py
+"""
+
+
+import sqlite3
+
+import pytest
+
+import cardStore
+from cardStore import CardStore, SORT_COLUMNS, sort_key
+
+
+#GUI.py used to save a track it didn't have as NULL
+OLD_CARDS = [(None, '1', '2'), ('bob', '3', None), (None, '5', '6'), ('alice', '7', '8'),
+             ('carl', None, '9'), ('bob', '3', None)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CardStore(str(tmp_path / 'cards.db'))
+
+    yield store
+
+    store.close()
+
+
+@pytest.fixture
+def oldStore(tmp_path):
+    """A database made the way GUI.py used to make it (version 0), then opened"""
+
+    path = str(tmp_path / 'old.db')
+
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Cards (trackOne text, trackTwo text, trackThree text)")
+    conn.executemany("INSERT INTO Cards VALUES(?, ?, ?)", OLD_CARDS)
+    conn.commit()
+    conn.close()
+
+    store = CardStore(path)
+
+    yield store
+
+    store.close()
+
+
+def page_through(store, sortColumn, descending, forward):
+    """Every card, a page of 2 at a time with page()"""
+
+    rows = []
+    key = None
+
+    while True:
+        page = store.page(sortColumn, key, 2, forward=forward, descending=descending)
+
+        if (not page):
+            return rows
+
+        if (forward):
+            rows += page
+            key = sort_key(page[-1], sortColumn)
+        else:
+            rows = page + rows
+            key = sort_key(page[0], sortColumn)
+
+
+def test_insert_and_duplicates(store):
+    assert store.insert(['A', '1', ''])
+    assert not store.insert(['A', '1', ''], allowDuplicates=False)
+    assert store.insert(['A', '1', ''])
+
+    assert store.count() == 2
+    assert store.contains(['A', '1', ''])
+    assert not store.contains(['B', '1', ''])
+
+    assert store.insert_many([['B', '2', ''], ['B', '2', ''], ['A', '1', '']],
+                             allowDuplicates=False) == 1
+    assert store.count() == 3
+
+
+def test_none_is_empty(store):
+    store.insert([None, '1', None])
+
+    assert store.get(1) == (1, '', '1', '')
+    assert store.contains(['', '1', ''])
+
+
+def test_upgrade(oldStore):
+    #the first copy of a card gets the hash, the NULL tracks are empty strings
+    assert oldStore.count() == len(OLD_CARDS)
+    assert oldStore.contains(['bob', '3', ''])
+    assert not oldStore.insert(['bob', '3', None], allowDuplicates=False)
+    assert oldStore.get(1) == (1, '', '1', '2')
+    assert oldStore.get(5) == (5, 'carl', '', '9')
+
+
+@pytest.mark.parametrize('sortColumn', SORT_COLUMNS)
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('forward', [True, False])
+def test_paging_upgraded_nulls(oldStore, sortColumn, descending, forward):
+    #a card that had a NULL track has to be on a page, every card is there once
+    expected = oldStore.page_at(sortColumn, 0, 100, descending)
+
+    assert len(expected) == len(OLD_CARDS)
+    assert page_through(oldStore, sortColumn, descending, forward) == expected
+
+
+def test_page_at(store):
+    store.insert_many([['C', '', ''], ['A', '', ''], ['B', '', '']])
+
+    assert [row[1] for row in store.page_at('trackOne', 1, 2)] == ['B', 'C']
+    assert [row[1] for row in store.page_at('trackOne', 0, 1, descending=True)] == ['C']
+
+
+def test_sort_key_none():
+    #a row that didn't come from the database can still be sorted
+    rows = [(2, 'b', '', ''), (1, None, '', '')]
+
+    assert sorted(rows, key=lambda row: sort_key(row, 'trackOne'))[0][0] == 1
+
+
+def test_search(store):
+    store.insert_many([['B4111111111111111^DOE/JOHN^2512101', '', ''],
+                       ['B5500000000000004^ROE/JANE^2601101', '', ''],
+                       ['', '4111111111111111=2512101', '']])
+
+    assert [row[0] for row in store.search('DOE')] == [1]
+    assert [row[0] for row in store.search('411111')] == [1, 3]
+    assert [row[0] for row in store.search('411111', column='trackTwo')] == [3]
+    assert [row[0] for row in store.search('411111', after=1)] == [3]
+
+    #too short for the index, the table is gone through
+    assert [row[0] for row in store.search('OE')] == [1, 2]
+
+    with pytest.raises(ValueError):
+        store.search('DOE', column='trackHash')
+
+
+def test_search_after_vacuum(store):
+    store.insert_many([['A%d' % i, '', ''] for i in range(10)])
+
+    #VACUUM renumbers the rowids of a table without an INTEGER PRIMARY KEY after deletes
+    conn = sqlite3.connect(store.path)
+    conn.execute("DELETE FROM Cards WHERE id IN (2, 4, 6)")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+    #the ids don't change, so the index still points at the right cards
+    assert store.search('A9') == [(10, 'A9', '', '')]
+    assert store.get(10) == (10, 'A9', '', '')
+
+
+def test_search_index_made(oldStore):
+    assert oldStore.searchable
+    assert [row[0] for row in oldStore.search('lic')] == [4]
+
+
+def _set_search_module(path, old, new):
+    #rewrites the schema so CardsSearch looks like it uses a module this SQLite doesn't have,
+    #the same as opening the database with a SQLite without FTS5
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA writable_schema=ON")
+    conn.execute("UPDATE sqlite_master SET sql=replace(sql, ?, ?) WHERE name='CardsSearch'",
+                 (old, new))
+    conn.commit()
+    conn.close()
+
+
+def test_search_index_without_fts5(tmp_path):
+    path = str(tmp_path / 'cards.db')
+
+    with CardStore(path) as store:
+        store.insert(['B4111111111111111^DOE/JOHN^2512101', '', ''])
+
+    _set_search_module(path, 'USING fts5', 'USING nofts5')
+
+    with CardStore(path) as store:
+        assert not store.searchable
+
+        #the triggers would fail on every card saved
+        assert store.insert(['B5500000000000004^DOE/JANE^2601101', '', ''])
+        assert [row[0] for row in store.search('DOE')] == [1, 2]
+
+    _set_search_module(path, 'USING nofts5', 'USING fts5')
+
+    #the card saved without FTS5 is indexed once it's back
+    with CardStore(path) as store:
+        assert store.searchable
+        assert [row[0] for row in store.search('DOE/JANE')] == [2]
+        assert store.insert(['', '', 'DOE/ROW'])
+        assert [row[0] for row in store.search('DOE')] == [1, 2, 3]
+
+
+def test_schema_version(oldStore, store):
+    for upgraded in (oldStore, store):
+        conn = sqlite3.connect(upgraded.path)
+
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == cardStore.SCHEMA_VERSION
+        assert 'id' in [row[1] for row in conn.execute("PRAGMA table_info(Cards)")]
+
+        conn.close()
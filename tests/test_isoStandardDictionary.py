@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+""" test_isoStandardDictionary.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows
+    Python: 3.7 or newer
+
+    Description: Tests for isoStandardDictionary.py, filter_track has to agree with checking
+                 one character at a time
+"""
+
+
+import pytest
+
+from isoStandardDictionary import filter_track, iso_delete_table, iso_standard_track_check
+
+
+EVERY_CHARACTER = ''.join(chr(value) for value in range(256))
+
+
+@pytest.mark.parametrize('trackNum', [1, 2, 3])
+def test_filter_matches_character_check(trackNum):
+    expected = ''.join(char for char in EVERY_CHARACTER
+                       if iso_standard_track_check(char, trackNum))
+    removed = [i for i, char in enumerate(EVERY_CHARACTER)
+               if not iso_standard_track_check(char, trackNum)]
+
+    assert filter_track(EVERY_CHARACTER, trackNum) == (expected, removed)
+    assert filter_track(EVERY_CHARACTER.encode('latin-1'), trackNum) == \
+           (expected.encode('latin-1'), removed)
+
+
+def test_filter_track():
+    assert filter_track('12a4', 2) == ('124', [2])
+    assert filter_track(b'AB\x01C~', 1) == (b'ABC', [2, 4])
+    assert filter_track(bytearray(b'123'), 3) == (b'123', [])
+
+    #a character past 255 is never ISO standard
+    assert filter_track('A€B', 1) == ('AB', [1])
+
+
+def test_keep():
+    assert filter_track('AB\x1bC', 1, keep='\x1b') == ('AB\x1bC', [])
+    assert b'\x1b' not in iso_delete_table(1, frozenset('\x1b'))
+    assert b'\x1b' in iso_delete_table(1)
+
+
+def test_invalid_track():
+    assert filter_track('abc', 4) == ('abc', [])
+    assert iso_delete_table(4) == b''
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+""" test_isoTrackDecoder.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows
+    Python: 3.7 or newer
+
+    Description: Tests for isoTrackDecoder.py, skipped if NumPy isn't installed
+"""
+
+
+import pytest
+
+from conftest import TRACK_ONE, TRACK_TWO
+
+np = pytest.importorskip('numpy')
+
+from isoTrackDecoder import decode_track, decode_tracks, encode_track
+
+
+def reverse_bits(data):
+    """The raw data of the track swiped the other way"""
+
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')
+    return np.packbits(bits[::-1], bitorder='little').tobytes()
+
+
+@pytest.mark.parametrize('text, trackNum', [(TRACK_ONE, 1), (TRACK_TWO, 2), ('12345', 3)])
+def test_round_trip(text, trackNum):
+    decoded = decode_track(encode_track(text, trackNum), trackNum)
+
+    assert decoded.text == text
+    assert decoded.valid()
+    assert decoded.lrc is True
+    assert not decoded.reversed
+
+
+def test_swiped_backwards():
+    decoded = decode_track(reverse_bits(encode_track(TRACK_TWO, 2)), 2)
+
+    assert decoded.text == TRACK_TWO
+    assert decoded.reversed
+
+
+def test_parity_error():
+    data = bytearray(encode_track(TRACK_TWO, 2))
+
+    #a bit in the middle of the track (past the 24 leading zeros and the start sentinel)
+    data[8] ^= 0x10
+
+    decoded = decode_track(bytes(data), 2)
+
+    assert decoded.parityErrors
+    assert not decoded.valid()
+
+
+def test_blank_track():
+    assert decode_track(bytes(16), 2) is None
+
+
+def test_raw_read(msr):
+    #the emulator encodes its card for the raw read
+    tracks = decode_tracks(msr.read_raw())
+
+    assert [track.text for track in tracks[:2]] == [TRACK_ONE, TRACK_TWO]
+    assert tracks[2] is None
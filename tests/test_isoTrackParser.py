@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+""" test_isoTrackParser.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows
+    Python: 3.7 or newer
+
+    Description: Tests for isoTrackParser.py
+"""
+
+
+from conftest import TRACK_ONE, TRACK_TWO
+from isoTrackParser import Track1, Track2, luhn_check, parse_card, track_lrc
+
+
+#the LRC of this track 2 is a ? (the same character as the end sentinel)
+QUESTION_MARK_LRC = '4111111111111111=2504101'
+
+
+def test_fields():
+    card = parse_card([TRACK_ONE, TRACK_TWO, '?'])
+
+    assert card.pan == '4111111111111111'
+    assert card.name == 'DOE/JOHN'
+    assert card.expiry == '2512'
+    assert card.serviceCode == '101'
+    assert card.track1.formatCode == 'B'
+    assert card.track2.discretionary == ''
+    assert card.track3 is None
+    assert card.valid()
+
+
+def test_sentinels_and_lrc():
+    track = Track1('%' + TRACK_ONE + '?' + track_lrc(TRACK_ONE, 1))
+
+    assert track.data == TRACK_ONE
+    assert track.sentinels
+    assert track.lrc_valid() is True
+    assert track.valid()
+
+
+def test_wrong_lrc():
+    track = Track2(';' + TRACK_TWO + '?0')
+
+    assert track.lrc_valid() is False
+    assert not track.valid()
+
+
+def test_no_lrc():
+    track = Track2(TRACK_TWO)
+
+    assert track.lrc_valid() is None
+    assert not track.sentinels
+    assert track.valid()
+
+
+def test_question_mark_lrc():
+    assert track_lrc(QUESTION_MARK_LRC, 2) == '?'
+
+    track = Track2(';' + QUESTION_MARK_LRC + '??')
+
+    assert track.data == QUESTION_MARK_LRC
+    assert track.lrc == '?'
+    assert track.sentinels
+    assert track.lrc_valid() is True
+    assert track.expiry == '2504'
+    assert track.valid()
+
+
+def test_only_end_sentinel():
+    track = Track2(';' + TRACK_TWO + '?')
+
+    assert track.data == TRACK_TWO
+    assert track.lrc is None
+    assert track.sentinels
+
+
+def test_luhn():
+    assert luhn_check('4111111111111111')
+    assert not luhn_check('4111111111111112')
+    assert not luhn_check('41111111111111A1')
+
+    card = parse_card(['', TRACK_TWO.replace('1111=', '1112='), '?'])
+
+    assert card.track1 is None
+    assert not card.valid()
+
+
+def test_mismatched_tracks():
+    card = parse_card([TRACK_ONE, TRACK_TWO.replace('=2512', '=2601'), '?'])
+
+    assert card.track1.valid() and card.track2.valid()
+    assert not card.valid()
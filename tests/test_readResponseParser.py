@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+""" test_readResponseParser.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Windows
+    Python: 3.7 or newer
+
+    Description: Tests for readResponseParser.py
+"""
+
+
+from readResponseParser import ReadResponseParser, RawReadResponseParser
+
+
+RESPONSE = b'\x1bs\x1b\x01%B123^DOE?\x1b\x02;1234=25?\x1b\x03;?\x1c\x1b0'
+
+RAW_RESPONSE = b'\x1bs\x1b\x01\x03\x1b\x1c\x00\x1b\x02\x01\x05\x1b\x03\x00?\x1c\x1b0'
+
+
+def test_whole_response():
+    response = ReadResponseParser().feed(RESPONSE)
+
+    assert response.tracks == ['B123^DOE', '1234=25', '?']
+    assert response.status == '0'
+    assert response.error is None
+
+
+def test_one_byte_at_a_time():
+    parser = ReadResponseParser()
+    results = [parser.feed(RESPONSE[i:i + 1]) for i in range(len(RESPONSE))]
+
+    assert results[:-1] == [None] * (len(RESPONSE) - 1)
+    assert results[-1].tracks == ['B123^DOE', '1234=25', '?']
+
+
+def test_bytes_used_leaves_the_rest():
+    parser = ReadResponseParser()
+    data = RESPONSE + b'\x1by'
+
+    parser.feed(data)
+
+    assert data[parser.bytesUsed:] == b'\x1by'
+
+
+def test_non_iso_characters_dropped():
+    #a lower case letter isn't ISO standard for track 1, a letter isn't for track 2
+    response = ReadResponseParser().feed(b'\x1bs\x1b\x01%AbC?\x1b\x02;1A2?\x1b\x03;?\x1c\x1b0')
+
+    assert response.tracks[:2] == ['AC', '12']
+
+    response = ReadResponseParser(compareToISO=False).feed(
+        b'\x1bs\x1b\x01%AbC?\x1b\x02;1A2?\x1b\x03;?\x1c\x1b0')
+
+    assert response.tracks[:2] == ['AbC', '1A2']
+
+
+def test_bad_start():
+    response = ReadResponseParser().feed(b'\x1bx')
+
+    assert response.errorField == 'Datablock'
+    assert response.status is None
+
+
+def test_seven_bit_track_two():
+    #with 7 bits per character track 2 is alphanumeric and starts with %
+    parser = ReadResponseParser(bitsPerChar=(7, 7, 5))
+    response = parser.feed(b'\x1bs\x1b\x01%A?\x1b\x02%DEF^?\x1b\x03;?\x1c\x1b0')
+
+    assert response.tracks[1] == 'DEF^'
+
+
+def test_raw_response():
+    parser = RawReadResponseParser()
+    results = [parser.feed(RAW_RESPONSE[i:i + 1]) for i in range(len(RAW_RESPONSE))]
+    response = results[-1]
+
+    #the track data is binary, an ESCAPE or FS in it isn't the end of the track
+    assert response.tracks == [b'\x1b\x1c\x00', b'\x05', b'']
+    assert response.status == '0'
+    assert response.error is None
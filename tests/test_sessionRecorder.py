@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+""" test_sessionRecorder.py
+
+    LISENSE:
+        This file is part of MSR605 Card Reader/Writer.
+
+        MSR605 Card Reader/Writer is free software: you can redistribute it and/or modify
+        it under the terms of the GNU General Public License as published by the Free
+        Software Foundation, either version 3 of the License, or (at your option) any
+        later version.
+
+        MSR605 Card Reader/Writer is distributed in the hope that it will be useful,
+        but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+        or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+        more details.
+
+        You should have received a copy of the GNU General Public License
+        along with MSR605 Card Reader/Writer.  If not, see <http://www.gnu.org/licenses/>.
+
+        MSR605 Card Reader/Writer version 1, Copyright (C) 2017 of Manwinder Sidhu
+
+    Platform: Linux
+    Python: 3.7 or newer
+
+    Description: Tests for sessionRecorder.py, a session with msr605Emulator.py is recorded
+                 and then played back into CardReader
+"""
+
+
+import time
+
+import pytest
+
+import cardReader, cardReaderExceptions
+from cardReaderTransport import SerialTransport
+from conftest import TRACK_ONE, TRACK_TWO
+from sessionRecorder import (READ, WRITE, RecordingConnection, ReplayMismatchError,
+                             ReplayTransport, read_recording)
+
+
+@pytest.fixture
+def recording(emulator, tmp_path):
+    """A recording of connecting, a read, a write and another read"""
+
+    path = str(tmp_path / 'session.rec')
+
+    msr = cardReader.CardReader(RecordingConnection(SerialTransport(emulator.portName), path))
+    msr.read_card()
+    msr.write_card(['ABC', '123', ''], True)
+    msr.read_card()
+    msr.close_serial_connection()
+
+    return path
+
+
+def replay(msr):
+    return [msr.read_card(), msr.write_card(['ABC', '123', ''], True), msr.read_card()]
+
+
+def test_read_recording(recording):
+    events = read_recording(recording)
+
+    assert {direction for direction, timestamp, data in events} == {READ, WRITE}
+    assert [timestamp for direction, timestamp, data in events] == \
+           sorted(timestamp for direction, timestamp, data in events)
+
+
+def test_replay(recording):
+    msr = cardReader.CardReader(ReplayTransport(recording, strict=True))
+
+    assert replay(msr) == [[TRACK_ONE, TRACK_TWO, '?'], None, ['ABC', '123', '?']]
+    assert msr.getSerialConn().finished()
+
+
+def test_replay_realtime(recording):
+    msr = cardReader.CardReader(ReplayTransport(recording, realtime=True, strict=True))
+
+    assert replay(msr)[2] == ['ABC', '123', '?']
+
+
+def test_replay_mismatch(recording):
+    msr = cardReader.CardReader(ReplayTransport(recording, strict=True))
+
+    with pytest.raises(ReplayMismatchError):
+        msr.erase_card(7)
+
+
+def test_replay_past_the_end(recording):
+    msr = cardReader.CardReader(ReplayTransport(recording))
+    replay(msr)
+
+    with pytest.raises(cardReaderExceptions.CardReadError):
+        msr.read_card()
+
+
+def test_timeout(recording):
+    transport = ReplayTransport(recording)
+    transport.timeout = 0.2
+    start = time.monotonic()
+
+    #nothing has been written yet, so none of the reads are due
+    assert transport.read() == b''
+    assert time.monotonic() - start >= 0.2
+
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path / 'session.rec'
+    path.write_bytes(b'not a recording')
+
+    with pytest.raises(ValueError):
+        ReplayTransport(str(path))